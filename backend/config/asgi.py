@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests for ``/api/communities/<id>/events/`` are long-lived server-sent
+event streams and are handled by ``main.realtime`` directly; everything else
+goes to the regular Django application.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -13,4 +17,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings_prod")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from main.realtime import EVENTS_PATH, sse_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and EVENTS_PATH.match(scope["path"]):
+        return await sse_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -65,13 +65,44 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database Configuration
+# Connections are kept open for DB_CONN_MAX_AGE seconds and health-checked
+# before reuse, so requests skip the TCP/TLS/auth handshake. Set
+# DB_POOL_MODE=pgbouncer when DATABASE_URL points at PgBouncer in transaction
+# pooling mode; server-side cursors do not survive transaction pooling.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+DB_POOL_MODE = config('DB_POOL_MODE', default='persistent')
+
 DATABASES = {
     'default': dj_database_url.config(
         default=os.getenv('DATABASE_URL'),
-        conn_max_age=600,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
     )
 }
 
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+    })
+    if DB_POOL_MODE == 'pgbouncer':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas: comma-separated URLs become replica_0, replica_1, ...
+# Reads go to a replica unless the client wrote within REPLICA_PIN_SECONDS
+# (see main/db_routers.py).
+DATABASE_REPLICA_URLS = [url.strip() for url in config('DATABASE_REPLICA_URLS', default='').split(',') if url.strip()]
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+for index, replica_url in enumerate(DATABASE_REPLICA_URLS):
+    DATABASES[f'replica_{index}'] = {
+        **dj_database_url.parse(replica_url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+if DATABASE_REPLICA_URLS:
+    DATABASE_ROUTERS = ['main.db_routers.ReplicaRouter']
+    MIDDLEWARE.append('main.db_routers.ReplicaPinningMiddleware')
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -89,14 +120,12 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Only list the source directory when it exists; settings must not touch
+# the filesystem at import (the Dockerfile creates STATIC_ROOT)
 STATICFILES_DIRS = [
-    os.path.join(BASE_DIR, 'static')
+    path for path in [os.path.join(BASE_DIR, 'static')] if os.path.isdir(path)
 ]
 
-# Ensure directories exist
-os.makedirs(STATIC_ROOT, exist_ok=True)
-os.makedirs(os.path.join(BASE_DIR, 'static'), exist_ok=True)
-
 # Use WhiteNoise for static files
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
@@ -135,35 +164,57 @@ CSRF_COOKIE_SECURE = False
 # Media files
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Create media directory if it doesn't exist
-if not os.path.exists(MEDIA_ROOT):
-    os.makedirs(MEDIA_ROOT, exist_ok=True)
-    print(f"Created MEDIA_ROOT directory at: {MEDIA_ROOT}")
-
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Rest Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'main.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
-# Print configuration status
-print("Configuration loaded with:")
-print(f"DEBUG: {DEBUG}")
-print(f"STATIC_ROOT: {STATIC_ROOT}")
-print(f"Database Engine: {DATABASES['default']['ENGINE']}")
+# Cache configuration. CACHE_URL selects the shared backend, e.g.
+#   redis://host:6379/1, file:///var/tmp/django_cache, db://cache_table, locmem://
+# The default file cache lives on the container's disk, so it is shared by
+# every gunicorn worker (registration/activation depends on that).
+CACHE_URL = config('CACHE_URL', default='file:///tmp/aesthetic-communities-cache')
+
+
+def cache_backend_from_url(url):
+    scheme, _, location = url.partition('://')
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+    if scheme == 'db':
+        return {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': location}
+    if scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location}
+    raise ValueError(f"Unsupported CACHE_URL scheme: {scheme}")
+
+
+CACHES = {
+    'default': {
+        **cache_backend_from_url(CACHE_URL),
+        'KEY_PREFIX': 'ac',
+        'TIMEOUT': 300,
+    },
+}
+
+# Cached token authentication (see main/authentication.py)
+AUTH_TOKEN_CACHE_TTL = config('AUTH_TOKEN_CACHE_TTL', default=300, cast=int)
+AUTH_TOKEN_LOCAL_TTL = config('AUTH_TOKEN_LOCAL_TTL', default=10, cast=int)
 
-# Print startup diagnostic information
-print("Django Starting Up:")
-print(f"ALLOWED_HOSTS: {ALLOWED_HOSTS}")
-print(f"DEBUG: {DEBUG}")
-print(f"DATABASE_URL exists: {bool(os.environ.get('DATABASE_URL'))}")
+# Realtime community events (see main/realtime.py). Use
+# main.realtime.RedisBroker when running more than one worker process.
+REALTIME_BROKER = config('REALTIME_BROKER', default='main.realtime.InMemoryBroker')
+REALTIME_REDIS_URL = config('REALTIME_REDIS_URL', default='redis://localhost:6379/0')
+
+# Configuration diagnostics: manage.py check --deploy (see main/checks.py)
 
 CSRF_TRUSTED_ORIGINS = [
     'https://aesthetic-communities.vercel.app',
@@ -171,6 +222,14 @@ CSRF_TRUSTED_ORIGINS = [
     'https://aesthetic-communities-jopldlo67-felicia-lammertings-projects.vercel.app',
 ]
 
+# Origins allowed to open community event streams cross-origin. The streams
+# carry member-only activity, so they do not follow CORS_ALLOW_ALL_ORIGINS.
+REALTIME_ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in config('REALTIME_ALLOWED_ORIGINS', default=','.join(CSRF_TRUSTED_ORIGINS)).split(',')
+    if origin.strip()
+]
+
 # Add Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -247,7 +306,6 @@ if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
 else:
     # Use local storage for development/building
     DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
-    print("AWS credentials not found - using local file storage")
 
 # Only configure S3 if not collecting static
 if 'collectstatic' not in sys.argv:
@@ -0,0 +1,131 @@
+"""
+Gunicorn configuration for production.
+
+Sizes the worker pool from the CPUs and memory actually available to the
+container (cgroup limits first, host values otherwise). Every value can be
+overridden through the environment:
+
+    WEB_CONCURRENCY       number of worker processes
+    GUNICORN_THREADS      threads per worker (WSGI mode only)
+    WORKER_MEMORY_MB      memory budget per worker used to cap the pool
+    SERVER_MODE           "wsgi" (default, gthread workers) or "asgi"
+                          (uvicorn workers, needed for live SSE updates;
+                          more than one needs REALTIME_BROKER set to
+                          main.realtime.RedisBroker)
+    GUNICORN_MAX_REQUESTS recycle workers after this many requests
+
+Run with ``gunicorn -c gunicorn.conf.py``. Workers are recycled, which
+kills background jobs running inside them; run ``manage.py
+run_background_jobs`` as a separate process (Procfile ``worker``) so those
+jobs are resumed (see main/background.py).
+"""
+import multiprocessing
+import os
+import sys
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    # cgroup v2, then v1 CPU quotas
+    quota = _read('/sys/fs/cgroup/cpu.max')
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()
+        return max(1, int(int(limit) / int(period)))
+    limit, period = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if limit and period and int(limit) > 0:
+        return max(1, int(int(limit) / int(period)))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+def available_memory_mb():
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        limit = _read(path)
+        # Unlimited cgroups report "max" or a huge sentinel value
+        if limit and limit.isdigit() and int(limit) < 1 << 60:
+            return int(limit) // (1024 * 1024)
+    meminfo = _read('/proc/meminfo') or ''
+    for line in meminfo.splitlines():
+        if line.startswith('MemTotal:'):
+            return int(line.split()[1]) // 1024
+    return None
+
+
+server_mode = os.environ.get('SERVER_MODE', 'wsgi').lower()
+cpus = available_cpus()
+memory_mb = available_memory_mb()
+worker_memory_mb = _env_int('WORKER_MEMORY_MB', 160)
+
+default_workers = cpus * 2 + 1
+if memory_mb:
+    default_workers = min(default_workers, max(1, memory_mb // worker_memory_mb))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = _env_int('WEB_CONCURRENCY', default_workers)
+
+if server_mode == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread'
+    threads = _env_int('GUNICORN_THREADS', 4)
+
+# Load Django once in the master so workers fork with it already imported
+preload_app = True
+
+# Recycle workers periodically to cap memory growth; jitter avoids every
+# worker restarting at the same moment
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = 30
+keepalive = 5
+
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Events published in one worker would never reach streams held open by
+    # another; the app is preloaded, so settings are available here
+    if server_mode == 'asgi' and workers > 1:
+        from main.realtime import broker_is_shared
+        if not broker_is_shared():
+            server.log.error(
+                f'{workers} ASGI workers need a shared REALTIME_BROKER '
+                '(main.realtime.RedisBroker); set WEB_CONCURRENCY=1 or configure Redis'
+            )
+            sys.exit(1)
+
+
+def post_fork(server, worker):
+    # Never share database sockets opened during preload between processes
+    from django.db import connections
+    connections.close_all()
+
+
+def when_ready(server):
+    server.log.info(
+        f'Serving {wsgi_app} with {workers} {worker_class} workers '
+        f'({cpus} CPUs, {memory_mb} MB available)'
+    )
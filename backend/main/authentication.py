@@ -0,0 +1,77 @@
+"""
+Token authentication backed by a two-level cache.
+
+DRF's ``TokenAuthentication`` joins ``authtoken_token`` to the user table on
+every request. ``CachedTokenAuthentication`` keeps just the fields needed to
+authenticate (``CACHED_USER_FIELDS``) in a small per-process LRU and in the
+shared Django cache; nothing secret such as the password hash is cached.
+Every other field, and the profile, is loaded from the database on first
+access like any deferred field.
+
+Entries are dropped whenever the token is deleted (logout, account deletion)
+or the user is saved (password reset, deactivation); see
+``main/signals.py``. Other worker processes may keep serving a revoked token
+from their local LRU for at most ``AUTH_TOKEN_LOCAL_TTL`` seconds.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from .caching import LocalLRUCache
+
+_local_tokens = LocalLRUCache(
+    max_entries=getattr(settings, 'AUTH_TOKEN_LOCAL_MAX_ENTRIES', 1024),
+    ttl=getattr(settings, 'AUTH_TOKEN_LOCAL_TTL', 10),
+)
+
+CACHED_USER_FIELDS = ('id', 'username', 'is_active')
+
+
+def _cache_key(key):
+    # Never put raw tokens in cache keys
+    return 'auth_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    cache_key = _cache_key(key)
+    _local_tokens.delete(cache_key)
+    cache.delete(cache_key)
+
+
+def invalidate_user_tokens(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for ``TokenAuthentication`` with cached lookups."""
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        values = _local_tokens.get(cache_key)
+        if values is None:
+            values = cache.get(cache_key)
+            if values is None:
+                row = Token.objects.filter(key=key).values_list(
+                    *(f'user__{field}' for field in CACHED_USER_FIELDS)
+                ).first()
+                if row is None:
+                    raise AuthenticationFailed('Invalid token.')
+                values = dict(zip(CACHED_USER_FIELDS, row))
+                cache.set(cache_key, values, getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300))
+            _local_tokens.set(cache_key, values)
+
+        # A fresh instance per request, with every other field deferred
+        User = get_user_model()
+        # from_db() expects values in the model's field order
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+        user = User.from_db(router.db_for_read(User), fields, [values[name] for name in fields])
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        return (user, Token(key=key, user=user))
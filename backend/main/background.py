@@ -0,0 +1,66 @@
+"""
+Minimal in-process background jobs.
+
+There is no task queue in this deployment, so long-running work (community
+deletion, bulk imports, preview capture) starts on a small thread pool
+inside the web worker. Gunicorn recycles workers every few hundred requests and kills
+them on timeouts and deploys, dropping whatever was running or queued, so
+jobs must be safe to re-run and must leave a durable marker of unfinished
+work (e.g. ``Community.is_deleting``).
+
+Production therefore runs ``manage.py run_background_jobs`` as a separate
+long-lived process (the ``worker`` entry in the Procfile). It polls for
+unfinished work and resumes it; without it an interrupted job stays
+interrupted until someone runs the command by hand. A job holds a claim in
+the shared cache while it runs and renews it as it makes progress, so the
+worker never duplicates a job a web process is still running, and picks
+up one whose process died once the claim expires.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .db_routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='background')
+
+CLAIM_TIMEOUT = 10 * 60
+
+
+def _claim_key(job):
+    return f'background_claim:{job}'
+
+
+def claim(job):
+    """Whether this process may run ``job``; False while another holds it."""
+    return cache.add(_claim_key(job), True, CLAIM_TIMEOUT)
+
+
+def renew(job):
+    """Keep a claim alive; call at least every ``CLAIM_TIMEOUT`` seconds."""
+    cache.set(_claim_key(job), True, CLAIM_TIMEOUT)
+
+
+def release(job):
+    cache.delete(_claim_key(job))
+
+
+def _run(fn, args, kwargs):
+    close_old_connections()
+    try:
+        # Jobs read what the request just wrote, so never read from a replica
+        with use_primary():
+            return fn(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Background job {fn.__name__} failed")
+        raise
+    finally:
+        close_old_connections()
+
+
+def submit(fn, *args, **kwargs):
+    return _executor.submit(_run, fn, args, kwargs)
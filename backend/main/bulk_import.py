@@ -0,0 +1,389 @@
+"""
+Bulk import of resources into a collection and products into a community.
+
+Rows (dicts from CSV or JSON) are checked with plain field validators
+rather than a serializer per row, skipped when their canonical link
+(``url_key``, see links.py) is already in the collection (or community,
+for products) or earlier in the same import, and inserted ``batch_size``
+at a time with ``bulk_create``. Keys are resolved once per batch.
+The report lists rejected rows (the first ``MAX_REPORTED_ERRORS``) with
+their errors.
+
+``bulk_create`` bypasses model signals, so the collection stats and the
+cache namespaces those signals maintain are updated here once per import,
+and preview capture for the new URLs is queued as a background job.
+
+Uploads through the API run as background jobs (see background.py) so a
+large file never holds a request past the worker timeout. ``start_import``
+streams the upload to storage under ``IMPORT_PREFIX`` next to a small job
+description and returns at once; ``run_import_job`` streams CSV rows back
+from storage and keeps its progress in the cache, like community deletion.
+The stored files are removed when the job finishes, so any left behind
+belong to a job whose worker died, and ``resume_imports`` re-runs them
+(duplicate detection makes that safe).
+"""
+import csv
+import io
+import json
+import logging
+import os
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.validators import URLValidator
+from django.db import transaction
+
+from . import background
+from .caching import bump_namespace
+from .collection_stats import rebuild_collection_stats
+from .links import canonical_keys, capture_previews
+from .models import Community, RecommendedProduct, Resource, ResourceCategory
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ROWS = 50000
+MAX_REPORTED_ERRORS = 1000
+# Previews of the rest are fetched when someone first views them
+MAX_PREVIEW_CAPTURE = 1000
+# JSON can't be streamed, so it is read whole; large imports should be CSV
+MAX_JSON_IMPORT_BYTES = 10 * 1024 * 1024
+IMPORT_PREFIX = 'imports/'
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+# field -> (required, max length)
+RESOURCE_FIELDS = {
+    'url': (True, 2000),
+    'title': (True, 200),
+    'remark': (False, None),
+}
+PRODUCT_FIELDS = {
+    'title': (True, 200),
+    'url': (True, 2000),
+    'comment': (False, None),
+    'catalogue_name': (False, 100),
+}
+
+_validate_url = URLValidator(schemes=['http', 'https'])
+
+
+class BulkImportError(ValueError):
+    """The upload as a whole could not be read."""
+
+
+def parse_rows(content, filename=''):
+    """
+    Rows from CSV (with a header line) or JSON (a list of objects, or an
+    object with a ``rows`` list). ``content`` may be str or bytes.
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise BulkImportError('File must be UTF-8 encoded')
+    if filename.lower().endswith('.csv') or not content.lstrip().startswith(('[', '{')):
+        return list(csv.DictReader(io.StringIO(content)))
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise BulkImportError(f'Invalid JSON: {e}')
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list):
+        raise BulkImportError('JSON must be a list of rows or an object with a "rows" list')
+    return data
+
+
+def validate_row(row, fields):
+    """(cleaned values, errors) for one row."""
+    if not isinstance(row, dict):
+        return None, {'row': 'Expected an object'}
+    cleaned, errors = {}, {}
+    for field, (required, max_length) in fields.items():
+        value = row.get(field)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            if required:
+                errors[field] = 'This field is required.'
+            cleaned[field] = None if not required else value
+            continue
+        if max_length and len(value) > max_length:
+            errors[field] = f'Ensure this field has no more than {max_length} characters.'
+        elif field == 'url':
+            try:
+                _validate_url(value)
+            except ValidationError:
+                errors[field] = 'Enter a valid URL.'
+        cleaned[field] = value
+    return cleaned, errors
+
+
+def _new_report(dry_run):
+    return {'dry_run': dry_run, 'total': 0, 'created': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+
+
+def _import(report, rows, fields, existing_keys, build, model, batch_size, new_urls, progress=None):
+    dry_run = report['dry_run']
+    seen = set(existing_keys)
+    pending = []
+
+    def flush():
+        keys = canonical_keys(values['url'] for values in pending)
+        batch = []
+        for values in pending:
+            key = keys[values['url']]
+            if key in seen:
+                report['duplicates'] += 1
+                continue
+            seen.add(key)
+            new_urls.append(values['url'])
+            batch.append(build(values, key))
+        pending.clear()
+        if batch and not dry_run:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=batch_size)
+        report['created'] += len(batch)
+        if progress:
+            progress(report)
+
+    for number, row in enumerate(rows, start=1):
+        report['total'] += 1
+        cleaned, errors = validate_row(row, fields)
+        if errors:
+            report['error_count'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': number, 'errors': errors})
+            continue
+        pending.append(cleaned)
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+
+
+def _queue_previews(urls):
+    urls = urls[:MAX_PREVIEW_CAPTURE]
+    if urls:
+        transaction.on_commit(lambda: background.submit(capture_previews, urls))
+
+
+def import_resources(category, user, rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE, queue_previews=True,
+                     progress=None):
+    """
+    Import resource rows into ``category``; returns the report. ``progress``
+    is called with the report so far after every batch.
+    """
+    existing = Resource.objects.filter(category=category).values_list('url_key', flat=True).iterator()
+    report, new_urls = _new_report(dry_run), []
+    try:
+        _import(
+            report, rows, RESOURCE_FIELDS, existing,
+            lambda values, key: Resource(category=category, created_by=user, url_key=key, **values),
+            Resource, batch_size, new_urls, progress,
+        )
+    finally:
+        # Also after a failure part way, for the batches already inserted
+        if report['created'] and not dry_run:
+            rebuild_collection_stats([category.id])
+            bump_namespace('feed', category.community_id)
+            if queue_previews:
+                _queue_previews(new_urls)
+    return report
+
+
+def import_products(community_id, user, rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE, queue_previews=True,
+                    progress=None):
+    """Import product rows into a community; returns the report."""
+    existing = RecommendedProduct.objects.filter(community_id=community_id).values_list('url_key', flat=True).iterator()
+    report, new_urls = _new_report(dry_run), []
+    try:
+        _import(
+            report, rows, PRODUCT_FIELDS, existing,
+            lambda values, key: RecommendedProduct(community_id=community_id, created_by=user, url_key=key, **values),
+            RecommendedProduct, batch_size, new_urls, progress,
+        )
+    finally:
+        if report['created'] and not dry_run:
+            bump_namespace('products', community_id)
+            if queue_previews:
+                _queue_previews(new_urls)
+    return report
+
+
+def _job_dir(job_id):
+    return f'{IMPORT_PREFIX}{job_id}/'
+
+
+def _job_name(job_id):
+    return f'bulk_import:{job_id}'
+
+
+def progress_key(job_id):
+    return f'bulk_import_progress:{job_id}'
+
+
+def get_progress(job_id):
+    return cache.get(progress_key(job_id))
+
+
+def _is_json(content, filename):
+    name = filename.lower()
+    if name.endswith(('.json', '.csv')):
+        return name.endswith('.json')
+    content.seek(0)
+    head = content.read(64)
+    content.seek(0)
+    if isinstance(head, bytes):
+        head = head.decode('utf-8-sig', errors='ignore')
+    return head.lstrip().startswith(('[', '{'))
+
+
+def start_import(kind, target_id, user, content, filename='', dry_run=False):
+    """
+    Store an upload (a Django ``File``) and queue its import; returns the
+    initial progress. ``kind`` is 'resources' (``target_id`` is a collection)
+    or 'products' (a community).
+    """
+    is_json = _is_json(content, filename)
+    if is_json and content.size > MAX_JSON_IMPORT_BYTES:
+        raise BulkImportError(
+            f'JSON imports are limited to {MAX_JSON_IMPORT_BYTES // (1024 * 1024)} MB; upload a CSV file instead'
+        )
+    job_id = uuid.uuid4().hex
+    directory = _job_dir(job_id)
+    payload = default_storage.save(f"{directory}rows.{'json' if is_json else 'csv'}", content)
+    spec = {
+        'job_id': job_id,
+        'kind': kind,
+        'target_id': target_id,
+        'user_id': user.id,
+        'dry_run': dry_run,
+        'payload': payload,
+    }
+    # Written last: a job description means the payload is complete
+    default_storage.save(f'{directory}job.json', ContentFile(json.dumps(spec).encode()))
+
+    state = {'job_id': job_id, 'kind': kind, 'user_id': user.id, 'status': 'pending', 'report': _new_report(dry_run)}
+    cache.set(progress_key(job_id), state, PROGRESS_TIMEOUT)
+    transaction.on_commit(lambda: background.submit(run_import_job, job_id))
+    return state
+
+
+def _open_rows(name):
+    """An open file and its rows: streamed for CSV, read whole for JSON."""
+    f = default_storage.open(name, 'rb')
+    if name.endswith('.json'):
+        try:
+            return f, parse_rows(f.read(), name)
+        finally:
+            f.close()
+    return f, csv.DictReader(io.TextIOWrapper(f, encoding='utf-8-sig', newline=''))
+
+
+def _import_payload(spec, progress, batch_size):
+    if spec['kind'] == 'resources':
+        target = ResourceCategory.objects.filter(
+            id=spec['target_id'], community__is_deleting=False
+        ).first()
+    else:
+        target = Community.objects.filter(id=spec['target_id'], is_deleting=False).first()
+    if target is None:
+        raise BulkImportError('The collection or community no longer exists')
+    user = get_user_model().objects.filter(id=spec['user_id'], is_active=True).first()
+    if user is None:
+        raise BulkImportError('The importing account no longer exists')
+
+    f, rows = _open_rows(spec['payload'])
+    with f:
+        # A cheap counting pass, so an oversized file imports nothing
+        if sum(1 for _ in rows) > MAX_IMPORT_ROWS:
+            raise BulkImportError(f'Imports are limited to {MAX_IMPORT_ROWS} rows')
+    f, rows = _open_rows(spec['payload'])
+    with f:
+        if spec['kind'] == 'resources':
+            return import_resources(target, user, rows, spec['dry_run'], batch_size, progress=progress)
+        return import_products(target.id, user, rows, spec['dry_run'], batch_size, progress=progress)
+
+
+def run_import_job(job_id, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Run a stored import; returns its final progress, or None if it already
+    finished or another process is running it.
+    """
+    job = _job_name(job_id)
+    if not background.claim(job):
+        return None
+    try:
+        directory = _job_dir(job_id)
+        if not default_storage.exists(f'{directory}job.json'):
+            return None
+        with default_storage.open(f'{directory}job.json', 'rb') as f:
+            spec = json.loads(f.read())
+        return _run_import(spec, job, batch_size)
+    finally:
+        background.release(job)
+
+
+def _run_import(spec, job, batch_size):
+    key = progress_key(spec['job_id'])
+    state = {
+        'job_id': spec['job_id'],
+        'kind': spec['kind'],
+        'user_id': spec['user_id'],
+        'status': 'running',
+        'report': _new_report(spec['dry_run']),
+        'started_at': time.time(),
+    }
+
+    def report(progress=None):
+        if progress is not None:
+            state['report'] = progress
+        state['updated_at'] = time.time()
+        cache.set(key, state, PROGRESS_TIMEOUT)
+        background.renew(job)
+
+    report()
+    try:
+        state['report'] = _import_payload(spec, report, batch_size)
+        state['status'] = 'done'
+    except BulkImportError as e:
+        state.update(status='failed', error=str(e))
+    except UnicodeDecodeError:
+        state.update(status='failed', error='File must be UTF-8 encoded')
+    except csv.Error as e:
+        state.update(status='failed', error=f'Invalid CSV: {e}')
+    except Exception as e:
+        logger.exception(f"Bulk import {spec['job_id']} failed: {str(e)}")
+        state.update(status='failed', error='Import failed')
+    finally:
+        # Only a job whose process died keeps its files, for resume_imports
+        directory = _job_dir(spec['job_id'])
+        for name in (spec['payload'], f'{directory}job.json'):
+            default_storage.delete(name)
+        try:
+            os.rmdir(default_storage.path(directory))
+        except (NotImplementedError, OSError):
+            # Object stores have no directories to remove
+            pass
+    state['finished_at'] = time.time()
+    report()
+    return state
+
+
+def resume_imports(batch_size=IMPORT_BATCH_SIZE):
+    """Re-run every stored import whose job no process is working on."""
+    try:
+        job_ids, _ = default_storage.listdir(IMPORT_PREFIX)
+    except FileNotFoundError:
+        return []
+    states = []
+    for job_id in sorted(job_ids):
+        state = run_import_job(job_id, batch_size)
+        if state is not None:
+            states.append(state)
+    return states
@@ -0,0 +1,181 @@
+"""
+Shared caching helpers.
+
+``tiered_cache`` layers a small per-process LRU in front of the shared
+``default`` cache (see ``CACHE_URL`` in settings) and protects expensive
+builders against stampedes: when an entry goes stale one caller rebuilds it
+under a lock while everyone else keeps serving the previous value.
+
+Keys are namespaced and versioned. ``bump_namespace('community', 42)``
+invalidates every key built with ``make_key('community', ..., scope=42)``
+without having to know or delete them individually.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=10):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _version_key(namespace, scope):
+    return f'nsv:{namespace}:{scope}'
+
+
+def namespace_version(namespace, scope=None):
+    shared = caches['default']
+    key = _version_key(namespace, scope)
+    version = shared.get(key)
+    if version is None:
+        shared.add(key, 1, timeout=None)
+        version = shared.get(key, 1)
+    return version
+
+
+def namespace_versions(namespace, scopes):
+    """Current versions for many scopes of a namespace in one cache round trip."""
+    shared = caches['default']
+    keys = {_version_key(namespace, scope): scope for scope in scopes}
+    found = shared.get_many(list(keys))
+    versions = {}
+    for key, scope in keys.items():
+        if key not in found:
+            shared.add(key, 1, timeout=None)
+        versions[scope] = found.get(key, 1)
+    return versions
+
+
+def bump_namespace(namespace, scope=None):
+    shared = caches['default']
+    key = _version_key(namespace, scope)
+    try:
+        return shared.incr(key)
+    except ValueError:
+        # Not set yet (or evicted): any value other than the old one will do
+        version = int(time.time() * 1000)
+        shared.set(key, version, timeout=None)
+        return version
+
+
+def make_key(namespace, *parts, scope=None):
+    version = namespace_version(namespace, scope)
+    suffix = ':'.join(str(part) for part in parts)
+    return f'{namespace}:{scope}:v{version}:{suffix}'
+
+
+class TieredCache:
+    """
+    Local LRU + shared cache with stale-while-revalidate.
+
+    Cached values are shared between threads through the local tier, so
+    builders should return plain data (dicts, lists, bytes) that callers do
+    not mutate.
+    """
+
+    def __init__(self, local_entries=2048, local_ttl=5, lock_timeout=10, stale_grace=60):
+        self.local = LocalLRUCache(max_entries=local_entries, ttl=local_ttl)
+        self.lock_timeout = lock_timeout
+        self.stale_grace = stale_grace
+
+    @property
+    def shared(self):
+        return caches['default']
+
+    def get(self, key, default=None):
+        entry = self._get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, timeout=300):
+        entry = (value, time.time() + timeout)
+        self.shared.set(key, entry, timeout + self.stale_grace)
+        self.local.set(key, entry)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def get_or_set(self, key, builder, timeout=300):
+        entry = self._get_entry(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if fresh_until > time.time() or not self._acquire(key):
+                return value
+        elif not self._acquire(key):
+            value = self._wait_for(key)
+            if value is not _MISSING:
+                return value
+            # The lock holder gave up; build it ourselves rather than fail
+        try:
+            value = builder()
+            self.set(key, value, timeout)
+            return value
+        finally:
+            self._release(key)
+
+    def _get_entry(self, key):
+        entry = self.local.get(key)
+        if entry is None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+        return entry
+
+    def _acquire(self, key):
+        return self.shared.add(f'{key}:lock', 1, self.lock_timeout)
+
+    def _release(self, key):
+        self.shared.delete(f'{key}:lock')
+
+    def _wait_for(self, key):
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            entry = self.shared.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+                return entry[0]
+            delay = min(delay * 2, 0.2)
+        return _MISSING
+
+
+tiered_cache = TieredCache()
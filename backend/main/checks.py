@@ -0,0 +1,53 @@
+"""
+System checks replacing the diagnostics settings used to print at import.
+
+Run ``manage.py check --deploy`` to see the effective configuration.
+"""
+import os
+
+from django.conf import settings
+from django.core.checks import Info, Warning, register
+
+
+def _writable_dir(path):
+    # A missing directory is fine as long as it can be created on first upload
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    return bool(path) and os.access(path, os.W_OK)
+
+
+@register()
+def check_media_root(app_configs, **kwargs):
+    if not settings.DEFAULT_FILE_STORAGE.endswith('FileSystemStorage'):
+        return []
+    if _writable_dir(settings.MEDIA_ROOT):
+        return []
+    return [Warning(
+        f'MEDIA_ROOT {settings.MEDIA_ROOT} is not writable; uploads will fail.',
+        id='main.W001',
+    )]
+
+
+@register(deploy=True)
+def check_static_root(app_configs, **kwargs):
+    if os.path.isdir(settings.STATIC_ROOT):
+        return []
+    return [Warning(
+        f'STATIC_ROOT {settings.STATIC_ROOT} does not exist; run collectstatic.',
+        id='main.W002',
+    )]
+
+
+@register(deploy=True)
+def report_configuration(app_configs, **kwargs):
+    database = settings.DATABASES['default']
+    return [Info(
+        'Configuration: '
+        f"DEBUG={settings.DEBUG}, "
+        f"database={database.get('ENGINE')}, "
+        f"DATABASE_URL set={bool(os.environ.get('DATABASE_URL'))}, "
+        f"storage={settings.DEFAULT_FILE_STORAGE}, "
+        f"cache={settings.CACHES['default']['BACKEND']}, "
+        f"ALLOWED_HOSTS={settings.ALLOWED_HOSTS}",
+        id='main.I001',
+    )]
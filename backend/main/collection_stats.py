@@ -0,0 +1,94 @@
+"""
+Incrementally maintained per-collection statistics.
+
+``CollectionStats`` rows are adjusted with single ``F()`` updates as
+resources, votes and views are written (see signals.py and
+``record_resource_view``), so reading stats for any number of collections
+is one query. Writes that bypass signals (``bulk_create``, ``_raw_delete``,
+queryset ``update``) must call ``rebuild_collection_stats`` for the
+collections they touched; ``manage.py rebuild_collection_stats`` repairs
+any drift.
+"""
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import CollectionStats, Resource, ResourceCategory, Vote
+
+
+def adjust_collection_stats(category_id, rebuild_missing=True, **deltas):
+    """
+    Add ``deltas`` (e.g. resource_count=1) to a collection's counters.
+
+    Deletes pass ``rebuild_missing=False``: while a collection is being
+    deleted its stats row may already be gone, and must not come back.
+    """
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    updated = CollectionStats.objects.filter(category_id=category_id).update(updated_at=timezone.now(), **updates)
+    if not updated and rebuild_missing:
+        # Row missing (collection predates the table or was bulk created)
+        rebuild_collection_stats([category_id])
+
+
+def rebuild_collection_stats(category_ids=None):
+    """Recompute stats from scratch for the given collections (default: all)."""
+    categories = ResourceCategory.objects.all()
+    resources = Resource.objects.all()
+    votes = Vote.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+        resources = resources.filter(category_id__in=category_ids)
+        votes = votes.filter(resource__category_id__in=category_ids)
+
+    resource_totals = {
+        row['category_id']: row
+        for row in resources.values('category_id').annotate(count=Count('id'), views=Sum('views'))
+    }
+    vote_totals = dict(
+        votes.values('resource__category_id').annotate(count=Count('id'))
+        .values_list('resource__category_id', 'count')
+    )
+    rows = [
+        CollectionStats(
+            category_id=category_id,
+            resource_count=resource_totals.get(category_id, {}).get('count', 0),
+            total_views=resource_totals.get(category_id, {}).get('views') or 0,
+            total_votes=vote_totals.get(category_id, 0),
+            updated_at=timezone.now(),
+        )
+        for category_id in categories.values_list('id', flat=True)
+    ]
+    CollectionStats.objects.bulk_create(
+        rows, batch_size=1000, update_conflicts=True, unique_fields=['category'],
+        update_fields=['resource_count', 'total_views', 'total_votes', 'updated_at'],
+    )
+    return len(rows)
+
+
+def record_resource_view(resource_id):
+    """Count one view of a resource; returns the new view count or None."""
+    category_id = Resource.objects.filter(id=resource_id).values_list('category_id', flat=True).first()
+    if category_id is None:
+        return None
+    Resource.objects.filter(id=resource_id).update(views=F('views') + 1)
+    adjust_collection_stats(category_id, total_views=1)
+    return Resource.objects.filter(id=resource_id).values_list('views', flat=True).first()
+
+
+def stats_data(stats):
+    return {
+        'total_resources': stats.resource_count,
+        'total_views': stats.total_views,
+        'total_votes': stats.total_votes,
+        'updated_at': stats.updated_at,
+    }
+
+
+def get_collection_stats_many(category_ids):
+    """{category_id: stats dict} in one query (two if some rows were missing)."""
+    stats = {row.category_id: row for row in CollectionStats.objects.filter(category_id__in=category_ids)}
+    missing = [category_id for category_id in category_ids if category_id not in stats]
+    if missing and rebuild_collection_stats(missing):
+        stats.update({row.category_id: row for row in CollectionStats.objects.filter(category_id__in=missing)})
+    return {category_id: stats_data(row) for category_id, row in stats.items()}
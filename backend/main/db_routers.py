@@ -0,0 +1,96 @@
+"""
+Read-replica routing.
+
+With ``DATABASE_REPLICA_URLS`` set, ``ReplicaRouter`` sends reads to the
+replica aliases and writes to ``default``. ``ReplicaPinningMiddleware``
+keeps a client on the primary for ``REPLICA_PIN_SECONDS`` after it writes,
+so users always read their own writes despite replication lag. The pin is
+stored in a cookie and, because the frontend authenticates with tokens, in
+the shared cache under a hash of the Authorization header.
+"""
+import contextvars
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_COOKIE = 'db_primary_until'
+
+_use_primary = contextvars.ContextVar('db_use_primary', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+@contextmanager
+def use_primary():
+    """Route every read in this block to the primary database."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if _use_primary.get() or not replicas:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def _pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return 'db_pin:' + hashlib.sha256(authorization.encode()).hexdigest()
+
+
+class ReplicaPinningMiddleware:
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        is_write = request.method not in self.SAFE_METHODS
+        token = _use_primary.set(is_write or self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+
+        if is_write and response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    def is_pinned(self, request):
+        try:
+            if float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        key = _pin_key(request)
+        return bool(key and cache.get(key))
+
+    def pin(self, request, response):
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+        key = _pin_key(request)
+        if key:
+            cache.set(key, True, seconds)
@@ -0,0 +1,227 @@
+"""
+Batched deletion of a community and everything that hangs off it.
+
+``Community.delete()`` makes Django's collector load every dependent row
+into memory and issue per-object cascades, which for a large community
+holds one long transaction over tens of thousands of rows. Here each
+dependent table is emptied leaf-first in short ``_raw_delete`` batches,
+stored files are removed once their rows are gone (``_raw_delete`` skips
+the signals that would otherwise release them), members' and voters'
+cached viewer state is dropped once theirs are, and progress is kept
+in the cache so the creator can follow the job.
+
+A job that dies with its web worker leaves the community marked
+``is_deleting``; ``resume_deletions`` (run by ``manage.py
+run_background_jobs``, see background.py) finishes it.
+
+When adding a model that references anything below, add it to
+``deletion_plan`` before its parent.
+"""
+import logging
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from . import background
+from .caching import bump_namespace
+from .media import delete_files
+from .viewer_state import STATE_MODELS, invalidate_viewer_states
+from .models import (
+    Announcement,
+    Answer,
+    AnswerVote,
+    CollectionStats,
+    Community,
+    CommunityView,
+    ForumComment,
+    ForumPost,
+    GalleryImage,
+    Poll,
+    PollOption,
+    PollVote,
+    Question,
+    QuestionVote,
+    Reaction,
+    RecommendedProduct,
+    Resource,
+    ResourceCategory,
+    SavedCollection,
+    SavedImage,
+    SavedProduct,
+    SavedResource,
+    Vote,
+)
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+# Cache namespaces that hold data scoped to a community
+COMMUNITY_NAMESPACES = ['community', 'gallery', 'announcements', 'products', 'spotify_playlist', 'feed']
+
+
+def progress_key(community_id):
+    return f'community_deletion:{community_id}'
+
+
+def get_progress(community_id):
+    return cache.get(progress_key(community_id))
+
+
+def job_name(community_id):
+    return f'community_deletion:{community_id}'
+
+
+def deletion_plan():
+    """(model, lookup to the community id, file fields), children before parents."""
+    return [
+        (Reaction, 'post__community_id', []),
+        (ForumComment, 'post__community_id', []),
+        (ForumPost.likes.through, 'forumpost__community_id', []),
+        (ForumPost, 'community_id', ['media']),
+        (AnswerVote, 'answer__question__community_id', []),
+        (Answer, 'question__community_id', []),
+        (QuestionVote, 'question__community_id', []),
+        (Question, 'community_id', ['media']),
+        (PollVote, 'option__poll__community_id', []),
+        (PollOption, 'poll__community_id', []),
+        (Poll, 'community_id', []),
+        (Announcement, 'community_id', []),
+        (SavedImage, 'image__community_id', []),
+        (GalleryImage, 'community_id', ['image']),
+        (SavedProduct, 'product__community_id', []),
+        (RecommendedProduct, 'community_id', []),
+        (SavedResource, 'resource__category__community_id', []),
+        (Vote, 'resource__category__community_id', []),
+        (Resource, 'category__community_id', []),
+        (SavedCollection, 'collection__community_id', []),
+        (CollectionStats, 'category__community_id', []),
+        (ResourceCategory, 'community_id', ['preview_image']),
+        (CommunityView, 'community_id', []),
+        (apps.get_model('music', 'CommunitySpotifyPlaylist'), 'community_id', []),
+        (Community.members.through, 'community_id', []),
+    ]
+
+
+def viewer_state_of(model):
+    """(user id field, viewer state name) when ``model``'s rows make up users' viewer state."""
+    if model is Community.members.through:
+        return 'customuser_id', 'communities'
+    name = STATE_MODELS.get(model._meta.label)
+    return ('user_id', name) if name else None
+
+
+def _delete_batch(model, pks):
+    """(rows deleted, whether delete signals ran and released the rows' files)."""
+    queryset = model._base_manager.filter(pk__in=pks)
+    try:
+        with transaction.atomic():
+            return queryset._raw_delete(queryset.db), False
+    except IntegrityError:
+        # Something not in the plan still points at these rows; let the
+        # collector find and cascade it
+        logger.warning(f'Falling back to cascading delete for {model._meta.label}')
+        with transaction.atomic():
+            return queryset.delete()[0], True
+
+
+def run_community_deletion(community_id, batch_size=1000, progress=None):
+    """
+    Delete a community in batches. Safe to re-run after an interruption.
+
+    ``progress`` is called with the progress dict after every batch. Returns
+    the final progress dict, or None if another process is already deleting
+    the community.
+    """
+    job = job_name(community_id)
+    if not background.claim(job):
+        return None
+    try:
+        return _run_deletion(community_id, job, batch_size, progress)
+    finally:
+        background.release(job)
+
+
+def resume_deletions(batch_size=1000, progress=None):
+    """Finish every community left marked ``is_deleting`` that no process is working on."""
+    states = []
+    for community_id in Community.objects.filter(is_deleting=True).order_by('id').values_list('id', flat=True):
+        state = run_community_deletion(community_id, batch_size=batch_size, progress=progress)
+        if state is not None:
+            states.append(state)
+    return states
+
+
+def _run_deletion(community_id, job, batch_size, progress):
+    key = progress_key(community_id)
+    state = {
+        'community_id': community_id,
+        'status': 'running',
+        'stage': None,
+        'deleted': {},
+        'files_deleted': 0,
+        'files_failed': 0,
+        'started_at': time.time(),
+    }
+
+    def report():
+        state['updated_at'] = time.time()
+        cache.set(key, state, PROGRESS_TIMEOUT)
+        background.renew(job)
+        if progress:
+            progress(state)
+
+    community = Community.objects.filter(id=community_id).first()
+    if community is None:
+        state['status'] = 'done'
+        report()
+        return state
+
+    try:
+        for model, lookup, file_fields in deletion_plan():
+            label = model._meta.label
+            state['stage'] = label
+            queryset = model._base_manager.filter(**{lookup: community_id}).order_by()
+            viewer_state = viewer_state_of(model)
+            user_field = [viewer_state[0]] if viewer_state else []
+            while True:
+                rows = list(queryset.values_list('pk', *file_fields, *user_field)[:batch_size])
+                if not rows:
+                    break
+                pks = [row[0] for row in rows]
+                names = [name for row in rows for name in row[1:len(file_fields) + 1] if name]
+                deleted, released = _delete_batch(model, pks)
+                if viewer_state:
+                    # _raw_delete skips the signals that would drop these
+                    invalidate_viewer_states({row[-1] for row in rows}, viewer_state[1])
+                state['deleted'][label] = state['deleted'].get(label, 0) + deleted
+                if names and not released:
+                    files_deleted, files_failed = delete_files(names)
+                    state['files_deleted'] += files_deleted
+                    state['files_failed'] += files_failed
+                report()
+
+        state['stage'] = Community._meta.label
+        # Only the community row is left, so the collector has nothing to
+        # load; its post_delete signal releases the banner
+        community.delete()
+        state['deleted'][Community._meta.label] = 1
+    except Exception as e:
+        state['status'] = 'failed'
+        state['error'] = str(e)
+        report()
+        raise
+
+    for namespace in COMMUNITY_NAMESPACES:
+        bump_namespace(namespace, community_id)
+    bump_namespace('trending')
+
+    state['status'] = 'done'
+    state['stage'] = None
+    state['finished_at'] = time.time()
+    report()
+    logger.info(f"Deleted community {community_id}: {sum(state['deleted'].values())} rows in "
+                f"{state['finished_at'] - state['started_at']:.1f}s")
+    return state
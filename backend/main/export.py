@@ -0,0 +1,141 @@
+"""
+Streaming export of everything a community holds.
+
+``iter_ndjson`` and ``iter_csv_zip`` are generators of bytes meant for a
+``StreamingHttpResponse`` (see ``CommunityExportView``) or a file (``manage.py
+export_community``). Rows are read with ``values_list`` in chunks of
+``chunk_size`` and written out before the next chunk is read, so memory
+stays constant however large the community is.
+
+Rows are read through a server-side cursor (``.iterator(chunk_size=...)``)
+where the database allows it. Behind PgBouncer in transaction mode
+(``DISABLE_SERVER_SIDE_CURSORS``) the driver would fetch the whole result
+at once instead, so there each chunk is a separate keyset query on ``id``.
+"""
+import csv
+import io
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router
+
+from .models import (
+    Announcement,
+    Answer,
+    ForumComment,
+    ForumPost,
+    Poll,
+    PollOption,
+    Question,
+    Reaction,
+    RecommendedProduct,
+    Resource,
+    ResourceCategory,
+)
+
+CHUNK_SIZE = 2000
+
+# table -> (model, lookup to the community id, exported fields)
+EXPORT_TABLES = {
+    'posts': (ForumPost, 'community_id', ['id', 'content', 'media', 'media_type', 'created_by_id', 'created_at']),
+    'comments': (ForumComment, 'post__community_id', ['id', 'post_id', 'content', 'created_by_id', 'created_at', 'updated_at']),
+    'reactions': (Reaction, 'post__community_id', ['id', 'post_id', 'user_id', 'reaction_type', 'created_at']),
+    'questions': (Question, 'community_id', ['id', 'content', 'media', 'created_by_id', 'created_at']),
+    'answers': (Answer, 'question__community_id', ['id', 'question_id', 'content', 'votes', 'created_by_id', 'created_at']),
+    'polls': (Poll, 'community_id', ['id', 'question', 'created_by_id', 'created_at']),
+    'poll_options': (PollOption, 'poll__community_id', ['id', 'poll_id', 'text']),
+    'announcements': (Announcement, 'community_id', ['id', 'content', 'created_by_id', 'created_at']),
+    'collections': (ResourceCategory, 'community_id', ['id', 'name', 'description', 'preview_image', 'is_preset', 'views', 'created_by_id', 'created_at']),
+    'resources': (Resource, 'category__community_id', ['id', 'category_id', 'title', 'url', 'remark', 'views', 'created_by_id', 'created_at']),
+    'products': (RecommendedProduct, 'community_id', ['id', 'title', 'url', 'comment', 'catalogue_name', 'created_by_id', 'created_at']),
+}
+
+
+def iter_rows(community_id, table, chunk_size=CHUNK_SIZE):
+    """Yield lists of up to ``chunk_size`` value tuples, in id order."""
+    model, lookup, fields = EXPORT_TABLES[table]
+    rows = model._base_manager.filter(**{lookup: community_id}).order_by('id').values_list(*fields)
+    alias = router.db_for_read(model)
+    if not connections[alias].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        chunk = []
+        for row in rows.using(alias).iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    # id is always the first field
+    last_id = 0
+    while True:
+        chunk = list(rows.using(alias).filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def iter_ndjson(community_id, tables=None, chunk_size=CHUNK_SIZE):
+    """One JSON object per line, each tagged with its ``type`` (table name)."""
+    encoder = DjangoJSONEncoder()
+    for table in tables or EXPORT_TABLES:
+        fields = EXPORT_TABLES[table][2]
+        for chunk in iter_rows(community_id, table, chunk_size):
+            lines = (encoder.encode({'type': table, **dict(zip(fields, row))}) for row in chunk)
+            yield ('\n'.join(lines) + '\n').encode()
+
+
+class _StreamBuffer:
+    """Unseekable file that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_csv_zip(community_id, tables=None, chunk_size=CHUNK_SIZE):
+    """A ZIP archive with one ``<table>.csv`` per table, produced as it is read."""
+    return (part for part in _iter_csv_zip(community_id, tables, chunk_size) if part)
+
+
+def _iter_csv_zip(community_id, tables, chunk_size):
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for table in tables or EXPORT_TABLES:
+            fields = EXPORT_TABLES[table][2]
+            # Sizes are unknown up front, so allow entries over 2 GiB
+            with archive.open(f'{table}.csv', mode='w', force_zip64=True) as entry:
+                text = io.StringIO()
+                writer = csv.writer(text)
+                writer.writerow(fields)
+                for chunk in iter_rows(community_id, table, chunk_size):
+                    writer.writerows(
+                        [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+                        for row in chunk
+                    )
+                    entry.write(text.getvalue().encode())
+                    text.seek(0)
+                    text.truncate()
+                    yield buffer.drain()
+                entry.write(text.getvalue().encode())
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson'),
+    'csv': (iter_csv_zip, 'application/zip', 'zip'),
+}
@@ -0,0 +1,167 @@
+"""
+Cross-community home feed.
+
+The feed is built on read: for every content type one indexed recency
+query over the user's communities returns its newest rows already sorted,
+and ``heapq.merge`` k-way merges those streams into a single timeline.
+
+The first ``FEED_WINDOW`` items are cached per user. The key includes the
+user's community ids and the ``feed`` namespace version of each of them,
+so new content in any of those communities (see signals.py) or joining or
+leaving one moves the user to a fresh key. Pages past the window are read
+straight from the database from the cursor position.
+
+Items are ordered by (created_at, type, id), newest first; the cursor is
+that key for the last item of a page, so pagination is exact even when
+several items share a timestamp (see timeline.py).
+"""
+import hashlib
+
+from .caching import make_key, namespace_versions, tiered_cache
+from .models import Announcement, Community, ForumPost, GalleryImage, Poll, Resource
+from .timeline import Timeline
+
+FEED_WINDOW = 200
+FEED_TIMEOUT = 300
+SNIPPET_LENGTH = 280
+
+
+def _author(user):
+    return {'id': user.id, 'username': user.username}
+
+
+def _post(post):
+    return {
+        'content': post.content[:SNIPPET_LENGTH],
+        'media': post.media.url if post.media else None,
+        'media_type': post.media_type,
+    }
+
+
+def _announcement(announcement):
+    return {'content': announcement.content[:SNIPPET_LENGTH]}
+
+
+def _resource(resource):
+    return {
+        'title': resource.title,
+        'url': resource.url,
+        'remark': (resource.remark or '')[:SNIPPET_LENGTH],
+        'category_id': resource.category_id,
+    }
+
+
+def _poll(poll):
+    return {'question': poll.question}
+
+
+def _image(image):
+    return {'image': image.image.url if image.image else None}
+
+
+# type -> (queryset, community lookup, timestamp field, author field, serializer)
+# The rank of a type is its position here; it breaks timestamp ties.
+SOURCES = {
+    'post': (
+        lambda: ForumPost.objects.select_related('created_by').only(
+            'id', 'content', 'media', 'media_type', 'community_id', 'created_at',
+            'created_by__id', 'created_by__username',
+        ),
+        'community_id', 'created_at', 'created_by', _post,
+    ),
+    'announcement': (
+        lambda: Announcement.objects.select_related('created_by').only(
+            'id', 'content', 'community_id', 'created_at', 'created_by__id', 'created_by__username',
+        ),
+        'community_id', 'created_at', 'created_by', _announcement,
+    ),
+    'resource': (
+        lambda: Resource.objects.select_related('created_by', 'category').only(
+            'id', 'title', 'url', 'remark', 'category_id', 'category__community_id', 'created_at',
+            'created_by__id', 'created_by__username',
+        ),
+        'category__community_id', 'created_at', 'created_by', _resource,
+    ),
+    'poll': (
+        lambda: Poll.objects.select_related('created_by').only(
+            'id', 'question', 'community_id', 'created_at', 'created_by__id', 'created_by__username',
+        ),
+        'community_id', 'created_at', 'created_by', _poll,
+    ),
+    'image': (
+        lambda: GalleryImage.objects.select_related('uploaded_by').only(
+            'id', 'image', 'community_id', 'uploaded_at', 'uploaded_by__id', 'uploaded_by__username',
+        ),
+        'community_id', 'uploaded_at', 'uploaded_by', _image,
+    ),
+}
+timeline = Timeline(SOURCES, 'created_at')
+encode_cursor = timeline.encode_cursor
+decode_cursor = timeline.decode_cursor
+
+
+def _stream(item_type, community_ids, communities, limit, cursor):
+    queryset, community_lookup, timestamp_field, author_field, serialize = SOURCES[item_type]
+    rows = queryset().filter(**{f'{community_lookup}__in': community_ids})
+
+    def build(row):
+        community_id = row.category.community_id if item_type == 'resource' else row.community_id
+        return {
+            'community': communities[community_id],
+            'created_by': _author(getattr(row, author_field)),
+            **serialize(row),
+        }
+
+    return timeline.stream(item_type, rows, timestamp_field, limit, cursor, build)
+
+
+def fetch_items(community_ids, communities, limit, cursor=None):
+    """The ``limit`` newest items after ``cursor`` across all content types."""
+    if not community_ids:
+        return []
+    streams = [_stream(item_type, community_ids, communities, limit, cursor) for item_type in SOURCES]
+    return timeline.merge(streams, limit)
+
+
+def user_communities(user):
+    rows = Community.objects.filter(members=user, is_deleting=False).order_by('id').values_list('id', 'name')
+    return {community_id: {'id': community_id, 'name': name} for community_id, name in rows}
+
+
+def get_timeline_window(user, communities):
+    community_ids = list(communities)
+    versions = namespace_versions('feed', community_ids)
+    fingerprint = ','.join(f'{community_id}.{versions[community_id]}' for community_id in community_ids)
+    digest = hashlib.sha256(fingerprint.encode()).hexdigest()
+    key = make_key('feed', 'window', digest, scope=user.id)
+    return tiered_cache.get_or_set(
+        key, lambda: fetch_items(community_ids, communities, FEED_WINDOW), timeout=FEED_TIMEOUT,
+    )
+
+
+def get_feed_page(user, page_size, cursor=None):
+    """
+    Returns (items, next_cursor) for one page of the user's feed. Items from
+    the cached window are shared with other requests; copy before changing.
+    """
+    communities = user_communities(user)
+    window = get_timeline_window(user, communities)
+
+    if cursor is None:
+        start = 0
+    else:
+        position = timeline.cursor_key(cursor)
+        start = next((i for i, item in enumerate(window) if timeline.sort_key(item) < position), len(window))
+
+    items = window[start:start + page_size]
+    window_is_complete = len(window) < FEED_WINDOW
+    if len(items) < page_size and not window_is_complete:
+        # Past the cached window: continue from the database
+        resume = timeline.position(items[-1]) if items else cursor
+        items += fetch_items(list(communities), communities, page_size - len(items), resume)
+
+    exhausted = len(items) < page_size or (
+        window_is_complete and start + page_size >= len(window)
+    )
+    next_cursor = None if exhausted or not items else encode_cursor(items[-1])
+    return items, next_cursor
@@ -0,0 +1,311 @@
+"""
+Outbound HTTP for link previews (and anything else fetching user-supplied URLs).
+
+``fetch`` is the only way this app should request a URL someone typed in.
+Every request, including each redirect hop:
+
+- must be http(s) on a standard port, to a host whose addresses are all
+  public; the connected peer is checked again before the body is read, so
+  a DNS answer that changes between the check and the connect is caught;
+- must be allowed by the host's robots.txt (kept for a day), whose
+  ``Crawl-delay`` slows the host's rate down further;
+- takes a token from the host's bucket (``HOST_RATE`` per second, bursts of
+  ``HOST_BURST``) and is refused while the host has asked us to back off
+  with 429/503 ``Retry-After`` or has just timed out;
+- reads at most ``max_bytes`` of a body whose type is in ``accept``, within
+  ``DEADLINE`` seconds overall.
+
+Buckets, backoff and robots.txt live in the shared cache, so the limits hold
+across worker processes (approximately: buckets are read and written without
+a lock). Connections are pooled per thread.
+"""
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'AestheticCommunitiesBot/1.0 (link previews)'
+# Product token matched against robots.txt User-agent lines
+ROBOTS_AGENT = 'AestheticCommunitiesBot'
+
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+MAX_HTML_BYTES = 1024 * 1024
+MAX_ROBOTS_BYTES = 64 * 1024
+
+ALLOWED_PORTS = {80, 443, 8080, 8443}
+MAX_REDIRECTS = 5
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+DEADLINE = 10
+
+HOST_RATE = 1.0
+HOST_BURST = 5
+DEFAULT_BACKOFF = 60
+MAX_BACKOFF = 60 * 60
+ROBOTS_TIMEOUT = 60 * 60 * 24
+# robots.txt that could not be fetched is tried again sooner
+ROBOTS_RETRY = 60 * 60
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+_local = threading.local()
+
+
+class FetchError(Exception):
+    """The URL could not be fetched."""
+
+
+class FetchBlocked(FetchError):
+    """The URL may not be fetched at all (scheme, address or robots.txt)."""
+
+
+class FetchThrottled(FetchError):
+    """The host is rate limited or backing off; try again after ``retry_after`` seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FetchResult:
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def encoding(self):
+        from requests.utils import get_encoding_from_headers
+        return get_encoding_from_headers(self.headers) or 'utf-8'
+
+    @property
+    def text(self):
+        try:
+            return self.content.decode(self.encoding, errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=4, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+        })
+        _local.session = session
+    return session
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _check_url(url):
+    """(scheme, host, port) of a URL we may connect to; raises FetchBlocked."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+        raise FetchBlocked('Only http and https URLs can be fetched')
+    try:
+        host, port = parts.hostname, parts.port or (443 if scheme == 'https' else 80)
+    except ValueError:
+        raise FetchBlocked('Invalid port')
+    if not host:
+        raise FetchBlocked('URL has no host')
+    if port not in ALLOWED_PORTS:
+        raise FetchBlocked(f'Port {port} is not allowed')
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError):
+        raise FetchError(f'Could not resolve {host}')
+    if not addresses or not all(_is_public(address) for address in addresses):
+        raise FetchBlocked(f'{host} is not a public address')
+    return scheme, host, port
+
+
+def _check_peer(response):
+    sock = getattr(response.raw.connection, 'sock', None)
+    if sock is None:
+        # Closing connections hand their socket over to the body reader
+        sock = getattr(getattr(getattr(response.raw._fp, 'fp', None), 'raw', None), '_sock', None)
+    if sock is None:
+        # Nothing left to read from
+        return
+    if not _is_public(sock.getpeername()[0]):
+        raise FetchBlocked('Connected to a non-public address')
+
+
+def _backoff_key(host):
+    return f'fetch_backoff:{host}'
+
+
+def _bucket_key(host):
+    return f'fetch_bucket:{host}'
+
+
+def back_off(host, seconds=DEFAULT_BACKOFF):
+    """Stop fetching from ``host`` for ``seconds``."""
+    seconds = max(1, min(int(seconds), MAX_BACKOFF))
+    logger.info(f"Backing off {host} for {seconds}s")
+    cache.set(_backoff_key(host), time.time() + seconds, seconds)
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After', '').strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError, IndexError):
+        return DEFAULT_BACKOFF
+
+
+def _take_token(host, rate):
+    """Seconds until ``host`` may be fetched again; 0 after taking a token."""
+    until = cache.get(_backoff_key(host))
+    now = time.time()
+    if until is not None and until > now:
+        return until - now
+    key = _bucket_key(host)
+    tokens, stamp = cache.get(key) or (HOST_BURST, now)
+    tokens = min(HOST_BURST, tokens + (now - stamp) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    cache.set(key, (tokens - 1, now), int(HOST_BURST / rate) + 60)
+    return 0
+
+
+def _acquire(host, rate, wait):
+    deadline = time.monotonic() + wait
+    while True:
+        delay = _take_token(host, rate)
+        if not delay:
+            return
+        if time.monotonic() + delay > deadline:
+            raise FetchThrottled(f'Too many requests to {host}', int(delay) + 1)
+        time.sleep(delay)
+
+
+def _request(url, host, rate, wait, accept, max_bytes, truncate, started):
+    """One request with no redirects followed; returns (response, body or None)."""
+    import requests
+
+    _acquire(host, rate, wait)
+    try:
+        response = _session().get(
+            url, stream=True, allow_redirects=False,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        )
+    except requests.Timeout:
+        back_off(host)
+        raise FetchError(f'{host} timed out')
+    except requests.RequestException as e:
+        raise FetchError(f'Could not fetch {url}: {e.__class__.__name__}')
+
+    # Redirects are followed (and checked) one hop at a time by fetch()
+    with response:
+        _check_peer(response)
+        if response.status_code in REDIRECT_STATUSES:
+            return response, None
+        if response.status_code in (429, 503):
+            seconds = _retry_after(response)
+            back_off(host, seconds)
+            raise FetchThrottled(f'{host} asked us to slow down', max(1, int(seconds)))
+        if response.status_code >= 400:
+            raise FetchError(f'{host} returned HTTP {response.status_code}')
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if accept and content_type not in accept:
+            raise FetchError(f'Unsupported content type {content_type or "(none)"}')
+        length = response.headers.get('Content-Length', '')
+        if not truncate and length.isdigit() and int(length) > max_bytes:
+            raise FetchError('Response is too large')
+
+        body = bytearray()
+        try:
+            for chunk in response.iter_content(64 * 1024):
+                body += chunk
+                if len(body) > max_bytes:
+                    if truncate:
+                        del body[max_bytes:]
+                        break
+                    raise FetchError('Response is too large')
+                if time.monotonic() - started > DEADLINE:
+                    raise FetchError(f'{host} is too slow')
+        except requests.RequestException as e:
+            raise FetchError(f'Could not read {url}: {e.__class__.__name__}')
+        return response, bytes(body)
+
+
+def _robots(scheme, host, port, wait):
+    """(parser or None, rate) for a host, reading robots.txt at most once a day."""
+    origin = f'{scheme}://{host}' if port in (80, 443) else f'{scheme}://{host}:{port}'
+    key = f'fetch_robots:{origin}'
+    text = cache.get(key)
+    if text is None:
+        try:
+            response, body = _request(
+                origin + '/robots.txt', host, HOST_RATE, wait, None,
+                MAX_ROBOTS_BYTES, True, time.monotonic(),
+            )
+            text = body.decode('utf-8', errors='replace') if body is not None else ''
+            cache.set(key, text, ROBOTS_TIMEOUT)
+        except FetchThrottled:
+            raise
+        except FetchError:
+            # Missing or unreachable robots.txt: no restrictions
+            text = ''
+            cache.set(key, text, ROBOTS_RETRY)
+    if not text:
+        return None, HOST_RATE
+    parser = RobotFileParser()
+    parser.parse(text.splitlines())
+    delay = parser.crawl_delay(ROBOTS_AGENT)
+    rate = min(HOST_RATE, 1 / float(delay)) if delay else HOST_RATE
+    return parser, rate
+
+
+def fetch(url, accept=HTML_TYPES, max_bytes=MAX_HTML_BYTES, truncate=False, wait=0):
+    """
+    GET ``url`` within the limits above and return a ``FetchResult``.
+
+    ``truncate`` keeps the first ``max_bytes`` of a larger body instead of
+    failing (enough for an HTML head). ``wait`` is how long to wait for the
+    host's rate limit before raising ``FetchThrottled``. Raises
+    ``FetchError`` (or one of its subclasses) on any failure.
+    """
+    started = time.monotonic()
+    for _ in range(MAX_REDIRECTS + 1):
+        scheme, host, port = _check_url(url)
+        robots, rate = _robots(scheme, host, port, wait)
+        if robots is not None and not robots.can_fetch(ROBOTS_AGENT, url):
+            raise FetchBlocked(f'{host} does not allow fetching this page')
+        response, body = _request(url, host, rate, wait, accept, max_bytes, truncate, started)
+        if body is not None:
+            return FetchResult(url, response.status_code, response.headers, body)
+        location = response.headers.get('Location')
+        if not location:
+            raise FetchError(f'{host} redirected without a location')
+        url = urljoin(url, location)
+    raise FetchError('Too many redirects')
@@ -0,0 +1,141 @@
+"""
+A user's saved images, resources, products and collections as one stream.
+
+Each saved-item table is read with a single indexed (user, saved_at) query
+that joins everything the item needs, and ``heapq.merge`` interleaves the
+four sorted streams, so a page costs four queries however many items it
+holds. Collection sizes come from ``CollectionStats`` and resource preview
+images and their thumbnails from the cache, never per row.
+
+Items are ordered by (saved_at, type, id), newest first; the cursor is that
+key for the last item of a page (see timeline.py).
+"""
+from .collection_stats import get_collection_stats_many
+from .links import cached_preview_images
+from .models import CollectionStats, SavedCollection, SavedImage, SavedProduct, SavedResource
+from .thumbnails import thumbnail_urls
+from .timeline import Timeline
+
+
+def _community(community):
+    return {'id': community.id, 'name': community.name} if community else None
+
+
+def _image(saved):
+    image = saved.image
+    return {
+        'image_id': image.id,
+        'image_url': image.image.url if image.image else None,
+        'community': _community(image.community),
+    }
+
+
+def _resource(saved):
+    resource = saved.resource
+    return {
+        'resource_id': resource.id,
+        'title': resource.title,
+        'url': resource.url,
+        'collection_id': resource.category_id,
+        'collection_name': resource.category.name,
+        'community': _community(resource.category.community),
+    }
+
+
+def _product(saved):
+    product = saved.product
+    return {
+        'product_id': product.id,
+        'title': product.title,
+        'url': product.url,
+        'catalogue_name': product.catalogue_name,
+        'community': _community(product.community),
+    }
+
+
+def _collection(saved):
+    collection = saved.collection
+    return {
+        'collection_id': collection.id,
+        'name': collection.name,
+        'views': collection.views,
+        'preview_image': collection.preview_image.url if collection.preview_image else None,
+        'community': _community(collection.community),
+    }
+
+
+# type -> (queryset, serializer). The rank of a type is its position here.
+SOURCES = {
+    'image': (
+        lambda: SavedImage.objects.select_related('image__community'),
+        _image,
+    ),
+    'resource': (
+        lambda: SavedResource.objects.select_related('resource__category__community'),
+        _resource,
+    ),
+    'product': (
+        lambda: SavedProduct.objects.select_related('product__community'),
+        _product,
+    ),
+    'collection': (
+        lambda: SavedCollection.objects.select_related('collection__community', 'collection__stats'),
+        _collection,
+    ),
+}
+timeline = Timeline(SOURCES, 'saved_at')
+encode_cursor = timeline.encode_cursor
+decode_cursor = timeline.decode_cursor
+
+
+def _stream(item_type, user, limit, cursor):
+    queryset, serialize = SOURCES[item_type]
+    rows = queryset().filter(user=user)
+    return timeline.stream(
+        item_type, rows, 'saved_at', limit, cursor,
+        lambda row: {**serialize(row), '_row': row},
+    )
+
+
+def _attach_collection_stats(items):
+    rows = [item['_row'] for item in items if item['type'] == 'collection']
+    stats = {}
+    for saved in rows:
+        try:
+            stats[saved.collection_id] = saved.collection.stats.resource_count
+        except CollectionStats.DoesNotExist:
+            pass
+    missing = [saved.collection_id for saved in rows if saved.collection_id not in stats]
+    if missing:
+        for collection_id, data in get_collection_stats_many(missing).items():
+            stats[collection_id] = data['total_resources']
+    for item in items:
+        if item['type'] == 'collection':
+            item['resource_count'] = stats.get(item['collection_id'], 0)
+
+
+def _attach_preview_images(items, request):
+    resources = [item for item in items if item['type'] == 'resource']
+    previews = cached_preview_images(item['url'] for item in resources)
+    thumbnails = thumbnail_urls(previews.values(), request)
+    for item in resources:
+        item['preview_image'] = previews.get(item['url'])
+        item['thumbnail'] = thumbnails.get(item['preview_image'])
+
+
+def get_library_page(user, page_size, cursor=None, request=None):
+    """
+    Returns (items, next_cursor) for one page of the user's saved items.
+    Thumbnail links are absolute when ``request`` is given.
+    """
+    streams = [_stream(item_type, user, page_size + 1, cursor) for item_type in SOURCES]
+    items = timeline.merge(streams, page_size + 1)
+    has_next = len(items) > page_size
+    items = items[:page_size]
+
+    _attach_collection_stats(items)
+    _attach_preview_images(items, request)
+    for item in items:
+        del item['_row']
+    next_cursor = encode_cursor(items[-1]) if has_next else None
+    return items, next_cursor
@@ -0,0 +1,195 @@
+"""
+Canonical links and the previews shared between them.
+
+Resources and products store ``url_key``, the hash of their canonical URL
+(``utils.canonical_url``: case, default ports, tracking parameters and
+trailing slashes normalized away), so "is this link already here" is an
+indexed lookup. Each canonical URL is fetched for a preview at most once;
+the result is a ``LinkPreview`` row, read through the cache, used by every
+resource and product with that key. The preview image is registered for
+local thumbnails (see thumbnails.py).
+
+A fetch that ends on another page records the redirect: the alias row gets
+``resolved_key``, existing rows with the alias key move to the final key,
+and ``canonical_keys`` maps the alias for later inserts too.
+"""
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .fetcher import FetchError, FetchThrottled
+from .models import LinkPreview, RecommendedProduct, Resource
+from .thumbnails import capture_images, register_images
+from .utils import canonical_url, fetch_preview_data, url_key
+
+PREVIEW_TIMEOUT = 60 * 60 * 24
+# A page that had no preview is tried again after this long
+PREVIEW_RETRY_AFTER = timedelta(hours=1)
+
+# How long a background capture waits for a busy host before leaving the
+# rest of its links for the next capture
+CAPTURE_WAIT = 5
+
+PREVIEW_FIELDS = ['title', 'description', 'image', 'domain']
+
+_MISS = {}
+
+
+def _cache_key(key):
+    return f'link_preview:{key}'
+
+
+def canonical_keys(urls):
+    """{url: key}, following redirects learned from earlier fetches (one query)."""
+    keys = {url: url_key(url) for url in set(urls)}
+    aliases = dict(
+        LinkPreview.objects.filter(url_key__in=set(keys.values())).exclude(resolved_key='')
+        .values_list('url_key', 'resolved_key')
+    )
+    return {url: aliases.get(key, key) for url, key in keys.items()}
+
+
+def canonical_key(url):
+    return canonical_keys([url])[url]
+
+
+def _preview_data(row):
+    if row is None:
+        return None
+    if not (row.image or row.title) and row.fetched_at < timezone.now() - PREVIEW_RETRY_AFTER:
+        # Old miss: worth another try
+        return None
+    return {field: getattr(row, field) for field in PREVIEW_FIELDS}
+
+
+def get_link_previews(urls):
+    """
+    {url: preview dict} for URLs whose page has been fetched, in one cache
+    round trip plus one query for keys not cached. Pages fetched without
+    finding a preview map to an empty dict.
+    """
+    keys = {url: url_key(url) for url in set(urls)}
+    cache_keys = {_cache_key(key): key for key in set(keys.values())}
+    found = {cache_keys[k]: value for k, value in cache.get_many(list(cache_keys)).items()}
+
+    missing = set(keys.values()) - found.keys()
+    if missing:
+        rows = {row.url_key: row for row in LinkPreview.objects.filter(url_key__in=missing)}
+        resolved = {row.resolved_key for row in rows.values() if row.resolved_key} - rows.keys()
+        if resolved:
+            rows.update({row.url_key: row for row in LinkPreview.objects.filter(url_key__in=resolved)})
+        hits, misses = {}, {}
+        for key in missing:
+            row = rows.get(key)
+            if row is not None and row.resolved_key:
+                row = rows.get(row.resolved_key)
+            data = _preview_data(row)
+            if data is None:
+                continue
+            if data['image'] or data['title']:
+                found[key] = hits[_cache_key(key)] = data
+            else:
+                found[key] = misses[_cache_key(key)] = _MISS
+        if hits:
+            cache.set_many(hits, PREVIEW_TIMEOUT)
+        if misses:
+            cache.set_many(misses, int(PREVIEW_RETRY_AFTER.total_seconds()))
+
+    return {url: found[key] for url, key in keys.items() if key in found}
+
+
+def cached_preview_images(urls):
+    """{url: image url or None} for links whose page has been fetched."""
+    return {url: data.get('image') or None for url, data in get_link_previews(urls).items()}
+
+
+def remember_preview(url, data):
+    """
+    Store what fetching ``url`` found (``fetch_preview_data``'s result, or None
+    if the fetch failed) for every link with the same canonical URL.
+    """
+    key = url_key(url)
+    values = {field: (data or {}).get(field) or '' for field in PREVIEW_FIELDS}
+    values['title'] = values['title'][:500]
+    values['domain'] = values['domain'][:255]
+    resolved_url = (data or {}).get('resolved_url')
+    resolved_key = url_key(resolved_url) if resolved_url else key
+
+    if resolved_key != key:
+        LinkPreview.objects.update_or_create(
+            url_key=resolved_key, defaults={'url': canonical_url(resolved_url)[:2000], 'resolved_key': '', **values},
+        )
+        LinkPreview.objects.update_or_create(
+            url_key=key, defaults={'url': canonical_url(url)[:2000], 'resolved_key': resolved_key, **values},
+        )
+        Resource.objects.filter(url_key=key).update(url_key=resolved_key)
+        RecommendedProduct.objects.filter(url_key=key).update(url_key=resolved_key)
+    else:
+        LinkPreview.objects.update_or_create(
+            url_key=key, defaults={'url': canonical_url(url)[:2000], 'resolved_key': '', **values},
+        )
+    cache.delete_many([_cache_key(key), _cache_key(resolved_key)])
+    if values['image']:
+        register_images([values['image']])
+
+
+def preview_image(url):
+    """
+    Preview image of ``url`` (None if its page has none), fetching the page
+    only if no link to it was fetched before. Raises ``FetchError``.
+    """
+    known = cached_preview_images([url])
+    if url in known:
+        return known[url]
+    try:
+        data = fetch_preview_data(url)
+    except FetchThrottled:
+        raise
+    except FetchError:
+        remember_preview(url, None)
+        raise
+    remember_preview(url, data)
+    return data['image'] or None
+
+
+def capture_previews(urls):
+    """Fetch and store previews for the URLs whose page was never fetched."""
+    known = get_link_previews(urls)
+    pending = {}
+    for url in urls:
+        if url not in known:
+            # One fetch per canonical URL
+            pending.setdefault(url_key(url), url)
+    throttled, images = set(), []
+    for url in pending.values():
+        host = urlsplit(url).hostname
+        if host in throttled:
+            continue
+        try:
+            data = fetch_preview_data(url, wait=CAPTURE_WAIT)
+        except FetchThrottled:
+            # Not a miss: fetched again by a later capture
+            throttled.add(host)
+            continue
+        except FetchError:
+            data = None
+        remember_preview(url, data)
+        if data and data['image']:
+            images.append(data['image'])
+    # Thumbnails too, so cards link straight to the stored files
+    capture_images(images, wait=CAPTURE_WAIT)
+
+
+def link_stats(keys):
+    """{key: {'collections', 'total_views'}} across every resource sharing a link."""
+    rows = (
+        Resource.objects.filter(url_key__in=set(keys)).values('url_key')
+        .annotate(collections=Count('category', distinct=True), total_views=Sum('views'))
+    )
+    return {
+        row['url_key']: {'collections': row['collections'], 'total_views': row['total_views'] or 0}
+        for row in rows
+    }
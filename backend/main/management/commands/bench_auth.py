@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from main.authentication import CachedTokenAuthentication, invalidate_token
+from main.models import CustomUser
+import time
+
+
+class Command(BaseCommand):
+    help = 'Measures per-request authentication cost with and without the token cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user, _ = CustomUser.objects.get_or_create(
+            email='bench-auth@example.com',
+            defaults={'username': 'bench-auth'}
+        )
+        try:
+            self.measure(user, options['requests'])
+        finally:
+            # Deleting the user also deletes its token and profile
+            user.delete()
+
+    def measure(self, user, count):
+        token, _ = Token.objects.get_or_create(user=user)
+        invalidate_token(token.key)
+        factory = APIRequestFactory()
+
+        for name, authenticator in [
+            ('TokenAuthentication', TokenAuthentication()),
+            ('CachedTokenAuthentication', CachedTokenAuthentication()),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(count):
+                    request = Request(factory.get('/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+                    authed_user, _ = authenticator.authenticate(request)
+                    authed_user.is_active
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name}: {elapsed / count * 1e6:.1f} us/request, '
+                f'{len(queries) / count:.2f} queries/request'
+            )
+
+        invalidate_token(token.key)
+        backend = caches['default'].__class__.__name__
+        self.stdout.write(self.style.SUCCESS(f'Cache backend: {backend}'))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from main.models import Community
+import statistics
+import time
+
+FAN_OUT = [
+    '/api/communities/{id}/',
+    '/api/communities/{id}/membership/',
+    '/api/communities/{id}/announcements/',
+    '/api/communities/{id}/gallery/',
+    '/api/communities/{id}/forum/posts/',
+    '/api/communities/{id}/forum/questions/',
+    '/api/communities/{id}/forum/polls/',
+    '/api/communities/{id}/products/',
+    '/api/resources/categories/?community_id={id}',
+    '/api/communities/{id}/spotify-playlist/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares loading a community page through the per-tab endpoints with '
+        'the single /home/ endpoint (server time, queries and bytes per page)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--communities', type=int, default=10)
+        parser.add_argument('--rounds', type=int, default=3)
+        parser.add_argument('--limit', type=int, default=20, help='Per-section limit for /home/')
+
+    def handle(self, *args, **options):
+        communities = list(Community.objects.filter(is_deleting=False).order_by('id')[:options['communities']])
+        if not communities:
+            raise CommandError('No communities found; run generate_synthetic_data first')
+
+        strategies = {
+            'fan-out': lambda community_id: [path.format(id=community_id) for path in FAN_OUT],
+            'home': lambda community_id: [f"/api/communities/{community_id}/home/?limit={options['limit']}"],
+        }
+        results = {name: {'ms': [], 'queries': [], 'bytes': [], 'requests': 0} for name in strategies}
+
+        for community in communities:
+            member = community.members.first() or community.created_by
+            token, _ = Token.objects.get_or_create(user=member)
+            client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+            for _ in range(options['rounds']):
+                for name, paths in strategies.items():
+                    result = results[name]
+                    size = 0
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        for path in paths(community.id):
+                            response = client.get(path)
+                            if response.status_code != 200:
+                                raise CommandError(f'{path} returned {response.status_code}')
+                            size += len(response.content)
+                        result['ms'].append((time.perf_counter() - started) * 1000)
+                    result['queries'].append(len(queries))
+                    result['bytes'].append(size)
+                    result['requests'] = len(paths(community.id))
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>8}: {result['requests']} requests, "
+                f"p50 {statistics.median(result['ms']):.1f} ms, max {max(result['ms']):.1f} ms, "
+                f"{statistics.mean(result['queries']):.0f} queries, "
+                f"{statistics.mean(result['bytes']) / 1024:.1f} KB per page"
+            )
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main.models import Community
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROFILES = {
+    # What the Dockerfile and railway.toml used to run
+    'legacy': [
+        'gunicorn', 'config.wsgi:application', '--workers', '1', '--threads', '2',
+        '--timeout', '30', '--log-level', 'warning',
+    ],
+    'tuned': ['gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+    'asgi': ['gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts gunicorn with the legacy and tuned server profiles and compares '
+        'startup time and throughput on the synthetic dataset'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='legacy,tuned', help=f"Comma-separated: {', '.join(PROFILES)}")
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per profile')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        community_ids = list(Community.objects.values_list('id', flat=True)[:20])
+        if not community_ids:
+            raise CommandError('No communities found; run generate_synthetic_data first')
+
+        paths = ['/health/', '/api/communities/trending/']
+        for community_id in community_ids:
+            paths += [
+                f'/api/communities/{community_id}/',
+                f'/api/communities/{community_id}/forum/posts/',
+                f'/api/communities/{community_id}/announcements/',
+            ]
+
+        for profile in options['profiles'].split(','):
+            if profile not in PROFILES:
+                raise CommandError(f'Unknown profile: {profile}')
+            self.run_profile(profile, paths, options)
+
+    def run_profile(self, profile, paths, options):
+        port = options['port']
+        env = dict(os.environ, PORT=str(port))
+        if profile == 'asgi':
+            env['SERVER_MODE'] = 'asgi'
+        command = PROFILES[profile] + ['--bind', f'127.0.0.1:{port}']
+
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=sys.stderr,
+        )
+        try:
+            startup = self.wait_until_ready(port, started)
+            latencies, errors, elapsed = self.generate_load(port, paths, options)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        total = len(latencies) + errors
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        self.stdout.write(
+            f'{profile:>7}: startup {startup:.2f}s, {total / elapsed:.1f} req/s, '
+            f'p50 {statistics.median(latencies or [0]) * 1000:.1f} ms, '
+            f'p95 {p95 * 1000:.1f} ms, {errors} errors'
+        )
+
+    def wait_until_ready(self, port, started, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                connection.request('GET', '/health/')
+                if connection.getresponse().status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.1)
+        raise CommandError(f'Server did not become ready within {timeout}s')
+
+    def generate_load(self, port, paths, options):
+        deadline = time.monotonic() + options['duration']
+
+        def client(offset):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            latencies, errors, i = [], 0, offset
+            while time.monotonic() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                request_started = time.perf_counter()
+                try:
+                    connection.request('GET', path)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 500:
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - request_started)
+                except (OSError, http.client.HTTPException):
+                    errors += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            connection.close()
+            return latencies, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(client, range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for result in results for latency in result[0]]
+        errors = sum(result[1] for result in results)
+        return latencies, errors, elapsed
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from main.bulk_import import IMPORT_BATCH_SIZE, BulkImportError, import_products, import_resources, parse_rows
+from main.db_routers import use_primary
+from main.models import Community, ResourceCategory
+import csv
+import time
+
+
+class Command(BaseCommand):
+    help = 'Imports resources into a collection or products into a community from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['resources', 'products'])
+        parser.add_argument('target_id', type=int, help='Collection id for resources, community id for products')
+        parser.add_argument('path')
+        parser.add_argument('--user', help='Username to attribute the rows to (default: the collection or community creator)')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--show-errors', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['kind'] == 'resources':
+            target = ResourceCategory.objects.filter(id=options['target_id']).first()
+        else:
+            target = Community.objects.filter(id=options['target_id']).first()
+        if target is None:
+            raise CommandError(f"No {'collection' if options['kind'] == 'resources' else 'community'} {options['target_id']}")
+
+        user = target.created_by
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user {options['user']}")
+
+        started = time.perf_counter()
+        with open(options['path'], newline='', encoding='utf-8-sig') as f:
+            # CSV is streamed row by row; JSON has to be read whole
+            if options['path'].lower().endswith('.csv'):
+                rows = csv.DictReader(f)
+            else:
+                try:
+                    rows = parse_rows(f.read(), options['path'])
+                except BulkImportError as e:
+                    raise CommandError(str(e))
+            # No preview capture: the process would wait for it on exit.
+            # Previews are fetched when someone first views them instead.
+            with use_primary():
+                if options['kind'] == 'resources':
+                    report = import_resources(target, user, rows, options['dry_run'], options['batch_size'], queue_previews=False)
+                else:
+                    report = import_products(target.id, user, rows, options['dry_run'], options['batch_size'], queue_previews=False)
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors'][:options['show_errors']]:
+            self.stdout.write(f"  row {error['row']}: {error['errors']}")
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['created']} of {report['total']} rows in {elapsed:.1f}s "
+            f"({report['total'] / max(elapsed, 0.001):.0f} rows/s); "
+            f"{report['duplicates']} duplicates, {report['error_count']} errors"
+        ))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from main.db_routers import use_primary
+from main.storage import dedupe_existing, recount_blobs
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves uploads saved under their original names into content-addressed '
+        'blobs, so identical files are stored once, then recounts blob references '
+        'and removes blobs nothing uses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without changing it')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Delete the old files right away instead of leaving them for gc_media',
+        )
+        parser.add_argument('--recount-only', action='store_true', help='Skip moving files; only recount references')
+        parser.add_argument('--min-age-hours', type=float, default=24, help='Leave blobs newer than this alone when recounting')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        dry_run = options['dry_run']
+
+        # Read from the primary so rows saved moments ago are seen
+        with use_primary():
+            if not options['recount_only']:
+                totals = None
+                for model, field, totals in dedupe_existing(
+                    batch_size=options['batch_size'], dry_run=dry_run,
+                    delete_originals=options['delete_originals'],
+                ):
+                    self.stdout.write(f"  {model._meta.label}.{field.name}: {totals['rows']} rows so far")
+                if totals:
+                    self.stdout.write(
+                        f"Moved {totals['rows']} values ({totals['files']} files, {totals['missing']} missing): "
+                        f"{totals['duplicates']} duplicates, {totals['bytes_saved'] / (1024 * 1024):.1f} MB saved, "
+                        f"{totals['originals_deleted']} originals deleted"
+                    )
+                else:
+                    self.stdout.write('No files saved under their original names')
+
+            summary = recount_blobs(dry_run=dry_run, min_age_hours=options['min_age_hours'])
+            self.stdout.write(
+                f"Recounted {summary['blobs']} blobs: {summary['fixed']} fixed, {summary['removed']} removed, "
+                f"{summary['adopted']} adopted, {summary['orphan_files']} orphan files"
+            )
+
+        elapsed = time.perf_counter() - started
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Dry run: nothing was changed ({elapsed:.1f}s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Done in {elapsed:.1f}s'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.db_routers import use_primary
+from main.deletion import run_community_deletion
+from main.models import Community
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes a community and its content in batches. With --resume, finishes '
+        'every community left half-deleted by an interrupted background job.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('community_ids', nargs='*', type=int)
+        parser.add_argument('--resume', action='store_true', help='Process every community marked is_deleting')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with use_primary():
+            community_ids = list(options['community_ids'])
+            if options['resume']:
+                community_ids += Community.objects.filter(is_deleting=True).values_list('id', flat=True)
+            if not community_ids:
+                raise CommandError('Pass community ids or --resume')
+
+            for community_id in community_ids:
+                Community.objects.filter(id=community_id).update(is_deleting=True)
+                state = run_community_deletion(
+                    community_id, batch_size=options['batch_size'], progress=self.report,
+                )
+                if state is None:
+                    self.stdout.write(self.style.WARNING(
+                        f'Community {community_id}: already being deleted by another process'
+                    ))
+                    continue
+                self.stdout.write('')
+                elapsed = state.get('finished_at', state['started_at']) - state['started_at']
+                self.stdout.write(self.style.SUCCESS(
+                    f"Community {community_id}: deleted {sum(state['deleted'].values())} rows and "
+                    f"{state['files_deleted']} files ({state['files_failed']} failed) in {elapsed:.1f}s"
+                ))
+
+    def report(self, state):
+        self.stdout.write(
+            f"\r  {state['stage'] or '':<32} {sum(state['deleted'].values()):>8} rows", ending='',
+        )
+        self.stdout.flush()
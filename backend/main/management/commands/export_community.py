@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.export import CHUNK_SIZE, EXPORT_FORMATS, EXPORT_TABLES
+from main.models import Community
+import sys
+import time
+
+
+class Command(BaseCommand):
+    help = "Streams a community's content to a file as NDJSON or a ZIP of CSVs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('community_id', type=int)
+        parser.add_argument('--output', choices=list(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--file', help='Destination path (default: stdout)')
+        parser.add_argument('--tables', help=f"Comma-separated subset of: {', '.join(EXPORT_TABLES)}")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        community_id = options['community_id']
+        if not Community.objects.filter(id=community_id).exists():
+            raise CommandError(f'Community {community_id} does not exist')
+        tables = options['tables'].split(',') if options['tables'] else None
+        unknown = [table for table in tables or [] if table not in EXPORT_TABLES]
+        if unknown:
+            raise CommandError(f"Unknown tables: {', '.join(unknown)}")
+
+        stream = EXPORT_FORMATS[options['output']][0]
+        started = time.perf_counter()
+        written = 0
+        destination = open(options['file'], 'wb') if options['file'] else sys.stdout.buffer
+        try:
+            for part in stream(community_id, tables, options['chunk_size']):
+                destination.write(part)
+                written += len(part)
+        finally:
+            if options['file']:
+                destination.close()
+            else:
+                destination.flush()
+
+        if options['file']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Exported community {community_id} to {options['file']} "
+                f'({written / 1024 / 1024:.1f} MB in {time.perf_counter() - started:.1f}s)'
+            ))
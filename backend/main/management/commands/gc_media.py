@@ -0,0 +1,74 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from main.db_routers import use_primary
+from main.media import delete_files, iter_referenced_names, iter_storage_files, upload_prefixes
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes stored media files that no database row references. Storage '
+        'listings and referenced names are streamed in sorted order and merged, '
+        'so memory stays bounded however large the bucket is. Content-addressed '
+        'blobs are reference counted instead (see dedupe_media).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report orphans without deleting them')
+        parser.add_argument('--prefix', action='append', help='Only scan this directory (default: every upload_to directory)')
+        parser.add_argument('--min-age-hours', type=float, default=24, help='Skip files newer than this; their rows may not be committed yet')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--show', type=int, default=20, help='Orphan names to print')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        dry_run = options['dry_run']
+        cutoff = time.time() - options['min_age_hours'] * 3600
+        prefixes = sorted(options['prefix'] or upload_prefixes())
+        self.stdout.write(f"Scanning {', '.join(prefixes)} on {default_storage.__class__.__name__}")
+
+        scanned = referenced = too_new = orphans = orphan_bytes = deleted = failed = 0
+        batch = []
+
+        def flush():
+            nonlocal deleted, failed
+            if batch and not dry_run:
+                batch_deleted, batch_failed = delete_files(batch, workers=options['workers'])
+                deleted += batch_deleted
+                failed += batch_failed
+            batch.clear()
+
+        # Read from the primary so a file saved moments ago is never taken for an orphan
+        with use_primary():
+            references = iter_referenced_names()
+            reference = next(references, None)
+            for prefix in prefixes:
+                for name, size, modified in iter_storage_files(prefix=prefix):
+                    scanned += 1
+                    while reference is not None and reference < name:
+                        reference = next(references, None)
+                    if reference == name:
+                        referenced += 1
+                        continue
+                    if modified > cutoff:
+                        too_new += 1
+                        continue
+                    orphans += 1
+                    orphan_bytes += size
+                    if orphans <= options['show']:
+                        self.stdout.write(f'  orphan: {name} ({size} bytes)')
+                    batch.append(name)
+                    if len(batch) >= options['batch_size']:
+                        flush()
+            flush()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Scanned {scanned} files: {referenced} referenced, {too_new} too new, '
+            f'{orphans} orphaned ({orphan_bytes / (1024 * 1024):.1f} MB) in {elapsed:.1f}s'
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was deleted'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} files ({failed} failed)'))
@@ -0,0 +1,206 @@
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main.collection_stats import rebuild_collection_stats
+from main.models import (
+    Community,
+    CustomUser,
+    Profile,
+    ForumPost,
+    ForumComment,
+    Reaction,
+    Question,
+    Answer,
+    Poll,
+    PollOption,
+    PollVote,
+    Announcement,
+    ResourceCategory,
+    Resource,
+    Vote,
+    RecommendedProduct,
+    GalleryImage,
+)
+from main.utils import url_key
+import random
+import time
+
+SYNTHETIC_DOMAIN = 'synthetic.invalid'
+
+WORDS = (
+    'vintage film grain cottagecore brutalist neon pastel analog minimal baroque '
+    'noir solarpunk y2k grunge botanical coastal dark academia vaporwave ceramics '
+    'letterpress linen moss dusk velvet chrome terracotta archive'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a synthetic dataset for benchmarks. The same --seed and '
+        '--run-id give the same users, content and votes on every run '
+        '(only timestamps and database ids differ).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--communities', type=int, default=50)
+        parser.add_argument('--members', type=int, default=100, help='Members per community')
+        parser.add_argument('--posts', type=int, default=100, help='Forum posts per community')
+        parser.add_argument('--comments', type=int, default=5, help='Comments per post')
+        parser.add_argument('--resources', type=int, default=200, help='Resources per community')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--run-id', default='bench',
+            help='Tag in generated usernames and emails; use another one to add a second dataset next to the first',
+        )
+        parser.add_argument('--clear', action='store_true', help='Remove previously generated data first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        run = options['run_id']
+        if options['clear']:
+            deleted, _ = CustomUser.objects.filter(email__endswith=f'@{SYNTHETIC_DOMAIN}').delete()
+            self.stdout.write(f'Removed {deleted} synthetic rows')
+        elif CustomUser.objects.filter(username__startswith=f'synthetic{run}-').exists():
+            raise CommandError(f"Run '{run}' already exists; pass --clear or another --run-id")
+
+        def text(words=8):
+            return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+        with transaction.atomic():
+            password = make_password('synthetic-password')
+            users = CustomUser.objects.bulk_create([
+                CustomUser(
+                    email=f'user{run}-{i}@{SYNTHETIC_DOMAIN}',
+                    username=f'synthetic{run}-{i}',
+                    password=password,
+                )
+                for i in range(options['users'])
+            ], batch_size=1000)
+            Profile.objects.bulk_create([Profile(user=user, bio=text(12)) for user in users], batch_size=1000)
+
+            communities = Community.objects.bulk_create([
+                Community(
+                    name=f'{text(2).title()} {i}',
+                    description=text(30),
+                    created_by=rng.choice(users),
+                )
+                for i in range(options['communities'])
+            ])
+
+            Membership = Community.members.through
+            memberships = []
+            for community in communities:
+                for user in rng.sample(users, min(options['members'], len(users))):
+                    memberships.append(Membership(community_id=community.id, customuser_id=user.id))
+            Membership.objects.bulk_create(memberships, batch_size=5000, ignore_conflicts=True)
+
+            posts = ForumPost.objects.bulk_create([
+                ForumPost(content=text(40), community=community, created_by=rng.choice(users))
+                for community in communities
+                for _ in range(options['posts'])
+            ], batch_size=2000)
+
+            ForumComment.objects.bulk_create([
+                ForumComment(content=text(15), post=post, created_by=rng.choice(users))
+                for post in posts
+                for _ in range(options['comments'])
+            ], batch_size=5000)
+
+            reaction_types = [reaction_type for reaction_type, _ in Reaction.REACTION_TYPES]
+            Reaction.objects.bulk_create([
+                Reaction(post=post, user=user, reaction_type=rng.choice(reaction_types))
+                for post in posts
+                for user in rng.sample(users, min(3, len(users)))
+            ], batch_size=5000, ignore_conflicts=True)
+
+            questions = Question.objects.bulk_create([
+                Question(content=text(20), community=community, created_by=rng.choice(users))
+                for community in communities
+                for _ in range(10)
+            ])
+            Answer.objects.bulk_create([
+                Answer(content=text(25), question=question, created_by=rng.choice(users))
+                for question in questions
+                for _ in range(3)
+            ], batch_size=5000)
+
+            polls = Poll.objects.bulk_create([
+                Poll(question=text(8), community=community, created_by=rng.choice(users))
+                for community in communities
+                for _ in range(5)
+            ])
+            poll_options = PollOption.objects.bulk_create([
+                PollOption(poll=poll, text=text(3))
+                for poll in polls
+                for _ in range(4)
+            ])
+            PollVote.objects.bulk_create([
+                PollVote(option=option, user=user)
+                for option in poll_options
+                for user in rng.sample(users, min(5, len(users)))
+            ], batch_size=5000, ignore_conflicts=True)
+
+            Announcement.objects.bulk_create([
+                Announcement(content=text(30), community=community, created_by=community.created_by)
+                for community in communities
+                for _ in range(5)
+            ])
+
+            categories = ResourceCategory.objects.bulk_create([
+                ResourceCategory(name=text(2).title(), description=text(12), community=community, created_by=community.created_by)
+                for community in communities
+                for _ in range(5)
+            ])
+            per_category = max(1, options['resources'] // 5)
+            resources = [
+                Resource(
+                    url=f'https://example.com/{category.id}/{i}?ref={rng.randint(0, 9)}',
+                    title=text(5),
+                    remark=text(10),
+                    category=category,
+                    created_by=rng.choice(users),
+                    views=rng.randint(0, 500),
+                )
+                for category in categories
+                for i in range(per_category)
+            ]
+            for resource in resources:
+                resource.url_key = url_key(resource.url)
+            resources = Resource.objects.bulk_create(resources, batch_size=5000)
+            Vote.objects.bulk_create([
+                Vote(resource=resource, user=user, vote_type=rng.choice(['up', 'up', 'down']))
+                for resource in resources
+                for user in rng.sample(users, min(2, len(users)))
+            ], batch_size=5000, ignore_conflicts=True)
+
+            RecommendedProduct.objects.bulk_create([
+                RecommendedProduct(
+                    title=text(4),
+                    url=f'https://shop.example.com/item/{community.id}-{i}',
+                    url_key=url_key(f'https://shop.example.com/item/{community.id}-{i}'),
+                    comment=text(10),
+                    catalogue_name=rng.choice(WORDS),
+                    community=community,
+                    created_by=rng.choice(users),
+                )
+                for community in communities
+                for i in range(20)
+            ])
+
+            GalleryImage.objects.bulk_create([
+                GalleryImage(image=f'gallery/synthetic-{community.id}-{i}.jpg', community=community, uploaded_by=community.created_by)
+                for community in communities
+                for i in range(20)
+            ])
+
+            # bulk_create skips the signals that maintain these counters
+            rebuild_collection_stats([category.id for category in categories])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users, {len(communities)} communities, '
+            f'{len(posts)} posts and {len(resources)} resources in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from main.collection_stats import rebuild_collection_stats
+from main.db_routers import use_primary
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recomputes CollectionStats from resources and votes (all collections, or the given ids)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('category_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with use_primary():
+            count = rebuild_collection_stats(options['category_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats for {count} collections in {time.perf_counter() - started:.1f}s'
+        ))
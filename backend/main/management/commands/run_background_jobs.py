@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from main.bulk_import import resume_imports
+from main.db_routers import use_primary
+from main.deletion import resume_deletions
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Long-running worker that resumes background jobs interrupted by a web '
+        'worker restart (community deletions, bulk imports; see main/background.py). '
+        'Run it as its own process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=30, help='Seconds between polls')
+        parser.add_argument('--once', action='store_true', help='Poll once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            try:
+                with use_primary():
+                    self.poll()
+            except Exception as e:
+                # Keep polling; the job stays marked unfinished for the next round
+                logger.exception(f"Background job poll failed: {str(e)}")
+                if options['once']:
+                    raise
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def poll(self):
+        for state in resume_deletions():
+            self.stdout.write(self.style.SUCCESS(
+                f"Resumed deletion of community {state['community_id']}: {state['status']}, "
+                f"{sum(state['deleted'].values())} rows"
+            ))
+        for state in resume_imports():
+            self.stdout.write(self.style.SUCCESS(
+                f"Resumed import {state['job_id']}: {state['status']}, {state['report']['created']} created"
+            ))
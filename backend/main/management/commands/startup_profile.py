@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Modules that should only load when a request actually needs them.
+# ``requests`` is not listed: rest_framework.compat imports it if installed.
+LAZY_MODULES = ['bs4', 'PIL', 'boto3', 'botocore']
+
+PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_prod')
+from config.wsgi import application
+import config.urls
+imported = time.perf_counter()
+from django.test import Client
+response = Client().get('/health/')
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (first_request - imported) * 1000,
+    'status': response.status_code,
+    'loaded': sorted(name for name in sys.modules if name.split('.')[0] in %(lazy)r),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measures cold import and first-request time in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--import-budget-ms', type=float, default=1500)
+        parser.add_argument('--request-budget-ms', type=float, default=500)
+        parser.add_argument('--top', type=int, default=10, help='Show the slowest N imports')
+
+    def handle(self, *args, **options):
+        probe = PROBE % {'lazy': LAZY_MODULES}
+        results = []
+        importtime = ''
+        for run in range(options['runs']):
+            command = [sys.executable]
+            if run == 0:
+                command += ['-X', 'importtime']
+            completed = subprocess.run(
+                command + ['-c', probe],
+                cwd=settings.BASE_DIR, env=dict(os.environ), capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                raise CommandError(completed.stderr[-2000:])
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            if run == 0:
+                importtime = completed.stderr
+
+        # The -X importtime run is slower, so budgets use the best of the rest
+        timed = results[1:] or results
+        import_ms = min(result['import_ms'] for result in timed)
+        request_ms = min(result['first_request_ms'] for result in timed)
+        loaded = results[0]['loaded']
+
+        self.stdout.write(f'Cold import: {import_ms:.0f} ms (budget {options["import_budget_ms"]:.0f} ms)')
+        self.stdout.write(f'First request: {request_ms:.0f} ms (budget {options["request_budget_ms"]:.0f} ms)')
+        self.stdout.write('Slowest imports (cumulative):')
+        for cumulative, name in self.slowest_imports(importtime, options['top']):
+            self.stdout.write(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+        problems = []
+        if import_ms > options['import_budget_ms']:
+            problems.append('cold import is over budget')
+        if request_ms > options['request_budget_ms']:
+            problems.append('first request is over budget')
+        if results[0]['status'] != 200:
+            problems.append(f"health check returned {results[0]['status']}")
+        if loaded:
+            problems.append(f"modules loaded eagerly at startup: {', '.join(loaded[:10])}")
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Startup is within budget'))
+
+    def slowest_imports(self, importtime, top):
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        pattern = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)')
+        entries = []
+        for line in importtime.splitlines():
+            match = pattern.match(line)
+            # Only top-level imports, so nested modules are not double counted
+            if match and len(match.group(2)) <= 1:
+                entries.append((int(match.group(1)), match.group(3)))
+        return sorted(entries, reverse=True)[:top]
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+from datetime import timedelta
+from main.models import Community
+from main.views import get_community_payload
+import time
+
+
+class Command(BaseCommand):
+    help = 'Pre-populates the shared cache for the most visited community pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50, help='Number of communities to warm')
+        parser.add_argument('--days', type=int, default=30, help='Window used to rank communities by views')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        community_ids = Community.objects.annotate(
+            recent_views=Count('views', filter=Q(views__viewed_at__gte=since), distinct=True),
+            member_count=Count('members', distinct=True)
+        ).order_by('-recent_views', '-member_count').values_list('id', flat=True)[:options['limit']]
+
+        started = time.perf_counter()
+        warmed = 0
+        for community_id in community_ids:
+            if get_community_payload(community_id) is not None:
+                warmed += 1
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {warmed} community pages in {elapsed:.2f}s'
+        ))
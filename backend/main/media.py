@@ -0,0 +1,168 @@
+"""
+Helpers for listing and removing stored media files.
+
+Deletes go through the storage backend by file *name*; ``FieldFile.path``
+only exists on FileSystemStorage and raises on S3. Shared blobs (see
+storage.py) are released first and only deleted once nothing uses them.
+Listings are streamed in sorted order so callers can diff them against the
+database without holding either side in memory (see ``manage.py gc_media``).
+"""
+import heapq
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import models
+
+from .storage import release_names, unused_names
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _delete_batch(storage, names):
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is not None and hasattr(storage, '_normalize_name'):
+        # S3: one DeleteObjects call removes up to 1000 keys
+        response = bucket.delete_objects(Delete={
+            'Objects': [{'Key': storage._normalize_name(name)} for name in names],
+            'Quiet': True,
+        })
+        errors = response.get('Errors', [])
+        for error in errors:
+            logger.warning(f"Failed to delete {error.get('Key')}: {error.get('Message')}")
+        return len(names) - len(errors), len(errors)
+
+    deleted = failed = 0
+    for name in names:
+        try:
+            storage.delete(name)
+            deleted += 1
+        except Exception as e:
+            logger.warning(f"Failed to delete {name}: {str(e)}")
+            failed += 1
+    return deleted, failed
+
+
+def delete_files(names, storage=None, workers=8, batch_size=100):
+    """
+    Delete stored files in parallel batches. Returns (deleted, failed).
+    A shared blob loses one reference per name and is kept while it has any.
+    """
+    storage = storage or default_storage
+    names = unused_names(release_names([name for name in names if name]))
+    if not names:
+        return 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda batch: _delete_batch(storage, batch), _chunks(names, batch_size)))
+    return sum(result[0] for result in results), sum(result[1] for result in results)
+
+
+def delete_field_file(field_file, replaced_by=None):
+    """
+    Delete the file behind a FileField value, logging instead of raising.
+    Nothing is deleted if ``replaced_by`` ended up with the same name, except
+    that content-addressed storage gives back the old value's reference.
+    """
+    if not field_file:
+        return False
+    if replaced_by and replaced_by.name == field_file.name and not getattr(field_file.storage, 'counts_references', False):
+        return False
+    try:
+        field_file.storage.delete(field_file.name)
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to delete {field_file.name}: {str(e)}")
+        return False
+
+
+def file_fields():
+    """Every (model, FileField/ImageField) pair in the project."""
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def upload_prefixes():
+    """Directories the project uploads into; nothing outside them is ours."""
+    return sorted({
+        field.upload_to.split('/')[0] + '/'
+        for _, field in file_fields()
+        if isinstance(field.upload_to, str) and field.upload_to
+    })
+
+
+def iter_storage_files(storage=None, prefix=''):
+    """
+    Yield (name, size, last_modified) for every file under ``prefix``, sorted by
+    name. S3 lists keys in order; local directories are walked so that
+    "a/" sorts exactly where its children's full names would.
+    """
+    storage = storage or default_storage
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is not None:
+        location = storage.location.rstrip('/') + '/' if storage.location else ''
+        for obj in bucket.objects.filter(Prefix=location + prefix).page_size(1000):
+            yield obj.key[len(location):], obj.size, obj.last_modified.timestamp()
+        return
+    yield from _walk(storage, prefix.rstrip('/'))
+
+
+def _walk(storage, path):
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    base = path + '/' if path else ''
+    entries = [(name + '/', True) for name in directories] + [(name, False) for name in files]
+    for name, is_directory in sorted(entries):
+        if is_directory:
+            yield from _walk(storage, base + name.rstrip('/'))
+        else:
+            yield base + name, storage.size(base + name), storage.get_modified_time(base + name).timestamp()
+
+
+def iter_referenced_names(chunk_size=50000):
+    """Yield every file name stored in the database, sorted and de-duplicated."""
+    def names():
+        for model, field in file_fields():
+            queryset = model._base_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+            yield from queryset.values_list(field.name, flat=True).iterator(chunk_size=2000)
+
+    previous = None
+    for name in external_sort(names(), chunk_size=chunk_size):
+        if name != previous:
+            yield name
+            previous = name
+
+
+def external_sort(names, chunk_size=50000):
+    """
+    Sort an arbitrarily long stream of strings holding at most ``chunk_size``
+    in memory: sorted runs are spilled to temporary files and merged. The
+    database's own ORDER BY is avoided because its collation need not match
+    the byte order storage listings come back in.
+    """
+    names = iter(names)
+    runs = []
+    try:
+        while True:
+            chunk = sorted(name for name in islice(names, chunk_size) if '\n' not in name)
+            if not chunk:
+                break
+            run = tempfile.TemporaryFile('w+', encoding='utf-8')
+            run.writelines(name + '\n' for name in chunk)
+            run.seek(0)
+            runs.append(run)
+        yield from heapq.merge(*((line[:-1] for line in run) for run in runs))
+    finally:
+        for run in runs:
+            run.close()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='is_deleting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_community_is_deleting'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['community', '-created_at'], name='main_announ_communi_3e95e9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forumpost',
+            index=models.Index(fields=['community', '-created_at'], name='main_forump_communi_e0a35b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='galleryimage',
+            index=models.Index(fields=['community', '-uploaded_at'], name='main_galler_communi_c46fce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['community', '-created_at'], name='main_poll_communi_c12ed7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['category', '-created_at'], name='main_resour_categor_85e20e_idx'),
+        ),
+    ]
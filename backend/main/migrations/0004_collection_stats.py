@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-19 13:16
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def backfill_collection_stats(apps, schema_editor):
+    ResourceCategory = apps.get_model('main', 'ResourceCategory')
+    Resource = apps.get_model('main', 'Resource')
+    Vote = apps.get_model('main', 'Vote')
+    CollectionStats = apps.get_model('main', 'CollectionStats')
+    # The database being migrated, never a read replica
+    db = schema_editor.connection.alias
+
+    resources = {
+        row['category_id']: row
+        for row in Resource.objects.using(db).values('category_id').annotate(count=Count('id'), views=Sum('views'))
+    }
+    votes = dict(
+        Vote.objects.using(db).values('resource__category_id').annotate(count=Count('id'))
+        .values_list('resource__category_id', 'count')
+    )
+    CollectionStats.objects.using(db).bulk_create([
+        CollectionStats(
+            category_id=category_id,
+            resource_count=resources.get(category_id, {}).get('count', 0),
+            total_views=resources.get(category_id, {}).get('views') or 0,
+            total_votes=votes.get(category_id, 0),
+        )
+        for category_id in ResourceCategory.objects.using(db).values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_feed_recency_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionStats',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='main.resourcecategory')),
+                ('resource_count', models.IntegerField(default=0)),
+                ('total_views', models.IntegerField(default=0)),
+                ('total_votes', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Collection stats',
+            },
+        ),
+        migrations.RunPython(backfill_collection_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_collection_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savedcollection',
+            index=models.Index(fields=['user', '-saved_at'], name='main_savedc_user_id_b39375_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedimage',
+            index=models.Index(fields=['user', '-saved_at'], name='main_savedi_user_id_3f5965_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedproduct',
+            index=models.Index(fields=['user', '-saved_at'], name='main_savedp_user_id_ed1043_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedresource',
+            index=models.Index(fields=['user', '-saved_at'], name='main_savedr_user_id_c77b9f_idx'),
+        ),
+    ]
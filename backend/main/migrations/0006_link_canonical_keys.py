@@ -0,0 +1,93 @@
+# Generated by Django 4.2 on 2026-10-19 13:31
+
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations, models
+
+# Frozen copy of main.utils.url_key as of this migration, so later changes
+# to the live function don't change what this backfill writes
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src', 'si', 'spm',
+}
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ''
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+def canonical_url(url):
+    parts = urlsplit(normalize_url(url))
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith('utm_') and name.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+def url_key(url):
+    return hashlib.sha256(canonical_url(url).encode()).hexdigest()
+
+
+def backfill_url_keys(apps, schema_editor):
+    # The database being migrated, never a read replica
+    db = schema_editor.connection.alias
+    for name in ('Resource', 'RecommendedProduct'):
+        model = apps.get_model('main', name)
+        batch = []
+        for obj in model.objects.using(db).only('id', 'url').iterator(chunk_size=1000):
+            obj.url_key = url_key(obj.url)
+            batch.append(obj)
+            if len(batch) >= 1000:
+                model.objects.using(db).bulk_update(batch, ['url_key'])
+                batch = []
+        model.objects.using(db).bulk_update(batch, ['url_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_saved_items_recency_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkPreview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_key', models.CharField(max_length=64, unique=True)),
+                ('url', models.URLField(max_length=2000)),
+                ('resolved_key', models.CharField(blank=True, max_length=64)),
+                ('title', models.CharField(blank=True, max_length=500)),
+                ('description', models.TextField(blank=True)),
+                ('image', models.URLField(blank=True, max_length=2000)),
+                ('domain', models.CharField(blank=True, max_length=255)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recommendedproduct',
+            name='url_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='url_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_url_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-19 13:37
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def register_existing_images(apps, schema_editor):
+    LinkPreview = apps.get_model('main', 'LinkPreview')
+    PreviewImage = apps.get_model('main', 'PreviewImage')
+    # The database being migrated, never a read replica
+    db = schema_editor.connection.alias
+    urls = {url.strip() for url in LinkPreview.objects.using(db).exclude(image='').values_list('image', flat=True).iterator()}
+    PreviewImage.objects.using(db).bulk_create([
+        PreviewImage(url_key=hashlib.sha256(url.encode()).hexdigest(), url=url)
+        for url in urls if url
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_link_canonical_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PreviewImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_key', models.CharField(max_length=64, unique=True)),
+                ('url', models.URLField(max_length=2000)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(register_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-19 13:39
+
+from django.db import migrations, models
+import main.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_preview_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='community',
+            name='banner_image',
+            field=models.ImageField(blank=True, null=True, storage=main.storage.ContentAddressedStorage(), upload_to='community_banners/'),
+        ),
+        migrations.AlterField(
+            model_name='forumpost',
+            name='media',
+            field=models.FileField(blank=True, null=True, storage=main.storage.ContentAddressedStorage(), upload_to='forum_media/'),
+        ),
+        migrations.AlterField(
+            model_name='galleryimage',
+            name='image',
+            field=models.ImageField(storage=main.storage.ContentAddressedStorage(), upload_to='gallery/'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=main.storage.ContentAddressedStorage(), upload_to='avatars/'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='media',
+            field=models.FileField(blank=True, null=True, storage=main.storage.ContentAddressedStorage(), upload_to='forum_media/'),
+        ),
+        migrations.AlterField(
+            model_name='resourcecategory',
+            name='preview_image',
+            field=models.ImageField(blank=True, null=True, storage=main.storage.ContentAddressedStorage(), upload_to='category_previews/'),
+        ),
+    ]
@@ -6,13 +6,17 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .storage import content_storage
+
 class Community(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    banner_image = models.ImageField(upload_to='community_banners/', null=True, blank=True)
+    banner_image = models.ImageField(upload_to='community_banners/', null=True, blank=True, storage=content_storage)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     members = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='communities')
+    # Set while the background deletion job is removing the community's content
+    is_deleting = models.BooleanField(default=False)
 
     class Meta:
         verbose_name_plural = "Communities"
@@ -52,14 +56,37 @@ class ResourceCategory(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     views = models.IntegerField(default=0)
-    preview_image = models.ImageField(upload_to='category_previews/', null=True, blank=True)
+    preview_image = models.ImageField(upload_to='category_previews/', null=True, blank=True, storage=content_storage)
     is_preset = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
 
-class Resource(models.Model):
+class CollectionStats(models.Model):
+    """Per-collection counters kept up to date by main/collection_stats.py."""
+    category = models.OneToOneField(ResourceCategory, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    resource_count = models.IntegerField(default=0)
+    total_views = models.IntegerField(default=0)
+    total_votes = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Collection stats"
+
+class LinkKeyMixin:
+    """Writes ``url_key`` along with ``url``; signals.set_url_key computes it."""
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'url' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'url_key'}
+        super().save(*args, **kwargs)
+
+
+class Resource(LinkKeyMixin, models.Model):
     url = models.URLField(max_length=2000)
+    # utils.url_key of the canonical URL, set on save (see main/links.py)
+    url_key = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
     title = models.CharField(max_length=200)
     remark = models.TextField(null=True, blank=True)
     category = models.ForeignKey('ResourceCategory', on_delete=models.CASCADE)
@@ -69,13 +96,14 @@ class Resource(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['category', '-created_at'])]
 
     def __str__(self):
         return self.title
 
 class ForumPost(models.Model):
     content = models.TextField(blank=True)
-    media = models.FileField(upload_to='forum_media/', null=True, blank=True)
+    media = models.FileField(upload_to='forum_media/', null=True, blank=True, storage=content_storage)
     media_type = models.CharField(
         max_length=10,
         choices=[('image', 'Image'), ('video', 'Video'), ('none', 'None')],
@@ -88,6 +116,7 @@ class ForumPost(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['community', '-created_at'])]
 
     def __str__(self):
         return f"{self.created_by.username}'s post in {self.community.name}"
@@ -106,7 +135,7 @@ class ForumComment(models.Model):
         return f"Comment by {self.created_by.username} on {self.post.content[:50]}"
 
 class GalleryImage(models.Model):
-    image = models.ImageField(upload_to='gallery/')
+    image = models.ImageField(upload_to='gallery/', storage=content_storage)
     community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name='gallery_images')
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -116,6 +145,7 @@ class GalleryImage(models.Model):
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [models.Index(fields=['community', '-uploaded_at'])]
 
 class Vote(models.Model):
     VOTE_TYPES = (
@@ -154,7 +184,7 @@ class Question(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     community = models.ForeignKey(Community, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
-    media = models.FileField(upload_to='forum_media/', null=True, blank=True)
+    media = models.FileField(upload_to='forum_media/', null=True, blank=True, storage=content_storage)
 
     class Meta:
         ordering = ['-created_at']
@@ -200,6 +230,7 @@ class Poll(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['community', '-created_at'])]
 
 class PollOption(models.Model):
     poll = models.ForeignKey(Poll, related_name='options', on_delete=models.CASCADE)
@@ -225,10 +256,12 @@ class Announcement(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['community', '-created_at'])]
 
-class RecommendedProduct(models.Model):
+class RecommendedProduct(LinkKeyMixin, models.Model):
     title = models.CharField(max_length=200)
     url = models.URLField(max_length=2000)
+    url_key = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
     comment = models.TextField(null=True, blank=True)
     catalogue_name = models.CharField(max_length=100, null=True, blank=True)
     community = models.ForeignKey('Community', on_delete=models.CASCADE, null=True)
@@ -241,6 +274,56 @@ class RecommendedProduct(models.Model):
     def __str__(self):
         return self.title
 
+class LinkPreview(models.Model):
+    """
+    Preview of one canonical URL, shared by every resource and product that
+    links to it. When fetching the URL redirected elsewhere, ``resolved_key``
+    is the key of the final page and the preview is stored under that key.
+    """
+    url_key = models.CharField(max_length=64, unique=True)
+    url = models.URLField(max_length=2000)
+    resolved_key = models.CharField(max_length=64, blank=True)
+    title = models.CharField(max_length=500, blank=True)
+    description = models.TextField(blank=True)
+    image = models.URLField(max_length=2000, blank=True)
+    domain = models.CharField(max_length=255, blank=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+class PreviewImage(models.Model):
+    """
+    A preview image found on some page, and the thumbnails made from it.
+    Thumbnails are stored under ``content_hash``, the SHA-256 of the
+    original image, so the same picture behind many URLs is stored once.
+    An empty hash with ``fetched_at`` set means fetching it failed.
+    """
+    url_key = models.CharField(max_length=64, unique=True)
+    url = models.URLField(max_length=2000)
+    content_hash = models.CharField(max_length=64, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.url
+
+class MediaBlob(models.Model):
+    """
+    One stored upload, named by its content hash and shared by every file
+    field holding the same bytes (see main/storage.py). ``ref_count`` is
+    how many field values point at it; the file goes when it reaches zero.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
 class SavedImage(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saved_images')
     image = models.ForeignKey(GalleryImage, on_delete=models.CASCADE)
@@ -248,6 +331,7 @@ class SavedImage(models.Model):
 
     class Meta:
         unique_together = ('user', 'image')
+        indexes = [models.Index(fields=['user', '-saved_at'])]
 
 class SavedResource(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saved_resources')
@@ -256,6 +340,7 @@ class SavedResource(models.Model):
 
     class Meta:
         unique_together = ('user', 'resource')
+        indexes = [models.Index(fields=['user', '-saved_at'])]
 
 class SavedProduct(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saved_products')
@@ -264,6 +349,7 @@ class SavedProduct(models.Model):
 
     class Meta:
         unique_together = ('user', 'product')
+        indexes = [models.Index(fields=['user', '-saved_at'])]
         ordering = ['-saved_at']
 
     def __str__(self):
@@ -276,6 +362,7 @@ class SavedCollection(models.Model):
 
     class Meta:
         unique_together = ('user', 'collection')
+        indexes = [models.Index(fields=['user', '-saved_at'])]
         ordering = ['-saved_at']
 
     def __str__(self):
@@ -291,7 +378,7 @@ class CommunityView(models.Model):
 
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True, storage=content_storage)
     bio = models.TextField(max_length=500, blank=True)
     email_verified = models.BooleanField(default=False)
     
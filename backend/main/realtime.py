@@ -0,0 +1,346 @@
+"""
+Live community updates pushed to clients over server-sent events.
+
+Write paths (poll votes, reactions, comments) publish small deltas for a
+community through a broker. The SSE endpoint served from ``config/asgi.py``
+subscribes to the broker and streams those deltas to every open tab, so the
+client only has to re-fetch a list when it first loads the page.
+
+Only members (and the creator) of a community may subscribe. ``EventSource``
+cannot send headers, so the client first POSTs to ``events/ticket/`` with its
+usual Authorization header and opens the stream with the returned
+``?ticket=``. Tickets are random, bound to one user and community, expire
+after ``TICKET_TTL_SECONDS`` and are consumed by the first stream that uses
+them, so the URL that reaches access logs never carries a reusable
+credential. Cross-origin streams are allowed only from
+``REALTIME_ALLOWED_ORIGINS``.
+
+``InMemoryBroker`` fans out inside a single process. ``RedisBroker`` relays
+events through Redis pub/sub so every worker sees every write; any client
+with the redis-py interface (e.g. ``fakeredis``) can be passed in locally.
+gunicorn.conf.py refuses to start several ASGI workers on a broker that is
+not ``shared``.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import re
+import secrets
+import threading
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = re.compile(r'^/api/communities/(?P<community_id>\d+)/events/$')
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+TICKET_TTL_SECONDS = 30
+
+
+class Subscription:
+    """A single SSE client listening to one community."""
+
+    def __init__(self, community_id, loop):
+        self.community_id = community_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Slow clients lose the oldest deltas rather than stalling the broker
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InMemoryBroker:
+    """Per-process fan-out of community events to subscribed event loops."""
+
+    # Whether events published in one process reach subscribers in another
+    shared = False
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, community_id):
+        subscription = Subscription(community_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(community_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.community_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.community_id]
+
+    def publish(self, community_id, event):
+        self.dispatch(community_id, event)
+
+    def dispatch(self, community_id, event):
+        """Hand an event to every local subscriber of the community."""
+        event = dict(event, id=next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscriptions.get(community_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has already shut down
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(InMemoryBroker):
+    """Relays events through Redis pub/sub so all workers receive them."""
+
+    channel_prefix = 'realtime:community:'
+    shared = True
+
+    def __init__(self, url=None, client=None, **options):
+        super().__init__(**options)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or settings.REALTIME_REDIS_URL)
+        self.client = client
+        self._listener = None
+
+    def subscribe(self, community_id):
+        self._ensure_listener()
+        return super().subscribe(community_id)
+
+    def publish(self, community_id, event):
+        self.client.publish(f'{self.channel_prefix}{community_id}', json.dumps(event))
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f'{self.channel_prefix}*')
+        for message in pubsub.listen():
+            if message.get('type') != 'pmessage':
+                continue
+            try:
+                channel = message['channel']
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                community_id = int(channel[len(self.channel_prefix):])
+                self.dispatch(community_id, json.loads(message['data']))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Dropping malformed realtime message: {str(e)}")
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(settings.REALTIME_BROKER)
+                _broker = broker_class(**getattr(settings, 'REALTIME_BROKER_OPTIONS', {}))
+    return _broker
+
+
+def broker_is_shared():
+    """Whether the configured broker delivers events across worker processes."""
+    return getattr(import_string(settings.REALTIME_BROKER), 'shared', False)
+
+
+def publish(community_id, event):
+    """Publish an event once the surrounding transaction has committed."""
+    def send():
+        try:
+            get_broker().publish(community_id, event)
+        except Exception as e:
+            logger.error(f"Failed to publish realtime event: {str(e)}")
+
+    transaction.on_commit(send)
+
+
+def publish_poll_results(poll):
+    from .models import PollOption
+
+    counts = PollOption.objects.filter(poll=poll).annotate(
+        vote_count=Count('pollvote')
+    ).values_list('id', 'vote_count')
+    publish(poll.community_id, {
+        'type': 'poll.votes',
+        'poll': poll.id,
+        'counts': {str(option_id): count for option_id, count in counts},
+    })
+
+
+def publish_reaction_counts(post):
+    from .models import Reaction
+
+    counts = dict.fromkeys((reaction_type for reaction_type, _ in Reaction.REACTION_TYPES), 0)
+    counts.update(
+        Reaction.objects.filter(post=post).values('reaction_type').annotate(
+            count=Count('id')
+        ).values_list('reaction_type', 'count')
+    )
+    publish(post.community_id, {
+        'type': 'post.reactions',
+        'post': post.id,
+        'counts': counts,
+    })
+
+
+def publish_new_comment(comment, community_id):
+    publish(community_id, {
+        'type': 'post.comment',
+        'post': comment.post_id,
+        'comment': comment.id,
+    })
+
+
+def format_event(event):
+    data = json.dumps({key: value for key, value in event.items() if key != 'id'})
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def _ticket_key(ticket):
+    return f'realtime:ticket:{ticket}'
+
+
+def issue_ticket(user_id, community_id):
+    """A single-use ticket letting ``user_id`` open one stream for the community."""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), (user_id, community_id), TICKET_TTL_SECONDS)
+    return ticket
+
+
+def redeem_ticket(ticket, community_id):
+    """The user id a ticket was issued to, or None; the ticket is used up either way."""
+    if not ticket:
+        return None
+    key = _ticket_key(ticket)
+    issued = cache.get(key)
+    # Only the request whose delete succeeds may use the ticket
+    if issued is None or not cache.delete(key):
+        return None
+    user_id, ticket_community_id = issued
+    return user_id if ticket_community_id == community_id else None
+
+
+def authorize_subscription(user_id, community_id):
+    """
+    HTTP status for a user subscribing to a community's events: 200 for its
+    members and creator, 401/403/404 otherwise.
+    """
+    from .models import Community
+
+    if user_id is None:
+        return 401
+    community = Community.objects.filter(id=community_id, is_deleting=False).values('created_by_id').first()
+    if community is None:
+        return 404
+    # Read fresh rather than from viewer state, which may lag a bulk change
+    if community['created_by_id'] == user_id or Community.objects.filter(id=community_id, members=user_id).exists():
+        return 200
+    return 403
+
+
+def _authorize_ticket(ticket, community_id):
+    return authorize_subscription(redeem_ticket(ticket, community_id), community_id)
+
+
+def _cors_headers(scope):
+    origin = dict(scope.get('headers', ())).get(b'origin', b'').decode('latin-1')
+    headers = [(b'vary', b'origin')]
+    if origin and origin in getattr(settings, 'REALTIME_ALLOWED_ORIGINS', ()):
+        headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+    return headers
+
+
+ERROR_MESSAGES = {
+    401: 'A valid stream ticket is required',
+    403: 'Only members can follow this community',
+    404: 'Community not found',
+    405: 'Method not allowed',
+}
+
+
+async def _send_error(send, scope, status):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')] + _cors_headers(scope),
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'error': ERROR_MESSAGES[status]}).encode()})
+
+
+async def sse_application(scope, receive, send):
+    """ASGI app streaming one community's events as text/event-stream."""
+    from asgiref.sync import sync_to_async
+
+    match = EVENTS_PATH.match(scope['path'])
+    community_id = int(match.group('community_id'))
+    if scope['method'] != 'GET':
+        await _send_error(send, scope, 405)
+        return
+    ticket = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('ticket', [None])[0]
+    status = await sync_to_async(_authorize_ticket, thread_sensitive=True)(ticket, community_id)
+    if status != 200:
+        await _send_error(send, scope, status)
+        return
+
+    broker = get_broker()
+    subscription = broker.subscribe(community_id)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ] + _cors_headers(scope),
+        })
+        await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                next_event.cancel()
+                break
+            if next_event in done:
+                body = format_event(next_event.result())
+            else:
+                next_event.cancel()
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        disconnected.cancel()
+        broker.unsubscribe(subscription)
@@ -0,0 +1,95 @@
+"""
+Response caching with strong ETags for public read endpoints.
+
+``cached_response`` renders a view's GET response once per resource
+version and stores the JSON bytes in ``tiered_cache``. Writes to the
+underlying models bump the namespace version (see ``main/signals.py``), so
+the next request renders a fresh copy. Clients that send a matching
+``If-None-Match`` get an empty 304.
+"""
+import functools
+import hashlib
+
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .caching import make_key, tiered_cache
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def _find_request(args):
+    for arg in args:
+        if isinstance(arg, (Request, HttpRequest)):
+            return arg
+    raise TypeError('cached_response could not find the request argument')
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def user_variant(request, scope):
+    """Separate cache entries per signed-in user; anonymous users share one."""
+    if request.user.is_authenticated:
+        return f'user-{request.user.id}'
+    return None
+
+
+def cached_response(namespace, scope_kwarg=None, timeout=300, max_age=60, variant=None):
+    """
+    Cache a view's successful GET responses under ``namespace``.
+
+    ``scope_kwarg`` names the URL kwarg whose value scopes the namespace
+    version (usually the community id). ``variant(request, scope)`` may
+    return a string for responses that differ between users; those are
+    marked private so shared caches do not store them.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = _find_request(args)
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            scope = kwargs.get(scope_kwarg) if scope_kwarg else None
+            variant_key = variant(request, scope) if variant else None
+            key = make_key(
+                namespace, view.__qualname__, request.build_absolute_uri(), variant_key or 'public',
+                scope=scope,
+            )
+
+            def render():
+                response = view(*args, **kwargs)
+                if response.status_code != 200 or not hasattr(response, 'data'):
+                    raise _Uncacheable(response)
+                body = JSONRenderer().render(response.data)
+                return {'body': body, 'etag': '"%s"' % hashlib.sha256(body).hexdigest()[:40]}
+
+            try:
+                entry = tiered_cache.get_or_set(key, render, timeout=timeout)
+            except _Uncacheable as e:
+                return e.response
+
+            if _etag_matches(request, entry['etag']):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(entry['body'], content_type='application/json')
+            response['ETag'] = entry['etag']
+            if variant_key:
+                response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+            else:
+                response['Cache-Control'] = f'public, max-age={max_age}, stale-while-revalidate={max_age}'
+            patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
@@ -1,4 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models import Count, F, Prefetch, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
 from rest_framework import serializers
 from .models import (
     Community, 
@@ -20,9 +23,12 @@ from .models import (
     SavedResource,
     SavedProduct,
     SavedCollection,
+    CollectionStats,
     Profile
 )
-from .utils import get_preview_data  # Add this import at the top
+from .links import canonical_key, get_link_previews
+from .thumbnails import thumbnail_urls
+from .viewer_state import get_viewer_state
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
@@ -30,6 +36,93 @@ from django.contrib.auth.password_validation import validate_password
 
 User = get_user_model()
 
+def prefetched(obj, relation):
+    """Rows of ``relation`` if the queryset prefetched it, otherwise None."""
+    cache = getattr(obj, '_prefetched_objects_cache', {})
+    if relation in cache:
+        return list(cache[relation])
+    return None
+
+class AuthorMap:
+    """
+    Request-scoped identity map of author summaries.
+
+    Every author is loaded once per request, with their profile, however
+    many posts, comments, answers or polls they appear on.
+    """
+
+    def __init__(self):
+        self._authors = {}
+
+    def load(self, user_ids):
+        missing = set(user_ids) - self._authors.keys() - {None}
+        if not missing:
+            return
+        users = User.objects.filter(id__in=missing).select_related('profile').only('id', 'username', 'profile__avatar')
+        for user in users:
+            self._authors[user.id] = user
+        for user_id in missing - self._authors.keys():
+            self._authors[user_id] = None
+
+    def get(self, user_id):
+        if user_id not in self._authors:
+            self.load([user_id])
+        return self._authors[user_id]
+
+def get_author_map(context):
+    """The AuthorMap shared by every serializer rendering the current request."""
+    request = context.get('request')
+    # Stored on the HttpRequest so it outlives any one DRF Request wrapper
+    holder = getattr(request, '_request', request)
+    if holder is None:
+        return context.setdefault('author_map', AuthorMap())
+    if not hasattr(holder, 'author_map'):
+        holder.author_map = AuthorMap()
+    return holder.author_map
+
+class AuthorField(serializers.Field):
+    """Compact ``created_by``: id, username and avatar, via the AuthorMap."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'created_by_id')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user_id):
+        user = get_author_map(self.context).get(user_id)
+        if user is None:
+            return None
+        avatar = None
+        profile = getattr(user, 'profile', None)
+        if profile is not None and profile.avatar:
+            avatar = profile.avatar.url
+            request = self.context.get('request')
+            if request and avatar.startswith('/'):
+                avatar = request.build_absolute_uri(avatar)
+        return {'id': user.id, 'username': user.username, 'avatar': avatar}
+
+class AuthorPreloadingListSerializer(serializers.ListSerializer):
+    """
+    Loads every author of a list, including those of the child's
+    ``Meta.author_relations`` (e.g. a post's comments), in one query
+    before any item is rendered.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        # Relation names, or callables returning a Prefetch
+        lookups = [relation() if callable(relation) else relation for relation in getattr(self.child.Meta, 'author_relations', [])]
+        if lookups:
+            prefetch_related_objects(items, *lookups)
+        user_ids = {item.created_by_id for item in items}
+        for lookup in lookups:
+            attr = lookup.to_attr or lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            for item in items:
+                related = getattr(item, attr)
+                user_ids.update(child.created_by_id for child in (related.all() if hasattr(related, 'all') else related))
+        get_author_map(self.context).load(user_ids)
+        return [self.child.to_representation(item) for item in items]
+
 class UserSerializer(serializers.ModelSerializer):
     communities = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True)
@@ -98,6 +191,13 @@ class UserLoginSerializer(serializers.Serializer):
     username = serializers.CharField()  # Change from identifier to username
     password = serializers.CharField(write_only=True)
 
+class MembersBulkSerializer(serializers.Serializer):
+    """Body of CommunityMembersBulkView; omitted lists count as empty."""
+    action = serializers.ChoiceField(choices=['add', 'remove'])
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    usernames = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    emails = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
 class CommunitySerializer(serializers.ModelSerializer):
     is_creator = serializers.SerializerMethodField()
     created_by = serializers.ReadOnlyField(source='created_by.username')
@@ -158,11 +258,22 @@ class ResourceSerializer(serializers.ModelSerializer):
         model = Resource
         fields = ['id', 'title', 'url', 'remark', 'category', 'created_by', 'created_at']
 
+    def validate(self, attrs):
+        category = attrs.get('category', getattr(self.instance, 'category', None))
+        if 'url' in attrs and category is not None:
+            duplicates = Resource.objects.filter(category=category, url_key=canonical_key(attrs['url']))
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError({'url': 'This link is already in the collection.'})
+        return attrs
+
 class ForumCommentSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+    created_by = AuthorField()
     
     class Meta:
         model = ForumComment
+        list_serializer_class = AuthorPreloadingListSerializer
         fields = ['id', 'content', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['created_by', 'created_at', 'updated_at']
 
@@ -171,32 +282,66 @@ class ReactionSerializer(serializers.ModelSerializer):
         model = Reaction
         fields = ['id', 'reaction_type', 'user']
 
+LATEST_COMMENT_COUNT = 3
+
+def latest_comments_prefetch(limit=LATEST_COMMENT_COUNT):
+    """
+    The newest ``limit`` comments of each post as ``post.latest_comments``
+    (oldest first), in one ROW_NUMBER() OVER (PARTITION BY post_id) query.
+    Each comment also carries ``post_comment_count``, the post's total.
+    """
+    comments = ForumComment.objects.annotate(
+        position=Window(RowNumber(), partition_by=F('post_id'), order_by=[F('created_at').desc(), F('id').desc()]),
+        post_comment_count=Window(Count('id'), partition_by=F('post_id')),
+    ).filter(position__lte=limit).order_by('created_at', 'id')
+    return Prefetch('comments', queryset=comments, to_attr='latest_comments')
+
 class ForumPostSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+    """
+    Posts carry only their latest comments plus ``comment_count``; the full
+    thread is paginated at /api/forum/posts/<id>/comments/.
+    """
+    created_by = AuthorField()
     reactions_count = serializers.SerializerMethodField()
     user_reactions = serializers.SerializerMethodField()
-    comments = ForumCommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
+    comment_count = serializers.SerializerMethodField()
     
     class Meta:
         model = ForumPost
+        list_serializer_class = AuthorPreloadingListSerializer
+        author_relations = [latest_comments_prefetch]
         fields = [
             'id', 'content', 'media', 'media_type', 
             'created_by', 'created_at', 'reactions_count',
-            'user_reactions', 'comments', 'community'
+            'user_reactions', 'comments', 'comment_count', 'community'
         ]
         read_only_fields = ['created_by', 'created_at']
 
+    def latest_comments(self, obj):
+        if not hasattr(obj, 'latest_comments'):
+            prefetch_related_objects([obj], latest_comments_prefetch())
+        return obj.latest_comments
+
+    def get_comments(self, obj):
+        return ForumCommentSerializer(self.latest_comments(obj), many=True, context=self.context).data
+
+    def get_comment_count(self, obj):
+        comments = self.latest_comments(obj)
+        return comments[0].post_comment_count if comments else 0
+
     def get_reactions_count(self, obj):
+        reactions = prefetched(obj, 'reactions')
         counts = {}
         for reaction_type, _ in Reaction.REACTION_TYPES:
-            counts[reaction_type] = obj.reactions.filter(reaction_type=reaction_type).count()
+            if reactions is not None:
+                counts[reaction_type] = sum(1 for reaction in reactions if reaction.reaction_type == reaction_type)
+            else:
+                counts[reaction_type] = obj.reactions.filter(reaction_type=reaction_type).count()
         return counts
     
     def get_user_reactions(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return list(obj.reactions.filter(user=user).values_list('reaction_type', flat=True))
-        return []
+        return get_viewer_state(self.context['request']).user_reactions(obj.id)
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -218,48 +363,46 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return CommunitySerializer(communities, many=True).data
 
 class AnswerSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+    created_by = AuthorField()
     user_vote = serializers.SerializerMethodField()
     votes = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Answer
+        list_serializer_class = AuthorPreloadingListSerializer
         fields = ['id', 'content', 'created_by', 'created_at', 'votes', 'user_vote']
         read_only_fields = ['created_by', 'votes']
 
     def get_user_vote(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                vote = AnswerVote.objects.get(answer=obj, user=request.user)
-                return vote.vote_type
-            except AnswerVote.DoesNotExist:
-                return None
+        if request:
+            return get_viewer_state(request).user_vote('answer_votes', obj.id)
         return None
 
 class QuestionSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+    created_by = AuthorField()
     answers = AnswerSerializer(many=True, read_only=True)
     votes = serializers.SerializerMethodField()
     user_vote = serializers.SerializerMethodField()
 
     class Meta:
         model = Question
+        list_serializer_class = AuthorPreloadingListSerializer
+        author_relations = ['answers']
         fields = ['id', 'content', 'created_by', 'created_at', 'media', 'answers', 'votes', 'user_vote']
 
     def get_votes(self, obj):
+        votes = prefetched(obj, 'question_votes')
+        if votes is not None:
+            return sum(1 if vote.vote_type == 'up' else -1 if vote.vote_type == 'down' else 0 for vote in votes)
         upvotes = obj.question_votes.filter(vote_type='up').count()
         downvotes = obj.question_votes.filter(vote_type='down').count()
         return upvotes - downvotes
 
     def get_user_vote(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                vote = QuestionVote.objects.get(question=obj, user=request.user)
-                return vote.vote_type
-            except QuestionVote.DoesNotExist:
-                return None
+        if request:
+            return get_viewer_state(request).user_vote('question_votes', obj.id)
         return None
 
 class PollOptionSerializer(serializers.ModelSerializer):
@@ -271,28 +414,33 @@ class PollOptionSerializer(serializers.ModelSerializer):
         fields = ['id', 'text', 'vote_count', 'has_voted']
 
     def get_vote_count(self, obj):
+        votes = prefetched(obj, 'pollvote_set')
+        if votes is not None:
+            return len(votes)
         return obj.vote_count()
 
     def get_has_voted(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.votes.filter(id=request.user.id).exists()
+        if request:
+            return get_viewer_state(request).has_voted(obj.id)
         return False
 
 class PollSerializer(serializers.ModelSerializer):
     options = PollOptionSerializer(many=True, read_only=True)
-    created_by = UserSerializer(read_only=True)
+    created_by = AuthorField()
 
     class Meta:
         model = Poll
+        list_serializer_class = AuthorPreloadingListSerializer
         fields = ['id', 'question', 'created_by', 'created_at', 'options']
 
 class AnnouncementSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+    created_by = AuthorField()
     community = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Announcement
+        list_serializer_class = AuthorPreloadingListSerializer
         fields = ['id', 'content', 'created_by', 'created_at', 'community']
         read_only_fields = ['created_by', 'created_at', 'community']
 
@@ -302,6 +450,16 @@ class RecommendedProductSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'url', 'comment', 'catalogue_name', 'community', 'created_by', 'created_at']
         read_only_fields = ['created_at']
 
+    def validate(self, attrs):
+        community = attrs.get('community', getattr(self.instance, 'community', None))
+        if 'url' in attrs and community is not None:
+            duplicates = RecommendedProduct.objects.filter(community=community, url_key=canonical_key(attrs['url']))
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError({'url': 'This product is already recommended here.'})
+        return attrs
+
 class SavedImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     community_name = serializers.SerializerMethodField()
@@ -328,27 +486,35 @@ class SavedResourceSerializer(serializers.ModelSerializer):
     community_id = serializers.SerializerMethodField()
     preview_image = serializers.SerializerMethodField()
     preview_data = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = SavedResource
         fields = ['id', 'resource_id', 'title', 'url', 'collection_name', 
-                 'community_id', 'saved_at', 'preview_image', 'preview_data']
+                 'community_id', 'saved_at', 'preview_image', 'preview_data', 'thumbnail']
+
+    def link_preview(self, obj):
+        # Shared link previews (see main/links.py); never fetched here
+        previews = self.context.get('link_previews')
+        if previews is None:
+            previews = get_link_previews([obj.resource.url])
+        return previews.get(obj.resource.url) or None
 
     def get_preview_image(self, obj):
-        try:
-            preview_data = get_preview_data(obj.resource.url)
-            if preview_data and preview_data.get('image'):
-                return preview_data['image']
-        except Exception as e:
-            print(f"Error getting preview for {obj.resource.url}: {str(e)}")
-        return None
+        preview = self.link_preview(obj)
+        return preview.get('image') or None if preview else None
 
     def get_preview_data(self, obj):
-        try:
-            return get_preview_data(obj.resource.url)
-        except Exception as e:
-            print(f"Error getting preview data for {obj.resource.url}: {str(e)}")
-        return None
+        return self.link_preview(obj)
+
+    def get_thumbnail(self, obj):
+        image = self.get_preview_image(obj)
+        if not image:
+            return None
+        thumbnails = self.context.get('thumbnails')
+        if thumbnails is None:
+            thumbnails = thumbnail_urls([image], self.context.get('request'))
+        return thumbnails.get(image)
 
     def get_title(self, obj):
         return obj.resource.title
@@ -388,7 +554,10 @@ class SavedCollectionSerializer(serializers.ModelSerializer):
                  'resource_count', 'views', 'saved_at', 'preview_image']
 
     def get_resource_count(self, obj):
-        return Resource.objects.filter(category=obj.collection).count()
+        try:
+            return obj.collection.stats.resource_count
+        except CollectionStats.DoesNotExist:
+            return Resource.objects.filter(category=obj.collection).count()
 
 class ProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
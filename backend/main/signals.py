@@ -1,7 +1,18 @@
-from django.db.models.signals import post_save
+from collections import defaultdict
+
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.dispatch import receiver
-from .models import Profile
+from rest_framework.authtoken.models import Token
+from .models import Announcement, Profile, Community, ResourceCategory, Resource, RecommendedProduct, Vote, CollectionStats
+from .authentication import invalidate_token, invalidate_user_tokens
+from .caching import bump_namespace
+from .collection_stats import adjust_collection_stats
+from .links import canonical_key
+from .media import delete_field_file
+from .storage import content_fields
+from .viewer_state import STATE_MODELS, invalidate_viewer_state
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -10,4 +21,142 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save() 
\ No newline at end of file
+    instance.profile.save()
+
+# Cached token authentication: drop cached users on logout, password
+# reset, deactivation and account deletion
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_saved_user(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_tokens(instance.pk)
+
+# Versioned cache namespaces (see main/caching.py)
+@receiver(post_save, sender=Community)
+@receiver(post_delete, sender=Community)
+def invalidate_community_cache(sender, instance, **kwargs):
+    bump_namespace('community', instance.pk)
+    bump_namespace('trending')
+
+@receiver(m2m_changed, sender=Community.members.through)
+def invalidate_community_members_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # Who was a member is only known before the clear
+        for user_id in instance.members.values_list('id', flat=True):
+            invalidate_viewer_state(user_id, 'communities')
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        invalidate_viewer_state(instance.pk, 'communities')
+    else:
+        for user_id in pk_set or ():
+            invalidate_viewer_state(user_id, 'communities')
+    if not reverse:
+        bump_namespace('community', instance.pk)
+    else:
+        for community_id in pk_set or ():
+            bump_namespace('community', community_id)
+    bump_namespace('trending')
+
+COMMUNITY_CONTENT_NAMESPACES = {
+    'main.GalleryImage': 'gallery',
+    'main.Announcement': 'announcements',
+    'main.RecommendedProduct': 'products',
+    'music.CommunitySpotifyPlaylist': 'spotify_playlist',
+}
+
+def invalidate_community_content_cache(sender, instance, **kwargs):
+    bump_namespace(COMMUNITY_CONTENT_NAMESPACES[sender._meta.label], instance.community_id)
+
+for model, namespace in COMMUNITY_CONTENT_NAMESPACES.items():
+    post_save.connect(invalidate_community_content_cache, sender=model)
+    post_delete.connect(invalidate_community_content_cache, sender=model)
+
+# Cached announcement lists embed their authors' usernames and avatars
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Profile)
+def invalidate_authored_announcements(sender, instance, created, **kwargs):
+    if created:
+        return
+    user_id = instance.user_id if sender is Profile else instance.pk
+    community_ids = Announcement.objects.filter(created_by_id=user_id).values_list('community_id', flat=True).distinct()
+    for community_id in community_ids:
+        bump_namespace('announcements', community_id)
+
+# Home feed windows (see main/feed.py) only need to move on when items
+# appear or disappear; edits and view counters reach them on expiry
+FEED_MODELS = ['main.ForumPost', 'main.Announcement', 'main.Resource', 'main.Poll', 'main.GalleryImage']
+
+def invalidate_feed_cache(sender, instance, created=True, **kwargs):
+    if not created:
+        return
+    if sender._meta.label == 'main.Resource':
+        community_id = ResourceCategory.objects.filter(id=instance.category_id).values_list('community_id', flat=True).first()
+    else:
+        community_id = instance.community_id
+    if community_id is not None:
+        bump_namespace('feed', community_id)
+
+for model in FEED_MODELS:
+    post_save.connect(invalidate_feed_cache, sender=model)
+    post_delete.connect(invalidate_feed_cache, sender=model)
+
+# Canonical link keys (see main/links.py); bulk_create callers set them
+@receiver(pre_save, sender=Resource)
+@receiver(pre_save, sender=RecommendedProduct)
+def set_url_key(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'url' in update_fields:
+        instance.url_key = canonical_key(instance.url)
+
+# Collection statistics (see main/collection_stats.py)
+@receiver(post_save, sender=ResourceCategory)
+def create_collection_stats(sender, instance, created, **kwargs):
+    if created:
+        CollectionStats.objects.get_or_create(category=instance)
+
+@receiver(post_save, sender=Resource)
+def count_saved_resource(sender, instance, created, **kwargs):
+    if created:
+        adjust_collection_stats(instance.category_id, resource_count=1, total_views=instance.views)
+
+@receiver(post_delete, sender=Resource)
+def count_deleted_resource(sender, instance, **kwargs):
+    adjust_collection_stats(instance.category_id, rebuild_missing=False, resource_count=-1, total_views=-instance.views)
+
+@receiver(post_save, sender=Vote)
+def count_saved_vote(sender, instance, created, **kwargs):
+    if created:
+        category_id = Resource.objects.filter(id=instance.resource_id).values_list('category_id', flat=True).first()
+        if category_id is not None:
+            adjust_collection_stats(category_id, total_votes=1)
+
+@receiver(post_delete, sender=Vote)
+def count_deleted_vote(sender, instance, **kwargs):
+    category_id = Resource.objects.filter(id=instance.resource_id).values_list('category_id', flat=True).first()
+    if category_id is not None:
+        adjust_collection_stats(category_id, rebuild_missing=False, total_votes=-1)
+
+# Per-viewer state sets (see main/viewer_state.py)
+def invalidate_viewer_state_cache(sender, instance, **kwargs):
+    invalidate_viewer_state(instance.user_id, STATE_MODELS[sender._meta.label])
+
+for model in STATE_MODELS:
+    post_save.connect(invalidate_viewer_state_cache, sender=model)
+    post_delete.connect(invalidate_viewer_state_cache, sender=model)
+
+# Content-addressed uploads (see main/storage.py): give back a deleted row's
+# blob references, including rows removed by a cascade. Bulk ``_raw_delete``
+# callers (main/deletion.py) release their files themselves.
+CONTENT_FIELDS = defaultdict(list)
+for model, field in content_fields():
+    CONTENT_FIELDS[model].append(field)
+
+def release_deleted_files(sender, instance, **kwargs):
+    for field in CONTENT_FIELDS[sender]:
+        delete_field_file(getattr(instance, field.name))
+
+for model in CONTENT_FIELDS:
+    post_delete.connect(release_deleted_files, sender=model)
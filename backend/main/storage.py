@@ -0,0 +1,376 @@
+"""
+Content-addressed storage for user uploads.
+
+``ContentAddressedStorage`` wraps the default storage backend
+(FileSystemStorage locally, S3 in production). A saved upload is hashed
+as it is read and stored once, as ``blobs/<aa>/<bb>/<sha256><ext>``.
+Whichever field or model it was uploaded to, the same bytes uploaded again
+get the existing name without being written a second time.
+
+Each stored file has a ``MediaBlob`` row counting the field values that
+use it. ``save`` takes a reference and ``delete`` gives one back; the file
+itself is deleted when the last reference goes. Code deleting many files
+at once (``media.delete_files``) first releases blob names through
+``release_names``, so it never removes a file another row still uses.
+
+Names from before this storage (``gallery/x.jpg``) keep working and are
+deleted outright. ``manage.py dedupe_media`` moves them into blobs and
+recounts references.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.base import File
+from django.core.files.storage import Storage, default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = 'blobs/'
+CHUNK_SIZE = 1024 * 1024
+# Unseekable uploads are spooled while hashing; larger ones go to disk
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+_extension = re.compile(r'\.[a-z0-9]{1,10}')
+
+
+def _blob_model():
+    return apps.get_model('main', 'MediaBlob')
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def blob_name(content_hash, original_name=''):
+    extension = os.path.splitext(original_name)[1].lower()
+    if not _extension.fullmatch(extension):
+        extension = ''
+    return f'{BLOB_PREFIX}{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}'
+
+
+def hash_file(content):
+    """
+    (sha256 hex, size, file to upload) for a Django File, reading it once.
+    Seekable files are rewound and uploaded as they are; anything else is
+    copied to a spooled temporary file while it is hashed.
+    """
+    digest, size = hashlib.sha256(), 0
+    seekable = hasattr(content, 'seek') and (not hasattr(content, 'seekable') or content.seekable())
+    if seekable:
+        content.seek(0)
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+        content.seek(0)
+        return digest.hexdigest(), size, content
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return digest.hexdigest(), size, File(spool, name=getattr(content, 'name', None))
+
+
+def _add_reference(content_hash):
+    """Name of the blob with this hash after taking a reference, or None if there is none."""
+    MediaBlob = _blob_model()
+    with transaction.atomic():
+        if MediaBlob.objects.filter(content_hash=content_hash).update(ref_count=F('ref_count') + 1):
+            return MediaBlob.objects.get(content_hash=content_hash).name
+    return None
+
+
+def store_blob(backend, content_hash, size, content, original_name=''):
+    """Store ``content`` (hashed already) as a blob with one reference; returns its name."""
+    name = _add_reference(content_hash)
+    if name is not None:
+        return name
+
+    stored = backend.save(blob_name(content_hash, original_name), content)
+    try:
+        with transaction.atomic():
+            _blob_model().objects.create(content_hash=content_hash, name=stored, size=size, ref_count=1)
+        return stored
+    except IntegrityError:
+        # Someone stored the same bytes at the same time; use theirs
+        name = _add_reference(content_hash)
+        if name != stored:
+            backend.delete(stored)
+        return name
+
+
+def release_names(names):
+    """
+    Give back one reference per occurrence of each blob name. Returns the
+    names whose files should now be deleted: blobs nobody uses any more and
+    every name that is not a blob.
+    """
+    counts = Counter(name for name in names if is_blob(name))
+    deletable = [name for name in names if name and not is_blob(name)]
+    if not counts:
+        return deletable
+    MediaBlob = _blob_model()
+    with transaction.atomic():
+        blobs = MediaBlob.objects.select_for_update().filter(name__in=list(counts)).order_by('id')
+        for blob in blobs:
+            remaining = blob.ref_count - counts.pop(blob.name)
+            if remaining > 0:
+                MediaBlob.objects.filter(id=blob.id).update(ref_count=remaining)
+            else:
+                blob.delete()
+                deletable.append(blob.name)
+    # Blob files without a row are left to ``dedupe_media --recount``
+    return deletable
+
+
+def unused_names(names):
+    """``names`` without blobs that were stored again since being released."""
+    blobs = [name for name in names if is_blob(name)]
+    if not blobs:
+        return list(names)
+    reused = set(_blob_model().objects.filter(name__in=blobs).values_list('name', flat=True))
+    return [name for name in names if name not in reused]
+
+
+def _delete_unused(backend, names):
+    for name in unused_names(names):
+        backend.delete(name)
+
+
+@deconstructible(path='main.storage.ContentAddressedStorage')
+class ContentAddressedStorage(Storage):
+    """Deduplicating, reference-counted wrapper around another storage backend."""
+
+    # Lets media.delete_field_file know a replaced file still holds a reference
+    counts_references = True
+
+    def __init__(self, backend=None):
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend or default_storage
+
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, not the upload
+        return name
+
+    def _save(self, name, content):
+        content_hash, size, upload = hash_file(content)
+        return store_blob(self.backend, content_hash, size, upload, name)
+
+    def delete(self, name):
+        names = release_names([name])
+        if names:
+            # Not before the released reference is committed
+            transaction.on_commit(lambda: _delete_unused(self.backend, names))
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def content_fields():
+    """Every (model, file field) stored through ContentAddressedStorage."""
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField) and getattr(field.storage, 'counts_references', False):
+                yield model, field
+
+
+def reference_counts(names):
+    """{name: number of field values holding it} for the given names."""
+    counts = Counter()
+    for model, field in content_fields():
+        rows = (
+            model._base_manager.filter(**{f'{field.name}__in': names})
+            .values(field.name).annotate(references=Count('pk')).order_by()
+        )
+        for row in rows:
+            counts[row[field.name]] += row['references']
+    return counts
+
+
+def _legacy_rows(model, field, after, batch_size):
+    rows = model._base_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+    rows = rows.exclude(**{f'{field.name}__startswith': BLOB_PREFIX})
+    if after is not None:
+        rows = rows.filter(pk__gt=after)
+    return list(rows.order_by('pk').values_list('pk', field.name)[:batch_size])
+
+
+def dedupe_existing(batch_size=500, dry_run=False, delete_originals=False):
+    """
+    Move file values saved before content addressing into blobs, one batch
+    of rows at a time, yielding running totals after each batch. Rows are
+    updated with ``QuerySet.update`` only where they still hold the old name.
+
+    Originals are left for ``gc_media`` unless ``delete_originals``: cached
+    responses may still link to them for a while.
+    """
+    backend = default_storage
+    MediaBlob = _blob_model()
+    totals = {'rows': 0, 'files': 0, 'duplicates': 0, 'bytes_saved': 0, 'missing': 0, 'originals_deleted': 0}
+    dry_run_hashes = set()
+
+    for model, field in content_fields():
+        after = None
+        while True:
+            rows = _legacy_rows(model, field, after, batch_size)
+            if not rows:
+                break
+            after = rows[-1][0]
+            blobs = {}
+            for pk, name in rows:
+                totals['rows'] += 1
+                if name in blobs:
+                    new_name = blobs[name]
+                    if new_name and not dry_run:
+                        _add_reference(MediaBlob.objects.get(name=new_name).content_hash)
+                else:
+                    try:
+                        original = backend.open(name, 'rb')
+                    except Exception as e:
+                        logger.warning(f"Could not open {name}: {str(e)}")
+                        totals['missing'] += 1
+                        blobs[name] = None
+                        continue
+                    with original:
+                        content_hash, size, upload = hash_file(original)
+                        totals['files'] += 1
+                        duplicate = content_hash in dry_run_hashes or MediaBlob.objects.filter(content_hash=content_hash).exists()
+                        if duplicate:
+                            totals['duplicates'] += 1
+                            totals['bytes_saved'] += size
+                        if dry_run:
+                            dry_run_hashes.add(content_hash)
+                            new_name = blobs[name] = blob_name(content_hash, name)
+                        else:
+                            new_name = blobs[name] = store_blob(backend, content_hash, size, upload, name)
+                if not new_name or dry_run:
+                    continue
+                updated = model._base_manager.filter(pk=pk, **{field.name: name}).update(**{field.name: new_name})
+                if not updated:
+                    # Changed meanwhile; give the reference back
+                    _delete_unused(backend, release_names([new_name]))
+
+            if delete_originals and not dry_run:
+                originals = [name for name, new_name in blobs.items() if new_name]
+                still_used = reference_counts(originals)
+                for name in originals:
+                    if name not in still_used:
+                        backend.delete(name)
+                        totals['originals_deleted'] += 1
+            yield model, field, totals
+
+
+def recount_blobs(dry_run=False, min_age_hours=24, chunk_size=1000):
+    """
+    Make every ``ref_count`` match the field values holding the blob, drop
+    blobs nobody holds and delete blob files that have no row and no
+    references. Counts are compared and fixed one chunk of blobs at a time,
+    each change only if the count did not move meanwhile. Blobs newer than
+    ``min_age_hours`` are left alone: their rows may not be committed yet.
+    Returns a summary dict.
+    """
+    from .media import iter_storage_files
+
+    MediaBlob = _blob_model()
+    backend = default_storage
+    cutoff = timezone.now() - timedelta(hours=min_age_hours)
+    summary = {'blobs': 0, 'fixed': 0, 'removed': 0, 'adopted': 0, 'orphan_files': 0}
+
+    last_id = 0
+    while True:
+        blobs = list(MediaBlob.objects.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not blobs:
+            break
+        last_id = blobs[-1].id
+        counts = reference_counts([blob.name for blob in blobs])
+        removed = []
+        for blob in blobs:
+            summary['blobs'] += 1
+            actual = counts.get(blob.name, 0)
+            if actual == blob.ref_count or (not actual and blob.created_at > cutoff):
+                continue
+            summary['fixed'] += 1
+            if dry_run:
+                continue
+            unchanged = MediaBlob.objects.filter(id=blob.id, ref_count=blob.ref_count)
+            if actual:
+                unchanged.update(ref_count=actual)
+            elif unchanged.delete()[0]:
+                summary['removed'] += 1
+                removed.append(blob.name)
+        _delete_unused(backend, removed)
+
+    cutoff_timestamp = cutoff.timestamp()
+    chunk = []
+
+    def sweep():
+        known = set(MediaBlob.objects.filter(name__in=[name for name, _ in chunk]).values_list('name', flat=True))
+        unknown = [(name, size) for name, size in chunk if name not in known]
+        counts = reference_counts([name for name, _ in unknown]) if unknown else {}
+        for name, size in unknown:
+            if counts.get(name):
+                # Referenced but never counted: start counting it
+                summary['adopted'] += 1
+                if not dry_run:
+                    content_hash = os.path.splitext(os.path.basename(name))[0]
+                    MediaBlob.objects.bulk_create(
+                        [MediaBlob(content_hash=content_hash, name=name, size=size, ref_count=counts[name])],
+                        ignore_conflicts=True,
+                    )
+            else:
+                summary['orphan_files'] += 1
+                if not dry_run:
+                    _delete_unused(backend, [name])
+        chunk.clear()
+
+    for name, size, modified in iter_storage_files(backend, prefix=BLOB_PREFIX):
+        if modified > cutoff_timestamp:
+            continue
+        chunk.append((name, size))
+        if len(chunk) >= chunk_size:
+            sweep()
+    if chunk:
+        sweep()
+    return summary
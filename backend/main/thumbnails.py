@@ -0,0 +1,196 @@
+"""
+Local thumbnails of third-party preview images.
+
+Pages name their preview image with ``og:image``, usually a full-size file
+on someone else's server. Every image a preview mentions gets a
+``PreviewImage`` row. It is fetched once (through ``fetcher.fetch``),
+resized with Pillow to each of ``THUMBNAIL_SIZES``, and stored in media
+storage under the SHA-256 of the original bytes. That file never changes,
+so ``serve_thumbnail`` can hand it out with a year-long immutable
+Cache-Control.
+
+Cards get ``thumbnail_urls``. Images already stored link straight to the
+hashed file. Images not fetched yet link to the proxy (``ImageProxyView``),
+which fetches on first use and redirects. The proxy serves only images
+registered by a preview, so it is not an open proxy.
+"""
+import hashlib
+import io
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+
+from .fetcher import FetchError, FetchThrottled, fetch
+from .models import PreviewImage
+
+# size name -> longest side in pixels
+THUMBNAIL_SIZES = {'small': 320, 'medium': 800}
+DEFAULT_SIZE = 'small'
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_QUALITY = 80
+
+IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+# Decoded size limit, so a small file can't expand into gigabytes
+MAX_IMAGE_PIXELS = 40_000_000
+# Images that could not be fetched are tried again after this long
+RETRY_AFTER = timedelta(days=1)
+HASH_TIMEOUT = 60 * 60 * 24
+
+
+class ThumbnailError(Exception):
+    """The fetched file is not an image we can resize."""
+
+
+def image_key(url):
+    return hashlib.sha256(url.strip().encode()).hexdigest()
+
+
+def _cache_key(key):
+    return f'preview_image_hash:{key}'
+
+
+def thumbnail_name(content_hash, size):
+    return f'thumbnails/{content_hash[:2]}/{content_hash}/{size}.{THUMBNAIL_FORMAT.lower()}'
+
+
+def _store_thumbnail(name, data):
+    """Save ``data`` as ``name``, keeping the copy another worker stored first."""
+    stored = default_storage.save(name, ContentFile(data))
+    if stored != name:
+        # Saved under a free name next to the other worker's file, which
+        # nothing would ever read or clean up
+        default_storage.delete(stored)
+
+
+def make_thumbnails(content):
+    """
+    Store every thumbnail size of the image ``content`` (bytes) unless a
+    copy of the same image already did. Returns (content hash, width, height).
+    """
+    from PIL import Image, ImageOps
+
+    content_hash = hashlib.sha256(content).hexdigest()
+    try:
+        image = Image.open(io.BytesIO(content))
+        width, height = image.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ThumbnailError('Image is too large')
+        missing = {
+            size: side for size, side in THUMBNAIL_SIZES.items()
+            if not default_storage.exists(thumbnail_name(content_hash, size))
+        }
+        if not missing:
+            return content_hash, width, height
+
+        # Lets JPEG decode at a fraction of full size
+        image.draft('RGB', (max(missing.values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        for size, side in missing.items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail((side, side), Image.LANCZOS)
+            output = io.BytesIO()
+            thumbnail.save(output, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+            _store_thumbnail(thumbnail_name(content_hash, size), output.getvalue())
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError is an OSError
+        raise ThumbnailError(f'Could not read image: {e}')
+    return content_hash, width, height
+
+
+def register_images(urls):
+    """Allow the proxy to fetch these image URLs (one query)."""
+    urls = {url.strip() for url in urls if url and url.strip()}
+    PreviewImage.objects.bulk_create(
+        [PreviewImage(url_key=image_key(url), url=url[:2000]) for url in urls],
+        ignore_conflicts=True,
+    )
+
+
+def needs_capture(row):
+    if row.fetched_at is None:
+        return True
+    return not row.content_hash and row.fetched_at < timezone.now() - RETRY_AFTER
+
+
+def capture_image(row, wait=0):
+    """
+    Fetch ``row``'s image and store its thumbnails. Returns the content hash,
+    or '' if the image can't be used. Raises ``FetchThrottled``, leaving the
+    row to be tried again.
+    """
+    try:
+        result = fetch(row.url, accept=IMAGE_TYPES, max_bytes=MAX_IMAGE_BYTES, wait=wait)
+        row.content_hash, row.width, row.height = make_thumbnails(result.content)
+    except FetchThrottled:
+        raise
+    except (FetchError, ThumbnailError):
+        row.content_hash, row.width, row.height = '', None, None
+    row.fetched_at = timezone.now()
+    row.save(update_fields=['content_hash', 'width', 'height', 'fetched_at'])
+    if row.content_hash:
+        cache.set(_cache_key(row.url_key), row.content_hash, HASH_TIMEOUT)
+    return row.content_hash
+
+
+def capture_images(urls, wait=0):
+    """Fetch the registered images among ``urls`` that were never fetched."""
+    keys = {image_key(url) for url in urls if url}
+    throttled = set()
+    for row in PreviewImage.objects.filter(url_key__in=keys):
+        host = urlsplit(row.url).hostname
+        if host in throttled or not needs_capture(row):
+            continue
+        try:
+            capture_image(row, wait=wait)
+        except FetchThrottled:
+            throttled.add(host)
+
+
+def get_content_hashes(urls):
+    """{image url: content hash} for images with stored thumbnails."""
+    keys = {url: image_key(url) for url in set(urls) if url}
+    cache_keys = {_cache_key(key): key for key in set(keys.values())}
+    found = {cache_keys[k]: value for k, value in cache.get_many(list(cache_keys)).items()}
+
+    missing = set(keys.values()) - found.keys()
+    if missing:
+        hashes = dict(
+            PreviewImage.objects.filter(url_key__in=missing).exclude(content_hash='')
+            .values_list('url_key', 'content_hash')
+        )
+        if hashes:
+            cache.set_many({_cache_key(key): value for key, value in hashes.items()}, HASH_TIMEOUT)
+        found.update(hashes)
+
+    return {url: found[key] for url, key in keys.items() if key in found}
+
+
+def thumbnail_url(content_hash, size=DEFAULT_SIZE):
+    return reverse('image-thumbnail', args=[content_hash, size])
+
+
+def proxy_url(url, size=DEFAULT_SIZE):
+    return reverse('image-proxy') + '?' + urlencode({'url': url, 'size': size})
+
+
+def thumbnail_urls(urls, request=None, size=DEFAULT_SIZE):
+    """
+    {image url: local thumbnail URL} for the given preview image URLs: the
+    stored file when there is one, otherwise the proxy. Absolute when
+    ``request`` is given.
+    """
+    urls = [url for url in urls if url]
+    hashes = get_content_hashes(urls)
+    links = {}
+    for url in urls:
+        link = thumbnail_url(hashes[url], size) if url in hashes else proxy_url(url, size)
+        links[url] = request.build_absolute_uri(link) if request is not None else link
+    return links
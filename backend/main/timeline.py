@@ -0,0 +1,79 @@
+"""
+Keyset-paginated timelines merged from several tables.
+
+The saved-items library (library.py) and the home feed (feed.py) both read
+one indexed recency query per content type and ``heapq.merge`` the sorted
+streams into a single newest-first timeline. ``Timeline`` holds the parts
+they share: the (timestamp, type, id) ordering, where the rank of a type
+breaks timestamp ties, the cursor encoding of that key, and the filter that
+resumes each stream strictly after a cursor.
+"""
+import base64
+import heapq
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class Timeline:
+    def __init__(self, item_types, timestamp_key):
+        # The rank of a type is its position in ``item_types``
+        self.ranks = {item_type: rank for rank, item_type in enumerate(item_types)}
+        self.timestamp_key = timestamp_key
+
+    def encode_cursor(self, item):
+        position = [item[self.timestamp_key], item['type'], item['id']]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """(timestamp, type, id) from a cursor; raises ValueError if malformed."""
+        try:
+            timestamp, item_type, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            timestamp = parse_datetime(timestamp)
+        except (TypeError, ValueError, UnicodeDecodeError) as e:
+            raise ValueError('Invalid cursor') from e
+        if timestamp is None or item_type not in self.ranks or not isinstance(item_id, int):
+            raise ValueError('Invalid cursor')
+        return timestamp, item_type, item_id
+
+    def position(self, item):
+        """The cursor tuple (timestamp, type, id) of an item."""
+        return datetime.fromisoformat(item[self.timestamp_key]), item['type'], item['id']
+
+    def sort_key(self, item):
+        timestamp, item_type, item_id = self.position(item)
+        return timestamp, self.ranks[item_type], item_id
+
+    def cursor_key(self, cursor):
+        """A decoded cursor in ``sort_key`` form."""
+        timestamp, item_type, item_id = cursor
+        return timestamp, self.ranks[item_type], item_id
+
+    def after(self, item_type, timestamp_field, cursor):
+        """Rows of ``item_type`` that sort strictly after (older than) the cursor."""
+        timestamp, cursor_type, cursor_id = cursor
+        rank, cursor_rank = self.ranks[item_type], self.ranks[cursor_type]
+        if rank < cursor_rank:
+            return Q(**{f'{timestamp_field}__lte': timestamp})
+        if rank > cursor_rank:
+            return Q(**{f'{timestamp_field}__lt': timestamp})
+        return Q(**{f'{timestamp_field}__lt': timestamp}) | Q(**{timestamp_field: timestamp, 'id__lt': cursor_id})
+
+    def stream(self, item_type, rows, timestamp_field, limit, cursor, serialize):
+        """Up to ``limit`` items of one type after ``cursor``, newest first."""
+        if cursor is not None:
+            rows = rows.filter(self.after(item_type, timestamp_field, cursor))
+        for row in rows.order_by(f'-{timestamp_field}', '-id')[:limit]:
+            yield {
+                'type': item_type,
+                'id': row.id,
+                self.timestamp_key: getattr(row, timestamp_field).isoformat(),
+                **serialize(row),
+            }
+
+    def merge(self, streams, limit):
+        """The first ``limit`` items of the k-way merge of sorted streams."""
+        merged = heapq.merge(*streams, key=self.sort_key, reverse=True)
+        return [item for _, item in zip(range(limit), merged)]
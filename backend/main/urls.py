@@ -9,6 +9,9 @@ from .views import (
     GalleryImageView,
     ResourceCategoryView,
     ResourceView,
+    CollectionResourcesView,
+    ResourceImportView,
+    ProductImportView,
     UserProfileView,
     ForumPostView,
     PostReactionView,
@@ -33,6 +36,11 @@ from .views import (
     CommunityListView,
     RecommendedCommunitiesView,
     CommunityMembersView,
+    CommunityMembersBulkView,
+    CommunityHomeView,
+    CommunityExportView,
+    ImageProxyView,
+    FeedView,
     ProfileUpdateView,
     LoginView,
     PasswordResetView,
@@ -60,6 +68,8 @@ urlpatterns = [
     path('communities/<int:community_id>/update_details/', CommunityUpdateView.as_view(), name='community-update'),
     path('communities/<int:community_id>/banner/', update_community_banner, name='update-community-banner'),
     path('communities/<int:community_id>/delete/', views.delete_community, name='delete-community'),
+    path('communities/<int:community_id>/events/', views.community_events_unavailable, name='community-events'),
+    path('communities/<int:community_id>/events/ticket/', views.community_events_ticket, name='community-events-ticket'),
     
     # Resource endpoints
     path('resources/categories/', ResourceCategoryView.as_view(), name='resource-categories'),
@@ -67,6 +77,9 @@ urlpatterns = [
 
     path('resources/', ResourceView.as_view(), name='resources'),
     path('resources/categories/<int:category_id>/stats/', views.get_collection_stats, name='collection-stats'),
+    path('resources/categories/stats/', views.get_collection_stats_batch, name='collection-stats-batch'),
+    path('resources/categories/<int:category_id>/resources/', CollectionResourcesView.as_view(), name='collection-resources'),
+    path('resources/categories/<int:category_id>/import/', ResourceImportView.as_view(), name='collection-import'),
     
     # Forum endpoints
     path('communities/<int:community_id>/forum/posts/', ForumPostView.as_view(), name='forum-posts'),
@@ -87,6 +100,10 @@ urlpatterns = [
     # Preview endpoint
     path('preview/', views.get_page_preview, name='get_page_preview'),
 
+    # Preview image thumbnails
+    path('images/proxy/', ImageProxyView.as_view(), name='image-proxy'),
+    path('images/<str:content_hash>/<str:size>/', views.serve_thumbnail, name='image-thumbnail'),
+
     # Vote endpoint
     path('resources/<int:resource_id>/vote/', vote_resource, name='vote-resource'),
 
@@ -105,6 +122,8 @@ urlpatterns = [
 
     # Recommended products endpoint
     path('communities/<int:community_id>/products/', recommended_products, name='recommended-products'),
+    path('communities/<int:community_id>/products/import/', ProductImportView.as_view(), name='products-import'),
+    path('imports/<str:job_id>/', views.import_progress, name='import-progress'),
 
     # URL preview endpoint
     path('url-preview/', get_url_preview, name='url-preview'),
@@ -117,6 +136,12 @@ urlpatterns = [
 
     # Members endpoint
     path('communities/<int:community_id>/members/', CommunityMembersView.as_view(), name='community-members'),
+    path('communities/<int:community_id>/members/bulk/', CommunityMembersBulkView.as_view(), name='community-members-bulk'),
+    path('communities/<int:community_id>/home/', CommunityHomeView.as_view(), name='community-home'),
+    path('communities/<int:community_id>/export/', CommunityExportView.as_view(), name='community-export'),
+
+    # Home feed
+    path('feed/', FeedView.as_view(), name='feed'),
 
     # Profile update endpoint
     path('profile/update/', ProfileUpdateView.as_view(), name='profile-update'),
@@ -128,8 +153,3 @@ urlpatterns = [
 
     path('auth/activate/<str:registration_id>/', AccountActivationView.as_view(), name='account-activation'),
 ]
-
-# Add this for debugging
-print("Available URLs:")
-for url in urlpatterns:
-    print(f"- {url.pattern}")
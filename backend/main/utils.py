@@ -1,30 +1,121 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+import hashlib
+import json
+import logging
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlsplit, urlunsplit
+
+from .fetcher import FetchError, fetch
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+def _meta(soup, name):
+    tag = soup.find('meta', property=name) or soup.find('meta', attrs={'name': name})
+    return tag.get('content', '').strip() if tag else ''
+
+
+def _ld_json_image(soup):
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        image = data.get('image') if isinstance(data, dict) else None
+        if isinstance(image, list):
+            image = image[0] if image else None
+        if isinstance(image, dict):
+            image = image.get('url')
+        if isinstance(image, str) and image:
+            return image
+    return ''
+
+
+def _find_image(soup):
+    """OpenGraph, then Twitter card, then schema.org, then the first photo-like <img>."""
+    image = _meta(soup, 'og:image') or _meta(soup, 'twitter:image') or _ld_json_image(soup)
+    if image:
+        return image
+    for img in soup.find_all('img'):
+        src = img.get('src') or ''
+        if src.lower().split('?')[0].endswith(IMAGE_EXTENSIONS):
+            return src
+    return ''
+
+
+def fetch_preview_data(url, wait=0):
+    """
+    Title, description, image and domain of a page, fetched through
+    ``fetcher.fetch``. Raises ``FetchError`` if the page can't be fetched.
+    """
+    # Imported lazily so that loading serializers does not pull in the parser
+    from bs4 import BeautifulSoup
+
+    # The <head> is all we need, so a long page is cut short rather than refused
+    result = fetch(url, truncate=True, wait=wait)
+    soup = BeautifulSoup(result.text, 'html.parser')
+    title = _meta(soup, 'og:title') or (soup.title.string.strip() if soup.title and soup.title.string else '')
+    image = _find_image(soup)
+    return {
+        'title': title,
+        'description': _meta(soup, 'og:description') or _meta(soup, 'description'),
+        'image': urljoin(result.url, image) if image else '',
+        'domain': urlparse(url).netloc,
+        # Where any redirects ended up
+        'resolved_url': result.url,
+    }
+
 
 def get_preview_data(url):
+    """``fetch_preview_data``, or None if the page can't be fetched."""
+    try:
+        return fetch_preview_data(url)
+    except FetchError as e:
+        logger.info(f"Error getting preview for {url}: {e}")
+        return None
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Comparable form of a URL for duplicate detection: lowercase scheme and
+    host, no default port, credentials, fragment or trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ''
     try:
-        # Send a GET request to the URL
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Get meta data
-        title = soup.find('meta', property='og:title') or soup.find('title')
-        description = soup.find('meta', property='og:description') or soup.find('meta', {'name': 'description'})
-        image = soup.find('meta', property='og:image')
-        
-        # Extract the values
-        preview_data = {
-            'title': title.get('content', '') if title and title.get('content') else title.string if title else '',
-            'description': description.get('content', '') if description else '',
-            'image': image.get('content', '') if image else '',
-            'domain': urlparse(url).netloc
-        }
-        
-        return preview_data
-    except Exception as e:
-        print(f"Error getting preview for {url}: {str(e)}")
-        return None 
\ No newline at end of file
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src', 'si', 'spm',
+}
+
+
+def canonical_url(url):
+    """
+    ``normalize_url`` without tracking parameters (``utm_*`` and
+    ``TRACKING_PARAMS``) and with the remaining query parameters sorted.
+    """
+    parts = urlsplit(normalize_url(url))
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith('utm_') and name.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+def url_key(url):
+    """Fixed-length key of a URL's canonical form, for indexed lookups."""
+    return hashlib.sha256(canonical_url(url).encode()).hexdigest()
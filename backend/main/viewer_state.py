@@ -0,0 +1,162 @@
+"""
+What the signed-in user has saved, joined, voted on and reacted to.
+
+Each kind of state is one small set (or id -> vote dict) per user, loaded
+with a single query and kept in the shared cache, so decorating a page of
+items with ``is_saved`` / ``is_member`` / ``user_vote`` flags is set
+membership in memory rather than a query per item. ``get_viewer_state``
+keeps one ``ViewerState`` per request; every state it touches is fetched
+in one cache round trip.
+
+Writes go through model signals (see signals.py), which drop the affected
+user's cached state. Writes that bypass signals (``bulk_create``, queryset
+``update``, ``_raw_delete``) must call ``invalidate_viewer_state`` (or
+``invalidate_viewer_states``) for every user they touched, once committed.
+"""
+from django.core.cache import cache
+
+from .models import (
+    AnswerVote,
+    Community,
+    PollVote,
+    QuestionVote,
+    Reaction,
+    SavedCollection,
+    SavedImage,
+    SavedProduct,
+    SavedResource,
+    Vote,
+)
+
+STATE_TIMEOUT = 60 * 30
+
+
+def _ids(model, field):
+    return lambda user_id: set(model.objects.filter(user_id=user_id).values_list(field, flat=True))
+
+
+def _votes(model, field):
+    return lambda user_id: dict(model.objects.filter(user_id=user_id).values_list(field, 'vote_type'))
+
+
+def _communities(user_id):
+    memberships = Community.members.through.objects.filter(customuser_id=user_id)
+    return set(memberships.values_list('community_id', flat=True))
+
+
+def _reactions(user_id):
+    reactions = {}
+    for post_id, reaction_type in Reaction.objects.filter(user_id=user_id).values_list('post_id', 'reaction_type'):
+        reactions.setdefault(post_id, []).append(reaction_type)
+    return reactions
+
+
+# state name -> (builder, empty value for anonymous users)
+STATES = {
+    'saved_images': (_ids(SavedImage, 'image_id'), set()),
+    'saved_resources': (_ids(SavedResource, 'resource_id'), set()),
+    'saved_products': (_ids(SavedProduct, 'product_id'), set()),
+    'saved_collections': (_ids(SavedCollection, 'collection_id'), set()),
+    'communities': (_communities, set()),
+    'resource_votes': (_votes(Vote, 'resource_id'), {}),
+    'question_votes': (_votes(QuestionVote, 'question_id'), {}),
+    'answer_votes': (_votes(AnswerVote, 'answer_id'), {}),
+    'poll_votes': (_ids(PollVote, 'option_id'), set()),
+    'reactions': (_reactions, {}),
+}
+
+# Model whose rows make up each state, for invalidation
+STATE_MODELS = {
+    'main.SavedImage': 'saved_images',
+    'main.SavedResource': 'saved_resources',
+    'main.SavedProduct': 'saved_products',
+    'main.SavedCollection': 'saved_collections',
+    'main.Vote': 'resource_votes',
+    'main.QuestionVote': 'question_votes',
+    'main.AnswerVote': 'answer_votes',
+    'main.PollVote': 'poll_votes',
+    'main.Reaction': 'reactions',
+}
+
+SAVED_STATES = {
+    'image': 'saved_images',
+    'resource': 'saved_resources',
+    'product': 'saved_products',
+    'collection': 'saved_collections',
+}
+
+
+def state_key(user_id, name):
+    return f'viewer_state:{user_id}:{name}'
+
+
+def invalidate_viewer_state(user_id, *names):
+    invalidate_viewer_states([user_id], *names)
+
+
+def invalidate_viewer_states(user_ids, *names):
+    """``invalidate_viewer_state`` for many users in one cache round trip."""
+    keys = [state_key(user_id, name) for user_id in user_ids for name in names or STATES]
+    if keys:
+        cache.delete_many(keys)
+
+
+class ViewerState:
+    def __init__(self, user):
+        self.user_id = user.id if user is not None and user.is_authenticated else None
+        self._states = {}
+
+    def load(self, *names):
+        """Fetch the given states in one cache round trip, building any missing ones."""
+        missing = [name for name in names if name not in self._states]
+        if not missing:
+            return
+        if self.user_id is None:
+            for name in missing:
+                self._states[name] = STATES[name][1]
+            return
+        keys = {state_key(self.user_id, name): name for name in missing}
+        found = cache.get_many(list(keys))
+        built = {}
+        for key, name in keys.items():
+            if key in found:
+                self._states[name] = found[key]
+            else:
+                self._states[name] = built[key] = STATES[name][0](self.user_id)
+        if built:
+            cache.set_many(built, STATE_TIMEOUT)
+
+    def get(self, name):
+        self.load(name)
+        return self._states[name]
+
+    def forget(self, *names):
+        """Drop this user's cached ``names`` after changing them."""
+        for name in names:
+            self._states.pop(name, None)
+        if self.user_id is not None:
+            invalidate_viewer_state(self.user_id, *names)
+
+    def is_saved(self, kind, obj_id):
+        return obj_id in self.get(SAVED_STATES[kind])
+
+    def is_member(self, community_id):
+        return community_id in self.get('communities')
+
+    def user_vote(self, name, obj_id):
+        return self.get(name).get(obj_id)
+
+    def has_voted(self, option_id):
+        return option_id in self.get('poll_votes')
+
+    def user_reactions(self, post_id):
+        return self.get('reactions').get(post_id, [])
+
+
+def get_viewer_state(request):
+    """The ViewerState of ``request.user``, shared by everything rendering the request."""
+    # Stored on the HttpRequest so it outlives any one DRF Request wrapper
+    holder = getattr(request, '_request', request)
+    if not hasattr(holder, 'viewer_state'):
+        holder.viewer_state = ViewerState(getattr(request, 'user', None))
+    return holder.viewer_state
@@ -31,6 +31,7 @@ from .models import (
     SavedProduct,
     SavedCollection,
     CommunityView,
+    PreviewImage,
     Profile,
     CustomUser
 )
@@ -52,20 +53,21 @@ from .serializers import (
     SavedProductSerializer,
     SavedCollectionSerializer,
     SavedResourceSerializer,
-    UserLoginSerializer
+    UserLoginSerializer,
+    MembersBulkSerializer
 )
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework import viewsets
 from rest_framework.decorators import api_view, parser_classes, permission_classes, action
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from bs4 import BeautifulSoup
-import requests
-from django.http import JsonResponse
-from urllib.parse import urljoin
+from django.http import FileResponse, Http404, HttpResponseNotModified, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.db.models import Sum
 from django.db.models import F
 from django.db.models import Count
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db import models
 import re
 from django.utils import timezone
@@ -80,6 +82,23 @@ import json
 import os
 from django.http import HttpResponse
 import uuid
+from . import background, realtime
+from .bulk_import import MAX_IMPORT_ROWS, BulkImportError, get_progress as get_import_progress, start_import
+from .caching import bump_namespace, make_key, tiered_cache
+from .collection_stats import get_collection_stats_many, record_resource_view
+from .feed import decode_cursor as decode_feed_cursor, get_feed_page
+from .library import decode_cursor as decode_library_cursor, get_library_page
+from .deletion import get_progress as get_deletion_progress, run_community_deletion
+from .export import EXPORT_FORMATS, EXPORT_TABLES
+from .media import delete_field_file
+from .pagination import CommentCursorPagination, KeysetPagination, MemberCursorPagination
+from .fetcher import FetchError, FetchThrottled
+from .links import cached_preview_images, capture_previews, get_link_previews, link_stats, preview_image
+from .thumbnails import THUMBNAIL_SIZES, capture_image, image_key, needs_capture, thumbnail_name, thumbnail_url, thumbnail_urls
+from .viewer_state import SAVED_STATES, get_viewer_state, invalidate_viewer_states
+from music.models import CommunitySpotifyPlaylist
+from music.serializers import SpotifyPlaylistSerializer
+from .response_cache import cached_response, user_variant
 
 User = get_user_model()
 
@@ -213,7 +232,7 @@ class CommunityListView(APIView):
 
     def get(self, request):
         try:
-            communities = Community.objects.all()
+            communities = Community.objects.filter(is_deleting=False)
             
             # Get sort parameter from query
             sort_by = request.query_params.get('view', 'alphabetical')
@@ -273,14 +292,46 @@ class CommunityListView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+COMMUNITY_PAYLOAD_TIMEOUT = 300
+
+def get_community_payload(community_id):
+    """Cached, request-independent CommunitySerializer data for one community."""
+    def build():
+        community = Community.objects.select_related('created_by').filter(id=community_id, is_deleting=False).first()
+        if community is None:
+            return None
+        return {
+            'data': dict(CommunitySerializer(community).data),
+            'created_by_id': community.created_by_id,
+        }
+
+    key = make_key('community', 'detail', scope=community_id)
+    return tiered_cache.get_or_set(key, build, timeout=COMMUNITY_PAYLOAD_TIMEOUT)
+
+def community_detail_data(request, payload):
+    data = dict(payload['data'])
+    data['is_creator'] = request.user.is_authenticated and request.user.id == payload['created_by_id']
+    if data['banner_image'] and data['banner_image'].startswith('/'):
+        data['banner_image'] = request.build_absolute_uri(data['banner_image'])
+    return data
+
+def community_creator_variant(request, community_id):
+    if request.user.is_authenticated:
+        payload = get_community_payload(community_id)
+        if payload and payload['created_by_id'] == request.user.id:
+            return 'creator'
+    return None
+
 class CommunityDetailView(APIView):
     permission_classes = [AllowAny]
 
+    @cached_response('community', scope_kwarg='pk', variant=community_creator_variant)
     def get(self, request, pk):
         try:
-            community = get_object_or_404(Community, id=pk)
-            serializer = CommunitySerializer(community, context={'request': request})
-            return Response(serializer.data)
+            payload = get_community_payload(pk)
+            if payload is None:
+                raise Community.DoesNotExist
+            return Response(community_detail_data(request, payload))
         except Community.DoesNotExist:
             return Response(
                 {'error': 'Community not found'}, 
@@ -376,6 +427,7 @@ class GalleryImageView(APIView):
     permission_classes = [AllowAny]
     parser_classes = [MultiPartParser, FormParser]
 
+    @cached_response('gallery', scope_kwarg='community_id')
     def get(self, request, community_id):
         try:
             community = get_object_or_404(Community, id=community_id)
@@ -436,14 +488,7 @@ class GalleryImageDetailView(APIView):
             
             # Check if user is authorized to delete
             if request.user == image.uploaded_by or request.user == community.created_by:
-                # Delete the image file from storage
-                if image.image:
-                    try:
-                        default_storage.delete(image.image.path)
-                    except Exception as e:
-                        print(f"Error deleting file: {e}")
-                
-                # Delete the database record
+                # Its post_delete signal releases the stored file
                 image.delete()
                 print(f"Successfully deleted image {image_id}")
                 return Response(status=status.HTTP_204_NO_CONTENT)
@@ -602,6 +647,71 @@ class ResourceView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+class CollectionResourcesView(APIView):
+    """
+    Resources of one collection with everything the collection page shows:
+    ``votes`` (signed score), the viewer's ``user_vote``, ``is_saved`` and a
+    ``preview_image`` when one has been fetched before, with a local
+    ``thumbnail`` of it. The number of queries is constant per page: one
+    for the rows, one cache round trip for the viewer's votes and saves (see
+    main/viewer_state.py), one each for previews and thumbnails and one
+    query for ``link``, the stats of the same link across collections.
+
+    ``?ordering=score`` (default) or ``?ordering=recent``; keyset paginated.
+    ``recent`` pages are index range scans. ``score`` is aggregated from the
+    votes, so each of its pages groups the whole collection's votes.
+    """
+    permission_classes = [AllowAny]
+    ORDERINGS = {'score': 'score', 'recent': 'created_at'}
+
+    def get(self, request, category_id):
+        try:
+            ordering = request.query_params.get('ordering', 'score')
+            if ordering not in self.ORDERINGS:
+                return Response(
+                    {'error': f"ordering must be one of: {', '.join(self.ORDERINGS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            get_object_or_404(ResourceCategory, id=category_id)
+
+            resources = Resource.objects.filter(category_id=category_id).select_related('created_by').only(
+                'id', 'title', 'url', 'url_key', 'remark', 'category_id', 'created_at', 'views', 'created_by__username'
+            ).annotate(
+                score=Count('votes', filter=Q(votes__vote_type='up')) - Count('votes', filter=Q(votes__vote_type='down'))
+            )
+            paginator = KeysetPagination(self.ORDERINGS[ordering])
+            page = paginator.paginate_queryset(resources, request, view=self)
+
+            viewer = get_viewer_state(request)
+            viewer.load('resource_votes', 'saved_resources')
+            previews = cached_preview_images(resource.url for resource in page)
+            thumbnails = thumbnail_urls(previews.values(), request)
+            shared = link_stats(resource.url_key for resource in page)
+
+            results = []
+            for resource in page:
+                data = ResourceSerializer(resource).data
+                data['views'] = resource.views
+                data['votes'] = resource.score
+                data['user_vote'] = viewer.user_vote('resource_votes', resource.id)
+                data['is_saved'] = viewer.is_saved('resource', resource.id)
+                data['preview_image'] = previews.get(resource.url)
+                data['thumbnail'] = thumbnails.get(data['preview_image'])
+                # Totals over every collection that has the same link
+                data['link'] = shared.get(resource.url_key, {'collections': 1, 'total_views': resource.views})
+                results.append(data)
+
+            return Response({'next': paginator.get_next_link(), 'results': results})
+        except Http404:
+            return Response({'error': 'Collection not found'}, status=status.HTTP_404_NOT_FOUND)
+        except NotFound as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -623,6 +733,82 @@ class UserProfileView(APIView):
         
         return Response(data)
 
+class BulkImportView(APIView):
+    """
+    Shared upload handling for the bulk import endpoints (see
+    main/bulk_import.py). Rows come as a CSV or JSON ``file`` upload or a
+    JSON body (a list of rows or ``{"rows": [...]}``); ``?dry_run=1``
+    validates without saving. Only members of the community can import.
+
+    The upload is stored and imported by a background job: the response is
+    202 with the job's progress, which ``GET /api/imports/<job_id>/`` keeps
+    reporting until its status is ``done`` or ``failed``.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def read_upload(self, request):
+        """(file, name) of the rows to import."""
+        upload = request.FILES.get('file')
+        if upload is not None:
+            return upload, upload.name
+        data = request.data
+        if isinstance(data, dict) and 'rows' in data:
+            data = data['rows']
+        if not isinstance(data, list):
+            raise BulkImportError('Send a CSV or JSON file as "file", or a JSON list of rows')
+        if len(data) > MAX_IMPORT_ROWS:
+            raise BulkImportError(f'Imports are limited to {MAX_IMPORT_ROWS} rows')
+        return ContentFile(json.dumps(data).encode()), 'rows.json'
+
+    def run_import(self, request, community_id, kind, target_id):
+        # Read fresh: cached viewer state is for display and may lag a bulk
+        # membership change
+        can_import = Community.objects.filter(
+            Q(members=request.user.id) | Q(created_by=request.user.id),
+            id=community_id, is_deleting=False,
+        ).exists()
+        if not can_import:
+            return Response(
+                {'error': 'Only community members can import'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            upload, name = self.read_upload(request)
+            dry_run = request.query_params.get('dry_run') in ('1', 'true')
+            progress = start_import(kind, target_id, request.user, upload, name, dry_run=dry_run)
+        except BulkImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Error in bulk import: {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(progress, status=status.HTTP_202_ACCEPTED)
+
+class ResourceImportView(BulkImportView):
+    def post(self, request, category_id):
+        category = ResourceCategory.objects.filter(id=category_id).first()
+        if category is None:
+            return Response({'error': 'Collection not found'}, status=status.HTTP_404_NOT_FOUND)
+        return self.run_import(request, category.community_id, 'resources', category.id)
+
+class ProductImportView(BulkImportView):
+    def post(self, request, community_id):
+        if not Community.objects.filter(id=community_id, is_deleting=False).exists():
+            return Response({'error': 'Community not found'}, status=status.HTTP_404_NOT_FOUND)
+        return self.run_import(request, community_id, 'products', community_id)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def import_progress(request, job_id):
+    """Progress of a bulk import, for the user who started it."""
+    progress = get_import_progress(job_id)
+    if progress is None or progress['user_id'] != request.user.id:
+        return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(progress)
+
 class ForumPostView(APIView):
     permission_classes = [AllowAny]
     parser_classes = [MultiPartParser, FormParser]
@@ -666,9 +852,11 @@ class ForumCommentView(APIView):
 
     def get(self, request, post_id):
         try:
-            comments = ForumComment.objects.filter(post_id=post_id).order_by('created_at')
-            serializer = ForumCommentSerializer(comments, many=True, context={'request': request})
-            return Response(serializer.data)
+            comments = ForumComment.objects.filter(post_id=post_id)
+            paginator = CommentCursorPagination()
+            page = paginator.paginate_queryset(comments, request, view=self)
+            serializer = ForumCommentSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
         except Exception as e:
             print(f"Error fetching comments: {str(e)}")
             return Response(
@@ -684,9 +872,10 @@ class ForumCommentView(APIView):
             )
         try:
             post = get_object_or_404(ForumPost, id=post_id)
-            serializer = ForumCommentSerializer(data=request.data)
+            serializer = ForumCommentSerializer(data=request.data, context={'request': request})
             if serializer.is_valid():
-                serializer.save(post=post, created_by=request.user)
+                comment = serializer.save(post=post, created_by=request.user)
+                realtime.publish_new_comment(comment, post.community_id)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -722,16 +911,12 @@ def update_community_banner(request, community_id):
         # Handle the banner image upload
         banner_image = request.FILES['banner_image']
         
-        # Delete old banner if it exists
-        if community.banner_image:
-            try:
-                default_storage.delete(community.banner_image.path)
-            except Exception:
-                pass  # If old file doesn't exist, continue
+        old_banner = community.banner_image
         
-        # Save new banner
+        # Save new banner, then delete the old one
         community.banner_image = banner_image
         community.save()
+        delete_field_file(old_banner, replaced_by=community.banner_image)
         
         serializer = CommunitySerializer(community)
         return Response(serializer.data)
@@ -770,8 +955,9 @@ class CommunityMembershipView(APIView):
 
     def get(self, request, community_id):
         try:
-            community = get_object_or_404(Community, id=community_id)
-            is_member = community.members.filter(id=request.user.id).exists()
+            is_member = get_viewer_state(request).is_member(community_id)
+            if not is_member:
+                get_object_or_404(Community, id=community_id)
             return Response({'is_member': is_member})
         except Exception as e:
             return Response(
@@ -779,74 +965,98 @@ class CommunityMembershipView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+def community_events_unavailable(request, community_id):
+    # config/asgi.py answers this path itself under SERVER_MODE=asgi; WSGI
+    # workers can't hold event streams open, so tell clients to stop trying
+    return JsonResponse({'error': 'Live updates are not available on this server'}, status=503)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def community_events_ticket(request, community_id):
+    # EventSource can't send an Authorization header; trade it for a
+    # short-lived ticket instead of putting the API token in the stream URL
+    status_code = realtime.authorize_subscription(request.user.id, community_id)
+    if status_code != 200:
+        return Response({'error': realtime.ERROR_MESSAGES[status_code]}, status=status_code)
+    return Response({
+        'ticket': realtime.issue_ticket(request.user.id, community_id),
+        'expires_in': realtime.TICKET_TTL_SECONDS,
+    }, status=status.HTTP_201_CREATED)
+
+
 def get_page_preview(request):
     url = request.GET.get('url')
     if not url:
         return JsonResponse({'error': 'URL parameter is required'}, status=400)
-        
+
     try:
-        # Add more headers to mimic a real browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Referer': 'https://www.google.com/',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'cross-site',
-            'Cache-Control': 'max-age=0',
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Try multiple methods to find image
-        image_url = None
-        
-        # Method 1: OpenGraph
-        if not image_url:
-            og_image = soup.find('meta', property='og:image')
-            if og_image:
-                image_url = og_image.get('content')
-        
-        # Method 2: Twitter Card
-        if not image_url:
-            twitter_image = soup.find('meta', property='twitter:image')
-            if twitter_image:
-                image_url = twitter_image.get('content')
-        
-        # Method 3: Schema.org
-        if not image_url:
-            schema = soup.find('script', type='application/ld+json')
-            if schema:
-                try:
-                    data = json.loads(schema.string)
-                    image_url = data.get('image')
-                except:
-                    pass
-        
-        # Method 4: First large image
-        if not image_url:
-            images = soup.find_all('img')
-            for img in images:
-                src = img.get('src')
-                if src and (src.endswith('.jpg') or src.endswith('.png')):
-                    image_url = src
-                    break
-        
-        if image_url:
-            # Ensure absolute URL
-            image_url = urljoin(url, image_url)
-            
-        return JsonResponse({'image': image_url})
-        
-    except Exception as e:
-        print(f"Error fetching preview for {url}: {str(e)}")
+        image = preview_image(url)
+        return JsonResponse({'image': image, 'thumbnail': thumbnail_urls([image], request).get(image)})
+    except FetchThrottled as e:
+        response = JsonResponse({'error': str(e)}, status=429)
+        response['Retry-After'] = str(e.retry_after)
+        return response
+    except FetchError as e:
+        logger.info(f"Error fetching preview for {url}: {e}")
         return JsonResponse({'error': str(e)}, status=400)
 
+class ImageProxyView(APIView):
+    """
+    Redirects to the stored thumbnail of a preview image (``?url=``, as found
+    on a page, and ``?size=``), fetching and resizing it on first use. Only
+    images registered by a link preview are served; anything else is a 404.
+    Images that can't be fetched redirect to the original URL.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        url = request.query_params.get('url')
+        size = request.query_params.get('size', 'small')
+        if not url:
+            return Response({'error': 'URL is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if size not in THUMBNAIL_SIZES:
+            return Response(
+                {'error': f"size must be one of: {', '.join(THUMBNAIL_SIZES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        image = PreviewImage.objects.filter(url_key=image_key(url)).first()
+        if image is None:
+            return Response({'error': 'Unknown image'}, status=status.HTTP_404_NOT_FOUND)
+
+        content_hash = image.content_hash
+        if needs_capture(image):
+            try:
+                content_hash = capture_image(image)
+            except FetchThrottled:
+                response = HttpResponseRedirect(image.url)
+                response['Cache-Control'] = 'no-cache'
+                return response
+
+        if not content_hash:
+            response = HttpResponseRedirect(image.url)
+            response['Cache-Control'] = 'public, max-age=3600'
+            return response
+        response = HttpResponseRedirect(request.build_absolute_uri(thumbnail_url(content_hash, size)))
+        response['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+def serve_thumbnail(request, content_hash, size):
+    """A stored thumbnail. Its name is its content hash, so it is cached for good."""
+    if not re.fullmatch(r'[0-9a-f]{64}', content_hash) or size not in THUMBNAIL_SIZES:
+        raise Http404
+    etag = f'"{content_hash}-{size}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            response = FileResponse(default_storage.open(thumbnail_name(content_hash, size)), content_type='image/webp')
+        except FileNotFoundError:
+            raise Http404
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def vote_resource(request, resource_id):
@@ -917,18 +1127,32 @@ def get_resources(request):
 @permission_classes([IsAuthenticated])
 def get_collection_stats(request, category_id):
     try:
-        resources = Resource.objects.filter(category_id=category_id)
-        total_resources = resources.count()
-        total_views = resources.aggregate(Sum('views'))['views__sum'] or 0
+        # total_votes is the number of vote actions (both up and down)
+        stats = get_collection_stats_many([category_id]).get(category_id)
+        if stats is None:
+            return Response({'error': 'Collection not found'}, status=404)
+        return Response(stats)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
 
-        # Get total number of vote actions (both up and down)
-        total_votes = Vote.objects.filter(resource__category_id=category_id).count()
-        
-        return Response({
-            'total_resources': total_resources,
-            'total_views': total_views,
-            'total_votes': total_votes  # This will now be the total number of vote actions
-        })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_collection_stats_batch(request):
+    """
+    Stats for many collections in one query, keyed by collection id:
+    ``?ids=1,2,3`` or ``?community_id=4`` for every collection of a community.
+    """
+    try:
+        community_id = request.query_params.get('community_id')
+        if community_id:
+            category_ids = list(ResourceCategory.objects.filter(community_id=community_id).values_list('id', flat=True))
+        else:
+            category_ids = [int(category_id) for category_id in request.query_params.get('ids', '').split(',') if category_id.strip()]
+        if len(category_ids) > 500:
+            return Response({'error': 'At most 500 collections per request'}, status=400)
+        return Response(get_collection_stats_many(category_ids))
+    except ValueError:
+        return Response({'error': 'ids must be a comma-separated list of integers'}, status=400)
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
@@ -936,10 +1160,10 @@ def get_collection_stats(request, category_id):
 @permission_classes([IsAuthenticated])
 def increment_views(request, resource_id):
     try:
-        resource = Resource.objects.get(id=resource_id)
-        resource.views = F('views') + 1  # Use F() to avoid race conditions
-        resource.save()
-        return Response({'views': resource.views})
+        views = record_resource_view(resource_id)
+        if views is None:
+            raise Resource.DoesNotExist
+        return Response({'views': views})
     except Resource.DoesNotExist:
         return Response({'error': 'Resource not found'}, status=404)
 
@@ -1007,6 +1231,7 @@ class PostReactionView(APIView):
                 action = 'removed'
             else:
                 action = 'added'
+            realtime.publish_reaction_counts(post)
             
             serializer = ForumPostSerializer(
                 post,
@@ -1239,6 +1464,7 @@ class PollVoteView(APIView):
                 user=request.user,
                 option=option
             )
+            realtime.publish_poll_results(option.poll)
             
             # Return updated poll data
             serializer = PollSerializer(option.poll, context={'request': request})
@@ -1256,12 +1482,13 @@ class AnnouncementView(APIView):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    @cached_response('announcements', scope_kwarg='community_id')
     def get(self, request, community_id):
         try:
             print(f"Fetching announcements for community {community_id}")
             announcements = Announcement.objects.filter(community_id=community_id)
             print(f"Found {announcements.count()} announcements")
-            serializer = AnnouncementSerializer(announcements, many=True)
+            serializer = AnnouncementSerializer(announcements, many=True, context={'request': request})
             return Response(serializer.data)
         except Exception as e:
             print(f"Error fetching announcements: {str(e)}")
@@ -1283,14 +1510,14 @@ class AnnouncementView(APIView):
                 'community': community.id
             }
             
-            serializer = AnnouncementSerializer(data=data)
+            serializer = AnnouncementSerializer(data=data, context={'request': request})
             if serializer.is_valid():
                 announcement = serializer.save(
                     created_by=request.user,
                     community=community
                 )
                 return Response(
-                    AnnouncementSerializer(announcement).data,
+                    AnnouncementSerializer(announcement, context={'request': request}).data,
                     status=status.HTTP_201_CREATED
                 )
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -1299,6 +1526,7 @@ class AnnouncementView(APIView):
 
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
+@cached_response('products', scope_kwarg='community_id')
 def recommended_products(request, community_id):
     if request.method == 'GET':
         products = RecommendedProduct.objects.filter(community_id=community_id)
@@ -1333,110 +1561,111 @@ def get_url_preview(request):
     url = request.GET.get('url')
     if not url:
         return Response({'error': 'URL is required'}, status=400)
-    
+
     try:
-        # Send request with headers to mimic a browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Try to find image in this order:
-        # 1. OpenGraph image
-        # 2. Twitter image
-        # 3. First meaningful image in the content
-        image_url = None
-        
-        # Check OpenGraph
-        og_image = soup.find('meta', property='og:image')
-        if og_image:
-            image_url = og_image.get('content')
-            
-        # Check Twitter
-        if not image_url:
-            twitter_image = soup.find('meta', property='twitter:image')
-            if twitter_image:
-                image_url = twitter_image.get('content')
-        
-        # Try regular image
-        if not image_url:
-            img_tag = soup.find('img')
-            if img_tag:
-                image_url = img_tag.get('src')
-                if image_url:
-                    image_url = urljoin(url, image_url)
-        
-        return Response({
-            'image_url': image_url
-        })
-        
-    except Exception as e:
-        print(f"Error fetching preview: {str(e)}")
+        image = preview_image(url)
+        return Response({'image_url': image, 'thumbnail_url': thumbnail_urls([image], request).get(image)})
+    except FetchThrottled as e:
+        return Response(
+            {'error': 'Too many preview requests for this site, try again later'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': str(e.retry_after)},
+        )
+    except FetchError as e:
+        logger.info(f"Error fetching preview for {url}: {e}")
         return Response({'error': 'Failed to fetch preview'}, status=400)
 
 class SavedItemsViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+    LIBRARY_PAGE_SIZE = 20
+    LIBRARY_MAX_PAGE_SIZE = 100
+    # kind -> (saved model, field, target model, label)
+    SAVED_KINDS = {
+        'image': (SavedImage, 'image', GalleryImage, 'Image'),
+        'product': (SavedProduct, 'product', RecommendedProduct, 'Product'),
+        'collection': (SavedCollection, 'collection', ResourceCategory, 'Collection'),
+        'resource': (SavedResource, 'resource', Resource, 'Resource'),
+    }
+
+    def toggle_saved(self, request, kind, pk):
+        """
+        Save the item, or unsave it if already saved. The viewer's saved set
+        decides which, so a toggle is a single delete or insert.
+        """
+        saved_model, field, target_model, label = self.SAVED_KINDS[kind]
+        not_found = Response({'error': f'{label} not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            pk = int(pk)
+        except ValueError:
+            return not_found
+
+        viewer = get_viewer_state(request)
+        lookup = {'user': request.user, f'{field}_id': pk}
+        if viewer.is_saved(kind, pk) and saved_model.objects.filter(**lookup).delete()[0]:
+            return Response({'status': 'unsaved'})
+        if not target_model.objects.filter(pk=pk).exists():
+            return not_found
+        try:
+            with transaction.atomic():
+                saved_model.objects.create(**lookup)
+        except IntegrityError:
+            # Already saved after all (the cached set was stale): unsave
+            viewer.forget(SAVED_STATES[kind])
+            saved_model.objects.filter(**lookup).delete()
+            return Response({'status': 'unsaved'})
+        return Response({'status': 'saved'})
 
-    @action(detail=True, methods=['post'], url_path='save_image', url_name='save_image')
-    def save_image(self, request, pk=None):
+    @action(detail=False, methods=['get'])
+    def library(self, request):
+        """
+        Every saved image, resource, product and collection, newest first,
+        as one cursor-paginated stream. URL pattern: /api/saved/library/
+        """
         try:
-            print(f"Attempting to save image with ID: {pk}")
-            image = GalleryImage.objects.get(pk=pk)
-            saved_image, created = SavedImage.objects.get_or_create(
-                user=request.user,
-                image=image
+            page_size = max(1, min(int(request.query_params.get('page_size', self.LIBRARY_PAGE_SIZE)), self.LIBRARY_MAX_PAGE_SIZE))
+            cursor = request.query_params.get('cursor')
+            items, next_cursor = get_library_page(
+                request.user, page_size, decode_library_cursor(cursor) if cursor else None, request=request,
             )
-            if created:
-                print(f"Saved image {pk} for user {request.user}")
-                return Response({'status': 'saved'})
-            else:
-                saved_image.delete()
-                print(f"Unsaved image {pk} for user {request.user}")
-                return Response({'status': 'unsaved'})
-        except GalleryImage.DoesNotExist:
-            print(f"Image {pk} not found")
+        except ValueError:
+            return Response({'error': 'Invalid cursor or page_size'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Error in saved library: {str(e)}")
             return Response(
-                {'error': 'Image not found'}, 
-                status=status.HTTP_404_NOT_FOUND
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        for item in items:
+            for field in ('image_url', 'preview_image'):
+                if item.get(field) and item[field].startswith('/'):
+                    item[field] = request.build_absolute_uri(item[field])
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': items})
+
+    @action(detail=True, methods=['post'], url_path='save_image', url_name='save_image')
+    def save_image(self, request, pk=None):
+        return self.toggle_saved(request, 'image', pk)
+
     @action(detail=False, methods=['get'])
     def images(self, request):
         """
         Get all saved images. URL pattern: /api/saved/images/
         """
-        saved_images = SavedImage.objects.filter(user=request.user)
+        saved_images = SavedImage.objects.filter(user=request.user).select_related('image__community')
         serializer = SavedImageSerializer(saved_images, many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'], url_path='save_product', url_name='save_product')
     def save_product(self, request, pk=None):
-        try:
-            print(f"Attempting to save product with ID: {pk}")
-            product = RecommendedProduct.objects.get(pk=pk)
-            saved_product, created = SavedProduct.objects.get_or_create(
-                user=request.user,
-                product=product
-            )
-            if created:
-                print(f"Saved product {pk} for user {request.user}")
-                return Response({'status': 'saved'})
-            else:
-                saved_product.delete()
-                print(f"Unsaved product {pk} for user {request.user}")
-                return Response({'status': 'unsaved'})
-        except RecommendedProduct.DoesNotExist:
-            print(f"Product {pk} not found")
-            return Response(
-                {'error': 'Product not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+        return self.toggle_saved(request, 'product', pk)
 
     @action(detail=False, methods=['get'])
     def products(self, request):
         try:
-            saved_products = SavedProduct.objects.filter(user=request.user).order_by('-saved_at')
+            saved_products = SavedProduct.objects.filter(user=request.user).select_related('product__community').order_by('-saved_at')
             print(f"Found {saved_products.count()} saved products")  # Debug print
             serializer = SavedProductSerializer(saved_products, many=True)
             return Response(serializer.data)
@@ -1449,33 +1678,15 @@ class SavedItemsViewSet(viewsets.ViewSet):
 
     @action(detail=True, methods=['post'], url_path='save_collection', url_name='save_collection')
     def save_collection(self, request, pk=None):
-        try:
-            print(f"Attempting to save collection with ID: {pk}")
-            collection = ResourceCategory.objects.get(pk=pk)
-            saved_collection, created = SavedCollection.objects.get_or_create(
-                user=request.user,
-                collection=collection
-            )
-            if created:
-                print(f"Saved collection {pk} for user {request.user}")
-                return Response({'status': 'saved'})
-            else:
-                saved_collection.delete()
-                print(f"Unsaved collection {pk} for user {request.user}")
-                return Response({'status': 'unsaved'})
-        except ResourceCategory.DoesNotExist:
-            print(f"Collection {pk} not found")
-            return Response(
-                {'error': 'Collection not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+        return self.toggle_saved(request, 'collection', pk)
 
     @action(detail=False, methods=['get'])
     def collections(self, request):
         try:
             saved_collections = SavedCollection.objects.filter(user=request.user).select_related(
                 'collection',
-                'collection__community'
+                'collection__community',
+                'collection__stats'
             )
             print(f"Found {saved_collections.count()} saved collections")
             for collection in saved_collections:
@@ -1492,26 +1703,7 @@ class SavedItemsViewSet(viewsets.ViewSet):
 
     @action(detail=True, methods=['post'], url_path='save_resource', url_name='save_resource')
     def save_resource(self, request, pk=None):
-        try:
-            print(f"Attempting to save resource with ID: {pk}")
-            resource = Resource.objects.get(pk=pk)
-            saved_resource, created = SavedResource.objects.get_or_create(
-                user=request.user,
-                resource=resource
-            )
-            if created:
-                print(f"Saved resource {pk} for user {request.user}")
-                return Response({'status': 'saved'})
-            else:
-                saved_resource.delete()
-                print(f"Unsaved resource {pk} for user {request.user}")
-                return Response({'status': 'unsaved'})
-        except Resource.DoesNotExist:
-            print(f"Resource {pk} not found")
-            return Response(
-                {'error': 'Resource not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+        return self.toggle_saved(request, 'resource', pk)
 
     @action(detail=False, methods=['get'])
     def resources(self, request):
@@ -1521,8 +1713,15 @@ class SavedItemsViewSet(viewsets.ViewSet):
                 'resource__category',
                 'resource__category__community'
             )
-            print(f"Found {saved_resources.count()} saved resources")
-            serializer = SavedResourceSerializer(saved_resources, many=True)
+            urls = [saved.resource.url for saved in saved_resources]
+            previews = get_link_previews(urls)
+            missing = [url for url in urls if url not in previews]
+            if missing:
+                background.submit(capture_previews, missing)
+            thumbnails = thumbnail_urls((preview.get('image') for preview in previews.values()), request)
+            serializer = SavedResourceSerializer(
+                saved_resources, many=True, context={'link_previews': previews, 'thumbnails': thumbnails},
+            )
             return Response(serializer.data)
         except Exception as e:
             print(f"Error in resources view: {str(e)}")
@@ -1585,7 +1784,7 @@ class RecommendedCommunitiesView(APIView):
             # If user has no communities, recommend trending ones
             if not user_communities.exists():
                 print("No user communities found, getting trending ones")
-                recommended = Community.objects.annotate(
+                recommended = Community.objects.filter(is_deleting=False).annotate(
                     recent_views=Count('views', filter=Q(
                         views__viewed_at__gte=timezone.now() - timedelta(days=30)
                     )),
@@ -1602,7 +1801,7 @@ class RecommendedCommunitiesView(APIView):
                 words_list = [word for word in all_words.split() if len(word) > 3]  # Filter out short words
                 
                 # Find communities with similar content
-                similar_communities = Community.objects.exclude(members=user)
+                similar_communities = Community.objects.filter(is_deleting=False).exclude(members=user)
                 
                 # Build Q objects for each significant word
                 q_objects = Q()
@@ -1627,34 +1826,312 @@ class RecommendedCommunitiesView(APIView):
             )
 
 class CommunityMembersView(APIView):
+    """
+    Paginated member list. ``?q=`` filters by username prefix (case-sensitive,
+    so it can use the username index); ``?cursor=`` pages through results.
+    """
     permission_classes = [IsAuthenticated]
 
+    @staticmethod
+    def member_summary(user):
+        try:
+            avatar = user.profile.avatar.url if user.profile.avatar else None
+        except Profile.DoesNotExist:
+            avatar = None
+        return {
+            'id': user.id,
+            'username': user.username,
+            'avatar': avatar,
+            'date_joined': user.date_joined,
+        }
+
     def get(self, request, community_id):
         try:
-            community = get_object_or_404(Community, id=community_id)
-            creator = community.created_by
-            members = community.members.all()
-            
-            response_data = {
-                'creator': {
-                    'id': creator.id,
-                    'username': creator.username,
-                    'avatar': creator.profile.avatar.url if hasattr(creator, 'profile') and creator.profile.avatar else None,
-                },
-                'members': [{
-                    'id': member.id,
-                    'username': member.username,
-                    'avatar': member.profile.avatar.url if hasattr(member, 'profile') and member.profile.avatar else None,
-                    'date_joined': member.date_joined
-                } for member in members]
+            community = get_object_or_404(
+                Community.objects.select_related('created_by__profile'),
+                id=community_id, is_deleting=False
+            )
+            members = community.members.select_related('profile').only(
+                'id', 'username', 'date_joined', 'profile__avatar'
+            )
+            prefix = request.query_params.get('q')
+            if prefix:
+                members = members.filter(username__startswith=prefix)
+
+            paginator = MemberCursorPagination()
+            page = paginator.paginate_queryset(members, request, view=self)
+            creator = self.member_summary(community.created_by)
+            del creator['date_joined']
+
+            return Response({
+                'creator': creator,
+                'member_count': community.members.count(),
+                'members': [self.member_summary(member) for member in page],
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+            })
+        except Http404:
+            return Response({'error': 'Community not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+class CommunityMembersBulkView(APIView):
+    """
+    Adds or removes many members at once (creator only).
+
+    Body: {"action": "add" | "remove", "user_ids": [...], "usernames": [...], "emails": [...]}
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_USERS = 5000
+
+    def post(self, request, community_id):
+        try:
+            community = get_object_or_404(Community, id=community_id, is_deleting=False)
+            if request.user != community.created_by:
+                return Response(
+                    {'error': 'Only the creator can manage members in bulk'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            serializer = MembersBulkSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            action = serializer.validated_data['action']
+            lookups = {
+                'id__in': serializer.validated_data['user_ids'],
+                'username__in': serializer.validated_data['usernames'],
+                'email__in': serializer.validated_data['emails'],
             }
-            return Response(response_data)
+            if sum(len(values) for values in lookups.values()) > self.MAX_USERS:
+                return Response(
+                    {'error': f'At most {self.MAX_USERS} users per request'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            query = Q()
+            for lookup, values in lookups.items():
+                if values:
+                    query |= Q(**{lookup: values})
+            if not query:
+                return Response({'error': 'No users given'}, status=status.HTTP_400_BAD_REQUEST)
+            user_ids = set(User.objects.filter(query).values_list('id', flat=True))
+
+            Membership = Community.members.through
+            existing = set(Membership.objects.filter(
+                community_id=community.id,
+                customuser_id__in=user_ids
+            ).values_list('customuser_id', flat=True))
+
+            with transaction.atomic():
+                if action == 'add':
+                    new_ids = user_ids - existing
+                    Membership.objects.bulk_create(
+                        [Membership(community_id=community.id, customuser_id=user_id) for user_id in new_ids],
+                        batch_size=1000,
+                        ignore_conflicts=True
+                    )
+                    changed = len(new_ids)
+                    changed_ids = new_ids
+                else:
+                    changed, _ = Membership.objects.filter(
+                        community_id=community.id,
+                        customuser_id__in=existing
+                    ).delete()
+                    changed_ids = existing
+                # Not before commit, or a concurrent read could cache the old memberships again
+                transaction.on_commit(lambda: invalidate_viewer_states(changed_ids, 'communities'))
+
+            # Bulk operations on the through table skip m2m_changed
+            bump_namespace('community', community.id)
+            bump_namespace('trending')
+
+            return Response({
+                'action': action,
+                'matched': len(user_ids),
+                'changed': changed,
+                'member_count': community.members.count(),
+            })
+        except Http404:
+            return Response({'error': 'Community not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+class CommunityHomeView(APIView):
+    """
+    Everything the community page needs in one round trip.
+
+    ``?sections=posts,polls`` picks a subset of SECTIONS (default: all),
+    ``?limit=`` caps every list section and ``?posts_limit=`` etc. override
+    one. Each section has the same shape as its standalone endpoint. Authors
+    are loaded once for the whole response through the request's AuthorMap.
+    """
+    permission_classes = [AllowAny]
+    SECTIONS = [
+        'community', 'membership', 'announcements', 'gallery', 'posts',
+        'questions', 'polls', 'products', 'collections', 'spotify_playlist',
+    ]
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    def get(self, request, community_id):
+        try:
+            sections = request.query_params.get('sections')
+            sections = [section.strip() for section in sections.split(',') if section.strip()] if sections else self.SECTIONS
+            unknown = [section for section in sections if section not in self.SECTIONS]
+            if unknown:
+                return Response(
+                    {'error': f"Unknown sections: {', '.join(unknown)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            payload = get_community_payload(community_id)
+            if payload is None:
+                return Response({'error': 'Community not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            data = {}
+            for section in sections:
+                limit = self.get_limit(request, section)
+                data[section] = getattr(self, f'get_{section}')(request, community_id, payload, limit)
+            return Response(data)
+        except ValueError:
+            return Response({'error': 'Limits must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Error in CommunityHomeView: {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def get_limit(self, request, section):
+        limit = request.query_params.get(f'{section}_limit', request.query_params.get('limit'))
+        if limit is None:
+            return self.DEFAULT_LIMIT
+        return max(1, min(int(limit), self.MAX_LIMIT))
+
+    def get_community(self, request, community_id, payload, limit):
+        return community_detail_data(request, payload)
+
+    def get_membership(self, request, community_id, payload, limit):
+        return {'is_member': get_viewer_state(request).is_member(community_id)}
+
+    def get_announcements(self, request, community_id, payload, limit):
+        announcements = Announcement.objects.filter(community_id=community_id)[:limit]
+        return AnnouncementSerializer(announcements, many=True, context={'request': request}).data
+
+    def get_gallery(self, request, community_id, payload, limit):
+        images = GalleryImage.objects.filter(community_id=community_id)[:limit]
+        return GalleryImageSerializer(images, many=True).data
+
+    def get_posts(self, request, community_id, payload, limit):
+        posts = (
+            ForumPost.objects.filter(community_id=community_id)
+            .order_by('-created_at')
+            .prefetch_related('reactions')[:limit]
+        )
+        return ForumPostSerializer(posts, many=True, context={'request': request}).data
+
+    def get_questions(self, request, community_id, payload, limit):
+        questions = (
+            Question.objects.filter(community_id=community_id)
+            .annotate(vote_count=models.Count('question_votes'))
+            .order_by('-vote_count', '-created_at')
+            .prefetch_related('question_votes', 'answers__answer_votes')[:limit]
+        )
+        return QuestionSerializer(questions, many=True, context={'request': request}).data
+
+    def get_polls(self, request, community_id, payload, limit):
+        polls = Poll.objects.filter(community_id=community_id).prefetch_related('options__pollvote_set')[:limit]
+        return PollSerializer(polls, many=True, context={'request': request}).data
+
+    def get_products(self, request, community_id, payload, limit):
+        products = RecommendedProduct.objects.filter(community_id=community_id)[:limit]
+        return RecommendedProductSerializer(products, many=True).data
+
+    def get_collections(self, request, community_id, payload, limit):
+        categories = ResourceCategory.objects.filter(community_id=community_id)[:limit]
+        return ResourceCategorySerializer(categories, many=True).data
+
+    def get_spotify_playlist(self, request, community_id, payload, limit):
+        playlists = CommunitySpotifyPlaylist.objects.filter(community_id=community_id)
+        return SpotifyPlaylistSerializer(playlists, many=True).data
+
+class FeedView(APIView):
+    """Recent content from every community the user belongs to (see main/feed.py)."""
+    permission_classes = [IsAuthenticated]
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 50
+
+    def get(self, request):
+        try:
+            page_size = max(1, min(int(request.query_params.get('page_size', self.PAGE_SIZE)), self.MAX_PAGE_SIZE))
+            cursor = request.query_params.get('cursor')
+            items, next_cursor = get_feed_page(request.user, page_size, decode_feed_cursor(cursor) if cursor else None)
+        except ValueError:
+            return Response({'error': 'Invalid cursor or page_size'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Error in FeedView: {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        # The items are the cached window's own dicts; build new ones
+        items = [
+            {**item, **{
+                field: request.build_absolute_uri(item[field])
+                for field in ('media', 'image') if item.get(field) and item[field].startswith('/')
+            }}
+            for item in items
+        ]
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': items})
+
+class CommunityExportView(APIView):
+    """
+    Streams a community's content as NDJSON (``?output=ndjson``, default) or
+    a ZIP of CSVs (``?output=csv``); ``?tables=posts,comments`` limits it to
+    some tables. Memory use is constant (see main/export.py).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, community_id):
+        community = Community.objects.filter(id=community_id, is_deleting=False).first()
+        if community is None:
+            return Response({'error': 'Community not found'}, status=status.HTTP_404_NOT_FOUND)
+        if request.user != community.created_by and not request.user.is_staff:
+            return Response(
+                {'error': 'Only the creator can export the community'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tables = [table for table in request.query_params.get('tables', '').split(',') if table]
+        unknown = [table for table in tables if table not in EXPORT_TABLES]
+        if unknown:
+            return Response(
+                {'error': f"Unknown tables: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        stream, content_type, extension = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(stream(community.id, tables or None), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="community-{community.id}-export.{extension}"'
+        # Let the proxy pass chunks through as they are produced
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 class ProfileUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1687,11 +2164,15 @@ class ProfileUpdateView(APIView):
                 profile.bio = request.data['bio']
                 logger.info(f"Updating bio to: {request.data['bio']}")
             
+            old_avatar = None
             if 'avatar' in request.FILES:
+                old_avatar = profile.avatar
                 profile.avatar = request.FILES['avatar']
                 logger.info("Updating avatar")
             
             profile.save()
+            if old_avatar:
+                delete_field_file(old_avatar, replaced_by=profile.avatar)
             
             return Response({
                 'username': request.user.username,
@@ -1793,10 +2274,11 @@ class PasswordResetConfirmView(APIView):
 class TrendingCommunitiesView(APIView):
     permission_classes = [AllowAny]
 
+    @cached_response('trending', variant=user_variant)
     def get(self, request):
         try:
             # Get all communities and order by member count only for now
-            communities = Community.objects.annotate(
+            communities = Community.objects.filter(is_deleting=False).annotate(
                 member_count=Count('members')
             ).order_by('-member_count')[:5]  # Get top 5
             
@@ -1870,26 +2352,44 @@ class AccountActivationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-@api_view(['DELETE'])
+@api_view(['GET', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_community(request, community_id):
+    """
+    DELETE hides the community at once and removes its content in a
+    background job (see main/deletion.py); GET reports the job's progress.
+    """
     try:
-        community = get_object_or_404(Community, id=community_id)
-        
+        progress = get_deletion_progress(community_id)
+        community = Community.objects.filter(id=community_id).first()
+        if community is None:
+            if progress:
+                return Response(progress)
+            return Response({'error': 'Community not found'}, status=status.HTTP_404_NOT_FOUND)
+
         # Check if user is the creator
         if request.user != community.created_by:
             return Response(
                 {'error': 'Only the creator can delete the community'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        
-        # Delete the community
-        community.delete()
-        
-        return Response(status=status.HTTP_204_NO_CONTENT)
-            
+
+        if request.method == 'GET':
+            return Response(progress or {'community_id': community.id, 'status': 'pending' if community.is_deleting else 'not_started'})
+
+        if not community.is_deleting:
+            Community.objects.filter(id=community.id).update(is_deleting=True)
+            bump_namespace('community', community.id)
+            bump_namespace('trending')
+            transaction.on_commit(lambda: background.submit(run_community_deletion, community.id))
+
+        return Response(
+            progress or {'community_id': community.id, 'status': 'pending'},
+            status=status.HTTP_202_ACCEPTED
+        )
+
     except Exception as e:
-        print(f"Error in delete_community: {str(e)}")
+        logger.exception(f"Error in delete_community: {str(e)}")
         return Response(
             {'error': 'Failed to delete community'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -4,6 +4,7 @@ from django.core.exceptions import ValidationError
 from .models import CommunitySpotifyPlaylist
 from .serializers import SpotifyPlaylistSerializer
 from rest_framework.permissions import AllowAny
+from main.response_cache import cached_response
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,6 +32,10 @@ class CommunitySpotifyPlaylistViewSet(viewsets.ModelViewSet):
             community_id=self.kwargs['community_id']
         )
 
+    @cached_response('spotify_playlist', scope_kwarg='community_id')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         """Create a new playlist, ensuring only one exists per community"""
         try:
@@ -7,6 +7,8 @@ const DEFAULT_AVATAR = 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTAiIGhlaWdodD
 const MembersList = ({ communityId }) => {
     const [members, setMembers] = useState([]);
     const [creator, setCreator] = useState(null);
+    const [memberCount, setMemberCount] = useState(0);
+    const [nextPage, setNextPage] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -19,6 +21,8 @@ const MembersList = ({ communityId }) => {
                 );
                 setCreator(response.data.creator);
                 setMembers(response.data.members);
+                setMemberCount(response.data.member_count);
+                setNextPage(response.data.next);
                 setLoading(false);
             } catch (err) {
                 console.error('Error fetching members:', err);
@@ -30,6 +34,16 @@ const MembersList = ({ communityId }) => {
         fetchMembers();
     }, [communityId]);
 
+    const loadMore = async () => {
+        try {
+            const response = await api.get(nextPage);
+            setMembers(prev => [...prev, ...response.data.members]);
+            setNextPage(response.data.next);
+        } catch (err) {
+            console.error('Error fetching more members:', err);
+        }
+    };
+
     if (loading) return <div>Loading members...</div>;
     if (error) return <div className="error-message">{error}</div>;
 
@@ -57,7 +71,7 @@ const MembersList = ({ communityId }) => {
             )}
 
             <div className="members-section">
-                <h3>Members ({members.length})</h3>
+                <h3>Members ({memberCount})</h3>
                 <div className="members-grid">
                     {members.map(member => (
                         <div key={member.id} className="member-card">
@@ -79,6 +93,11 @@ const MembersList = ({ communityId }) => {
                         </div>
                     ))}
                 </div>
+                {nextPage && (
+                    <button className="load-more-button" onClick={loadMore}>
+                        Load more members
+                    </button>
+                )}
             </div>
 
             <style jsx>{`